@@ -0,0 +1,332 @@
+"""
+Offline stand-ins for Discord and Google Sheets, for the benchmarks.
+
+`FakeMember` and `FakeInteraction` carry just the attributes the cogs use.
+`FakeSpreadsheet`/`FakeWorksheet` keep the cells in memory and implement the
+subset of the gspread API that `ext/Utilities/sheets.py` calls, with a
+configurable per-request latency and rate of quota (429) errors. Every request
+is counted by spreadsheet, worksheet and method.
+"""
+import collections
+import datetime
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from typing import *
+
+import gspread
+import requests
+
+# ===================================================
+# DISCORD
+# ===================================================
+_ids = itertools.count(1_000_000_000_000)
+
+
+class FakeMember:
+    def __init__(self, name: str, discriminator: str = "0"):
+        self.id = next(_ids)
+        self.name = name
+        self.discriminator = discriminator
+        self.display_name = name
+        self.mention = f"<@{self.id}>"
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, FakeMember) and other.id == self.id
+
+    def __repr__(self) -> str:
+        return f"FakeMember({self.name!r})"
+
+
+class FakeResponse:
+    """
+    `Interaction.response`; records what was sent.
+    """
+    def __init__(self):
+        self.deferred = False
+        self.messages: list[str] = []
+
+    def is_done(self) -> bool:
+        return self.deferred or bool(self.messages)
+
+    async def defer(self, **kwargs) -> None:
+        self.deferred = True
+
+    async def send_message(self, content: str | None = None, **kwargs) -> None:
+        self.messages.append(content)
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages: list[str] = []
+
+    async def send(self, content: str | None = None, **kwargs) -> None:
+        self.messages.append(content)
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeMember, guild_id: int = 0):
+        self.id = next(_ids)
+        self.user = user
+        self.guild_id = guild_id
+        self.guild = None
+        self.command = None
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+    def messages(self) -> list[str]:
+        return self.response.messages + self.followup.messages
+
+
+# ===================================================
+# GOOGLE SHEETS
+# ===================================================
+class SheetsFaults:
+    """
+    How the fake spreadsheets misbehave: every request sleeps `latency`
+    seconds (plus up to `jitter`), and a `quota_error_rate` fraction of them
+    fail with a 429 before doing anything, as Google does.
+    """
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, quota_error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_error_rate = quota_error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self) -> None:
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.quota_error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise gspread.exceptions.APIError(_error_response(429, "Quota exceeded (fake)."))
+
+
+def _error_response(status: int, message: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    status_name = "RESOURCE_EXHAUSTED" if status == 429 else "INVALID_ARGUMENT"
+    response._content = json.dumps({"error": {"code": status, "message": message, "status": status_name}}).encode()
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+def _column_index(letters: str) -> int:
+    # "A" -> 0
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+_CELL = re.compile(r"^([A-Z]*)(\d*)$")
+
+def _parse_range(a1: str) -> Tuple[str | None, int, int | None, int, int | None]:
+    """
+    "'Title'!A2:C5" -> (title, first row, last row, first column, last column),
+    0-indexed, with `None` for an open end (e.g., "A:C").
+    """
+    title = None
+    if "!" in a1:
+        title, a1 = a1.rsplit("!", 1)
+        title = title.strip("'")
+    start, _, end = a1.partition(":")
+    start_column, start_row = _CELL.match(start).groups()
+    end_column, end_row = _CELL.match(end or start).groups()
+    return (
+        title,
+        int(start_row) - 1 if start_row else 0,
+        int(end_row) - 1 if end_row else None,
+        _column_index(start_column) if start_column else 0,
+        _column_index(end_column) if end_column else None,
+    )
+
+
+def _cell_value(value: Any) -> str:
+    # what reading a cell written with "RAW" gives back
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class FakeWorksheet:
+    """
+    A worksheet's cells, as a list of rows of strings.
+    """
+    def __init__(self, spreadsheet: "FakeSpreadsheet", sheet_id: int, title: str, rows: list[list] | None = None, row_count: int = 1000):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.cells: list[list[str]] = [[_cell_value(v) for v in row] for row in rows or []]
+        self._properties = {"gridProperties": {"rowCount": max(row_count, len(self.cells))}}
+
+    @property
+    def row_count(self) -> int:
+        return self._properties["gridProperties"]["rowCount"]
+
+    def _used_values(self) -> list[list[str]]:
+        values = [list(row) for row in self.cells]
+        while values and not any(values[-1]):
+            values.pop()
+        return values
+
+    def _read(self, first_row: int, last_row: int | None, first_column: int, last_column: int | None) -> list[list[str]]:
+        # like the Sheets API, trailing empty rows and cells are omitted
+        values = []
+        for row in self.cells[first_row:None if last_row is None else last_row + 1]:
+            row = row[first_column:None if last_column is None else last_column + 1]
+            while row and not row[-1]:
+                row = row[:-1]
+            values.append(row)
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def _write(self, first_row: int, first_column: int, values: list[list]) -> None:
+        for i, row in enumerate(values):
+            row_index = first_row + i
+            if row_index >= self.row_count:
+                raise gspread.exceptions.APIError(_error_response(400, f"Range exceeds grid limits of {self.title}."))
+            while len(self.cells) <= row_index:
+                self.cells.append([])
+            cells = self.cells[row_index]
+            cells += [""] * (first_column + len(row) - len(cells))
+            cells[first_column:first_column + len(row)] = [_cell_value(v) for v in row]
+
+    # gspread API
+    # ====================
+    def get_all_values(self) -> list[list[str]]:
+        self.spreadsheet._request(self.title, "get_all_values")
+        with self.spreadsheet._lock:
+            values = self._used_values()
+        width = max((len(row) for row in values), default=0)
+        return [row + [""] * (width - len(row)) for row in values]
+
+    def row_values(self, row: int) -> list[str]:
+        self.spreadsheet._request(self.title, "row_values")
+        with self.spreadsheet._lock:
+            values = self._read(row - 1, row - 1, 0, None)
+        return values[0] if values else []
+
+    def find(self, query: str, in_column: int | None = None) -> gspread.cell.Cell | None:
+        self.spreadsheet._request(self.title, "find")
+        with self.spreadsheet._lock:
+            for i, row in enumerate(self.cells, 1):
+                for j, value in enumerate(row, 1):
+                    if value == query and (in_column is None or j == in_column):
+                        return gspread.cell.Cell(i, j, value)
+        return None
+
+    def append_rows(self, values: list[list], **kwargs) -> None:
+        self.spreadsheet._request(self.title, "append_rows")
+        with self.spreadsheet._lock:
+            start = len(self._used_values())
+            # appending grows the grid as needed
+            self._properties["gridProperties"]["rowCount"] = max(self.row_count, start + len(values))
+            self._write(start, 0, values)
+
+    def batch_update(self, data: list[dict], **kwargs) -> None:
+        self.spreadsheet._request(self.title, "batch_update")
+        with self.spreadsheet._lock:
+            for update in data:
+                _, first_row, _, first_column, _ = _parse_range(update["range"])
+                self._write(first_row, first_column, update["values"])
+
+    def add_rows(self, rows: int) -> None:
+        self.spreadsheet._request(self.title, "add_rows")
+        with self.spreadsheet._lock:
+            self._properties["gridProperties"]["rowCount"] += rows
+
+
+class FakeSpreadsheet:
+    """
+    In-memory spreadsheet. Each request first suffers `faults` (concurrently
+    with other requests, like network latency), then reads or writes the
+    cells under a lock, so every request is applied atomically.
+    """
+    def __init__(self, url: str, faults: SheetsFaults | None = None):
+        self.url = url
+        self.faults = faults or SheetsFaults()
+        self.worksheets: Dict[str, FakeWorksheet] = {}
+        self.requests: collections.Counter[Tuple[str, str]] = collections.Counter()  # (worksheet, method)
+        self.request_times: list[float] = []  # `time.monotonic()` of each request
+        self._lock = threading.Lock()
+
+    def add_worksheet(self, title: str, rows: list[list] | None = None, row_count: int = 1000) -> FakeWorksheet:
+        worksheet = self.worksheets[title] = FakeWorksheet(self, len(self.worksheets), title, rows, row_count)
+        return worksheet
+
+    def _request(self, worksheet: str, method: str) -> None:
+        with self._lock:
+            self.requests[(worksheet, method)] += 1
+            self.request_times.append(time.monotonic())
+        self.faults.apply()
+
+    # gspread API
+    # ====================
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self._request(title, "worksheet")
+        if title not in self.worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def values_batch_get(self, ranges: list[str], **kwargs) -> dict:
+        self._request("", "values_batch_get")
+        with self._lock:
+            value_ranges = []
+            for a1 in ranges:
+                title, *bounds = _parse_range(a1)
+                value_ranges.append({"range": a1, "values": self.worksheets[title]._read(*bounds)})
+        return {"valueRanges": value_ranges}
+
+    def values_batch_update(self, body: dict) -> None:
+        self._request("", "values_batch_update")
+        with self._lock:
+            for update in body["data"]:
+                title, first_row, _, first_column, _ = _parse_range(update["range"])
+                self.worksheets[title]._write(first_row, first_column, update["values"])
+
+    def batch_update(self, body: dict) -> None:
+        self._request("", "batch_update")
+        by_id = {ws.id: ws for ws in self.worksheets.values()}
+        with self._lock:
+            for request in body["requests"]:
+                deletion = request["deleteDimension"]["range"]
+                worksheet = by_id[deletion["sheetId"]]
+                del worksheet.cells[deletion["startIndex"]:deletion["endIndex"]]
+                worksheet._properties["gridProperties"]["rowCount"] -= deletion["endIndex"] - deletion["startIndex"]
+
+
+class FakeClient:
+    def __init__(self, spreadsheets: list[FakeSpreadsheet]):
+        self.spreadsheets = {s.url: s for s in spreadsheets}
+
+    def open_by_url(self, url: str) -> FakeSpreadsheet:
+        spreadsheet = self.spreadsheets[url]
+        spreadsheet._request("", "open_by_url")
+        return spreadsheet
+
+
+def leaderboard_spreadsheet(url: str, faults: SheetsFaults | None = None) -> FakeSpreadsheet:
+    """
+    An empty leaderboard: the four worksheets the Utilities cog uses, with header rows.
+    """
+    spreadsheet = FakeSpreadsheet(url, faults)
+    spreadsheet.add_worksheet("Registry", [["Discord Name", "Name", "Paid Membership"]])
+    spreadsheet.add_worksheet("Games", [["Timestamp", "Game Type", "Leftover Points", "Ruleset Version"]])
+    spreadsheet.add_worksheet("Scores", [[
+        "Timestamp", "Game Type", "Seat", "Discord Name", "Raw Score",
+        "Placement", "Uma", "Penalty", "Final Score", "Ruleset Version"]])
+    spreadsheet.add_worksheet("Standings", [])
+    return spreadsheet
@@ -0,0 +1,212 @@
+"""
+Offline load benchmark of the Utilities cog: registrations, score entry and
+unregistrations under concurrent load, plus the scoring helper on its own.
+The cog runs as in production (store, background loops, Sheets scheduler),
+against in-memory leaderboards with simulated latency and quota errors.
+Needs no Discord, Google or `config.env`:
+
+    python -m benchmarks.load [--members 100] [--games 300] [--concurrency 20]
+        [--latency 0.15] [--jitter 0.1] [--quota-errors 0.02] [--quota-per-minute 600]
+
+Reports, per scenario: throughput, p50/p99 latency, Sheets requests (as seen
+by the fake spreadsheets, retries included) and event loop lag. Pass
+`--quota-per-minute 60` to run under Google's real quota (slow!).
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import *
+
+from .fakes import FakeInteraction, FakeMember, SheetsFaults, leaderboard_spreadsheet
+from .offline import (
+    CLUB_LEADERBOARD_URL, FRIENDLY_LEADERBOARD_URL, import_utilities, install_fake_sheets, set_sheets_quota)
+from .stats import LoopLagSampler, format_ms, percentile, print_table
+
+
+class ScenarioResult:
+    def __init__(self, name: str, latencies: list[float], seconds: float, sheets_requests: int, retries: int, lags: list[float]):
+        self.name = name
+        self.latencies = latencies
+        self.seconds = seconds
+        self.sheets_requests = sheets_requests
+        self.retries = retries
+        self.lags = lags
+
+    def row(self) -> list[str]:
+        return [
+            self.name,
+            f"{len(self.latencies):,}",
+            f"{len(self.latencies) / self.seconds:,.1f}",
+            format_ms(percentile(self.latencies, 0.5)),
+            format_ms(percentile(self.latencies, 0.99)),
+            f"{self.sheets_requests:,}",
+            f"{self.retries:,}",
+            format_ms(percentile(self.lags, 0.99)) if self.lags else "-",
+            format_ms(max(self.lags)) if self.lags else "-",
+        ]
+
+
+REPORT_HEADER = ["scenario", "ops", "ops/s", "p50 ms", "p99 ms", "sheets reqs", "retries", "lag p99 ms", "lag max ms"]
+
+def print_report(results: list[ScenarioResult]) -> None:
+    print_table([REPORT_HEADER] + [r.row() for r in results])
+
+
+class LoadBenchmark:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.cog_module = import_utilities()
+        faults = SheetsFaults(args.latency, args.jitter, args.quota_errors, args.seed)
+        self.spreadsheets = [leaderboard_spreadsheet(url, faults) for url in (CLUB_LEADERBOARD_URL, FRIENDLY_LEADERBOARD_URL)]
+        install_fake_sheets(self.spreadsheets)
+        set_sheets_quota(args.quota_per_minute, args.burst)
+        self.random = random.Random(args.seed)
+        self.members = [FakeMember(f"player{i}") for i in range(args.members)]
+        self.lag_sampler = LoopLagSampler()
+        self.results: list[ScenarioResult] = []
+
+    def sheets_request_count(self) -> int:
+        return sum(sum(s.requests.values()) for s in self.spreadsheets)
+
+    async def scenario(self, name: str, operations: list[Callable[[], Awaitable]], concurrency: int) -> None:
+        """
+        Run `operations` with at most `concurrency` in flight, each in its own
+        task (as Discord runs each command), timing every one.
+        """
+        from ext.Utilities.sheets import scheduler
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def timed(operation):
+            async with semaphore:
+                start = time.perf_counter()
+                await asyncio.create_task(operation())
+                latencies.append(time.perf_counter() - start)
+
+        requests_before, retries_before = self.sheets_request_count(), scheduler.retries
+        self.lag_sampler.lags.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(timed(operation) for operation in operations))
+        seconds = time.perf_counter() - start
+        self.results.append(ScenarioResult(
+            name, latencies, seconds,
+            self.sheets_request_count() - requests_before, scheduler.retries - retries_before,
+            list(self.lag_sampler.lags)))
+        print(f"... {name} done in {seconds:.1f}s")
+
+    def slash_command(self, cog, command, user: FakeMember, expected: str, **kwargs) -> Callable[[], Awaitable]:
+        """
+        Invoke a slash command's callback like discord.py would, after the
+        cog's `interaction_check()`, and check its response.
+        """
+        async def invoke():
+            interaction = FakeInteraction(user)
+            await cog.interaction_check(interaction)
+            await command.callback(cog, interaction, **kwargs)
+            messages = interaction.messages()
+            if not any(expected in (m or "") for m in messages):
+                raise AssertionError(f"/{command.name} responded {messages}, expected {expected!r}")
+        return invoke
+
+    def random_game(self) -> Dict[str, Any]:
+        players = self.random.sample(self.members, 4)
+        # multiples of 100 adding up to 100,000
+        scores = [self.random.randint(-100, 600) * 100 for _ in range(3)]
+        scores.append(100_000 - sum(scores))
+        return {
+            "game_length": self.random.choice(["Hanchan", "Tonpuu"]),
+            "player_east": players[0], "score_east": scores[0],
+            "player_south": players[1], "score_south": scores[1],
+            "player_west": players[2], "score_west": scores[2],
+            "player_north": players[3], "score_north": scores[3],
+        }
+
+    async def run(self) -> None:
+        cog_module = self.cog_module
+        Utilities = cog_module.Utilities
+        args = self.args
+
+        cog = Utilities(None)
+        self.lag_sampler.start()
+        await cog.cog_load()
+        await cog._warm_up_task
+        try:
+            await self.scenario("register", [
+                self.slash_command(cog, Utilities.register, m, "registered with name", real_name=f"Player {i}")
+                for i, m in enumerate(self.members)], args.concurrency)
+            await self.scenario("register (update)", [
+                self.slash_command(cog, Utilities.register, m, "updated their registration", real_name=f"Renamed {i}")
+                for i, m in enumerate(self.members)], args.concurrency)
+
+            games = [self.random_game() for _ in range(args.games)]
+            await self.scenario("enter_scores", [
+                self.slash_command(cog, self.random.choice([Utilities.enter_scores_club, Utilities.enter_scores_friendly]),
+                                   game["player_east"], "Successfully entered scores", **game)
+                for game in games], args.concurrency)
+            await self.scenario("push_scores", [
+                lambda leaderboard_type=leaderboard_type: cog._push_leaderboard(leaderboard_type)
+                for leaderboard_type in ("Club Leaderboard", "Friendly Leaderboard")], 2)
+
+            await self.scenario("unregister", [
+                self.slash_command(cog, Utilities.unregister, m, "has been unregistered")
+                for m in self.members[::2]], args.concurrency)
+
+            self.placement_scenario(games * 100)
+        finally:
+            await cog.cog_unload()
+            self.lag_sampler.stop()
+
+        self.check_sheets(len(games))
+        print()
+        print_report(self.results)
+        print(f"\nThe bot's logs and store are in {os.getcwd()}.")
+
+    def placement_scenario(self, games: list[Dict[str, Any]]) -> None:
+        """
+        `calculate_placement_and_final_score()` alone, one game after another.
+        """
+        from ext.Utilities.helpers import PlayerScore, calculate_placement_and_final_score
+
+        latencies = []
+        self.lag_sampler.lags.clear()
+        start = time.perf_counter()
+        for game in games:
+            players = [
+                PlayerScore(seat, game[f"player_{seat.lower()}"], game[f"score_{seat.lower()}"])
+                for seat in ("East", "South", "West", "North")]
+            call_start = time.perf_counter()
+            calculate_placement_and_final_score("Yonma", game["game_length"], players)
+            latencies.append(time.perf_counter() - call_start)
+        self.results.append(ScenarioResult(
+            "calculate_placement", latencies, time.perf_counter() - start, 0, 0, []))
+
+    def check_sheets(self, game_count: int) -> None:
+        # header rows included
+        games_rows = sum(len(s.worksheets["Games"]._used_values()) - 1 for s in self.spreadsheets)
+        scores_rows = sum(len(s.worksheets["Scores"]._used_values()) - 1 for s in self.spreadsheets)
+        if games_rows != game_count or scores_rows != 4 * game_count:
+            print(f"WARNING: expected {game_count} games on the sheets, found {games_rows} (with {scores_rows} score rows).")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--games", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20, help="commands in flight at once")
+    parser.add_argument("--latency", type=float, default=0.15, help="seconds per Sheets request")
+    parser.add_argument("--jitter", type=float, default=0.1, help="up to this many extra seconds per Sheets request")
+    parser.add_argument("--quota-errors", type=float, default=0.02, help="fraction of Sheets requests failing with a 429")
+    parser.add_argument("--quota-per-minute", type=int, default=600)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.members < 4:
+        parser.error("--members must be at least 4 (one Yonma table)")
+    asyncio.run(LoadBenchmark(args).run())
+
+
+if __name__ == "__main__":
+    main()
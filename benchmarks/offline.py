@@ -0,0 +1,88 @@
+"""
+Loading the Utilities cog offline: no `config.env`, no Google credentials
+and no Discord connection.
+"""
+import importlib
+import os
+import sys
+import tempfile
+from types import ModuleType
+from typing import *
+
+from .fakes import FakeClient, FakeSpreadsheet
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CLUB_LEADERBOARD_URL = "https://docs.google.com/spreadsheets/d/fake-club-leaderboard"
+FRIENDLY_LEADERBOARD_URL = "https://docs.google.com/spreadsheets/d/fake-friendly-leaderboard"
+
+# placeholder `config.env`, with `config.template.env`'s ruleset
+OFFLINE_CONFIG = {
+    "bot_token": "",
+    "guild_id": "0",
+    "time_zone": "America/New_York",
+    "announcements_channel_id": "0",
+    "bot_maintainer_id": "0",
+    "bot_test_channel_id": "0",
+    "extensions_file": "./extensions",
+    "officer_role": "Officer",
+    "elder_role": "Elder",
+    "command_prefix": "rc/",
+    "log_format": "text",
+    "club_leaderboard_url": CLUB_LEADERBOARD_URL,
+    "friendly_leaderboard_url": FRIENDLY_LEADERBOARD_URL,
+    "max_name_len": "25",
+    "tiebreaker_method": "split",
+    "default_chombo_penalty": "-10",
+    "yonma_starting_points": "25000",
+    "sanma_starting_points": "35000",
+    "yonma_hanchan_uma_1": "24", "yonma_hanchan_uma_2": "8", "yonma_hanchan_uma_3": "-8", "yonma_hanchan_uma_4": "-24",
+    "yonma_tonpuu_uma_1": "12", "yonma_tonpuu_uma_2": "4", "yonma_tonpuu_uma_3": "-4", "yonma_tonpuu_uma_4": "-12",
+    "sanma_hanchan_uma_1": "24", "sanma_hanchan_uma_2": "0", "sanma_hanchan_uma_3": "-24",
+    "sanma_tonpuu_uma_1": "12", "sanma_tonpuu_uma_2": "0", "sanma_tonpuu_uma_3": "-12",
+}
+
+
+def import_utilities(scratch_dir: str | None = None) -> ModuleType:
+    """
+    Import `ext.Utilities.cog` with `OFFLINE_CONFIG`, from a scratch directory
+    (a new temporary one by default) so the store, logs and ruleset history
+    never touch the bot's own `data/` and `logs/`. Must be called before
+    anything else imports the bot's modules. Returns the cog module.
+    """
+    scratch_dir = scratch_dir or tempfile.mkdtemp(prefix="renchan-benchmark-")
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    os.chdir(scratch_dir)
+    # variables already set win, as with `config.env`
+    for name, value in OFFLINE_CONFIG.items():
+        os.environ.setdefault(name, value)
+    return importlib.import_module("ext.Utilities.cog")
+
+
+def install_fake_sheets(spreadsheets: list[FakeSpreadsheet]) -> None:
+    """
+    Point the Utilities cog's `SheetsConnection` at in-memory spreadsheets.
+    Requests still go through the real Sheets scheduler.
+    """
+    from ext.Utilities import config
+
+    fake_client = FakeClient(spreadsheets)
+
+    async def client():
+        return fake_client
+    config.sheets_connection.client = client
+    # forget worksheets opened from previously installed spreadsheets
+    config.sheets_connection._steps.clear()
+
+
+def set_sheets_quota(quota_per_minute: int, burst: int) -> None:
+    """
+    Resize the Sheets scheduler's token bucket (the bot uses Google's real
+    quota; see `sheets.py`).
+    """
+    from ext.Utilities import sheets
+
+    sheets.scheduler.rate = (quota_per_minute - burst) / 60
+    sheets.scheduler.burst = burst
+    sheets.scheduler._tokens = float(burst)
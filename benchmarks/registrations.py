@@ -0,0 +1,99 @@
+"""
+Registration stress benchmark: how `/register` throughput scales with the
+number of concurrent registrants. For each concurrency level, a fresh pair of
+in-memory leaderboards gets `--registrants` new registrations followed by as
+many updates (renames), with at most that many commands in flight:
+
+    python -m benchmarks.registrations [--levels 1,2,5,10,20,40] [--registrants 40]
+        [--latency 0.15] [--jitter 0.1] [--quota-per-minute 60000]
+
+The quota defaults to far above Google's, so the numbers show the cog's own
+concurrency; the Sheets scheduler's worker threads (`SHEETS_MAX_WORKERS`)
+still bound how many requests run at once.
+"""
+import argparse
+import asyncio
+import time
+from typing import *
+
+from .fakes import FakeInteraction, FakeMember, SheetsFaults, leaderboard_spreadsheet
+from .offline import (
+    CLUB_LEADERBOARD_URL, FRIENDLY_LEADERBOARD_URL, import_utilities, install_fake_sheets, set_sheets_quota)
+from .stats import format_ms, percentile, print_table
+
+
+class RegistrationBenchmark:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.cog_module = import_utilities()
+        set_sheets_quota(args.quota_per_minute, args.burst)
+        self.rows = [["registrants in flight", "phase", "ops", "ops/s", "speedup", "p50 ms", "p99 ms", "sheets reqs"]]
+        self.baseline: Dict[str, float] = {}
+
+    async def phase(self, cog, level: int, name: str, members: list[FakeMember], real_name: Callable[[int], str], expected: str) -> None:
+        Utilities = self.cog_module.Utilities
+        semaphore = asyncio.Semaphore(level)
+        latencies = []
+
+        async def register(i: int, member: FakeMember):
+            async with semaphore:
+                interaction = FakeInteraction(member)
+                start = time.perf_counter()
+                await cog.interaction_check(interaction)
+                await asyncio.create_task(Utilities.register.callback(cog, interaction, real_name=real_name(i)))
+                latencies.append(time.perf_counter() - start)
+                if not any(expected in (m or "") for m in interaction.messages()):
+                    raise AssertionError(f"/register responded {interaction.messages()}, expected {expected!r}")
+
+        requests_before = sum(sum(s.requests.values()) for s in self.spreadsheets)
+        start = time.perf_counter()
+        await asyncio.gather(*(register(i, m) for i, m in enumerate(members)))
+        seconds = time.perf_counter() - start
+        throughput = len(members) / seconds
+        self.baseline.setdefault(name, throughput)
+        self.rows.append([
+            f"{level:,}", name, f"{len(members):,}", f"{throughput:,.1f}", f"{throughput / self.baseline[name]:.1f}x",
+            format_ms(percentile(latencies, 0.5)), format_ms(percentile(latencies, 0.99)),
+            f"{sum(sum(s.requests.values()) for s in self.spreadsheets) - requests_before:,}"])
+        print(f"... {level} in flight: {name} done in {seconds:.1f}s")
+
+    async def run_level(self, level: int) -> None:
+        args = self.args
+        faults = SheetsFaults(args.latency, args.jitter, 0.0, args.seed)
+        self.spreadsheets = [leaderboard_spreadsheet(url, faults) for url in (CLUB_LEADERBOARD_URL, FRIENDLY_LEADERBOARD_URL)]
+        install_fake_sheets(self.spreadsheets)
+        cog = self.cog_module.Utilities(None)
+        await cog.cog_load()
+        await cog._warm_up_task
+        try:
+            members = [FakeMember(f"level{level}-player{i}") for i in range(args.registrants)]
+            await self.phase(cog, level, "register", members, lambda i: f"Player {level}-{i}", "registered with name")
+            await self.phase(cog, level, "update", members, lambda i: f"Renamed {level}-{i}", "updated their registration")
+        finally:
+            await cog.cog_unload()
+
+    async def run(self) -> None:
+        for level in self.args.levels:
+            await self.run_level(level)
+        print()
+        print_table(self.rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=lambda s: [int(v) for v in s.split(",")], default=[1, 2, 5, 10, 20, 40],
+                        help="comma-separated numbers of registrants in flight")
+    parser.add_argument("--registrants", type=int, default=40, help="registrations (and then updates) per level")
+    parser.add_argument("--latency", type=float, default=0.15, help="seconds per Sheets request")
+    parser.add_argument("--jitter", type=float, default=0.1, help="up to this many extra seconds per Sheets request")
+    parser.add_argument("--quota-per-minute", type=int, default=60_000)
+    parser.add_argument("--burst", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if any(level < 1 for level in args.levels):
+        parser.error("--levels must be positive")
+    asyncio.run(RegistrationBenchmark(args).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Replays a trace recorded with `rc/trace` (slash commands, with personal data
+redacted) against the Utilities cog, offline, and reports command latency and
+Google Sheets quota use:
+
+    python -m benchmarks.replay TRACE [--speed 10] [--save RESULT] [--compare BASELINE]
+
+The local Sheets stand-in takes its latency and 429 rate from the requests in
+the trace. At `--speed N`, everything time-based is scaled by N: the gaps
+between commands, Sheets latency, the quota, retry backoff and the cog's loop
+intervals. Latencies and requests per minute are reported in trace time, so
+they compare directly with the recording (CPU time is not scaled, so keep N
+modest). To compare code versions, replay the same trace on each with
+`--save`, then pass one result to the other's `--compare`.
+
+Replays start from empty leaderboards. Commands with attachments
+(`/enter_scores_bulk`) and commands of other cogs are skipped.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import time
+from typing import *
+
+from .fakes import FakeInteraction, FakeMember, SheetsFaults, leaderboard_spreadsheet
+from .offline import (
+    CLUB_LEADERBOARD_URL, FRIENDLY_LEADERBOARD_URL, import_utilities, install_fake_sheets, set_sheets_quota)
+from .stats import LoopLagSampler, format_ms, percentile, print_table
+
+# the Utilities cog's loops, whose intervals are scaled with `--speed`
+LOOP_NAMES = ["revalidate_registry_indexes", "compact_registries", "push_scores", "pull_scores", "publish_standings"]
+
+
+def peak_per_minute(times: list[float]) -> int:
+    """
+    The most events in any 60-second window of `times` (in seconds).
+    """
+    times = sorted(times)
+    peak, start = 0, 0
+    for end, t in enumerate(times):
+        while times[start] <= t - 60:
+            start += 1
+        peak = max(peak, end - start + 1)
+    return peak
+
+
+def summarize(latencies: Dict[str, list[float]], sheets_times: list[float], sheets_methods: Dict[str, int], rate_limited: int) -> dict:
+    return {
+        "commands": {
+            command: {"count": len(values), "p50": percentile(values, 0.5), "p99": percentile(values, 0.99)}
+            for command, values in sorted(latencies.items()) if values},
+        "sheets": {
+            "requests": len(sheets_times),
+            "peak_per_minute": peak_per_minute(sheets_times),
+            "rate_limited": rate_limited,
+            "by_method": dict(sorted(sheets_methods.items())),
+        },
+    }
+
+
+def summarize_trace(events: list[dict]) -> dict:
+    """
+    What the recording itself measured.
+    """
+    commands = {e["id"]: e["command"] for e in events if e["type"] == "command"}
+    latencies = collections.defaultdict(list)
+    for e in events:
+        if e["type"] == "completion" and e["id"] in commands:
+            latencies[commands[e["id"]]].append(e["latency"])
+    sheets = [e for e in events if e["type"] == "sheets"]
+    return summarize(
+        latencies, [e["t"] for e in sheets], collections.Counter(e["method"] for e in sheets),
+        sum(e["outcome"] == "rate limited" for e in sheets))
+
+
+def trace_faults(events: list[dict], speed: float, seed: int) -> SheetsFaults:
+    """
+    Latency (median, with jitter up to the 90th percentile) and 429 rate of
+    the traced Sheets requests, scaled to the replay speed.
+    """
+    sheets = [e for e in events if e["type"] == "sheets"]
+    durations = [e["duration"] for e in sheets if e["outcome"] == "ok"]
+    if not durations:
+        return SheetsFaults(seed=seed)
+    median = percentile(durations, 0.5)
+    return SheetsFaults(
+        latency=median / speed,
+        jitter=(percentile(durations, 0.9) - median) / speed,
+        quota_error_rate=sum(e["outcome"] == "rate limited" for e in sheets) / len(sheets),
+        seed=seed)
+
+
+class Replay:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.speed = args.speed
+        # before `import_utilities()` changes the working directory
+        self.trace_path = os.path.abspath(args.trace)
+        self.cog_module = import_utilities()
+
+        import tracing
+        from ext.Utilities import sheets
+        self.events = tracing.read_trace(self.trace_path)
+        faults = trace_faults(self.events, self.speed, args.seed)
+        self.spreadsheets = [leaderboard_spreadsheet(url, faults) for url in (CLUB_LEADERBOARD_URL, FRIENDLY_LEADERBOARD_URL)]
+        install_fake_sheets(self.spreadsheets)
+        set_sheets_quota(round(sheets.SHEETS_QUOTA_PER_MINUTE * self.speed), sheets.SHEETS_BURST)
+        sheets.SHEETS_BACKOFF_BASE /= self.speed
+        sheets.SHEETS_BACKOFF_MAX /= self.speed
+
+        self.members: Dict[str, FakeMember] = {}
+        self.latencies: Dict[str, list[float]] = collections.defaultdict(list)
+        self.errors: collections.Counter[str] = collections.Counter()
+        self.skipped: collections.Counter[str] = collections.Counter()
+        self.lag_sampler = LoopLagSampler()
+
+    def member(self, alias: str) -> FakeMember:
+        if alias not in self.members:
+            self.members[alias] = FakeMember(alias)
+        return self.members[alias]
+
+    def arguments(self, options: Dict[str, Any]) -> Dict[str, Any] | None:
+        # `None` if the command can't be replayed
+        arguments = {}
+        for name, value in options.items():
+            if isinstance(value, dict) and "member" in value:
+                arguments[name] = self.member(value["member"])
+            elif isinstance(value, dict):
+                return None
+            else:
+                arguments[name] = value
+        return arguments
+
+    async def invoke(self, cog, command, event: dict, arguments: Dict[str, Any]) -> None:
+        interaction = FakeInteraction(self.member(event["user"]))
+        start = time.perf_counter()
+        try:
+            await cog.interaction_check(interaction)
+            await command.callback(cog, interaction, **arguments)
+        except Exception as e:
+            self.errors[event["command"]] += 1
+            print(f"... /{event['command']} (trace time {event['t']:.1f}s) failed: {e!r}")
+            return
+        self.latencies[event["command"]].append((time.perf_counter() - start) * self.speed)
+
+    async def run(self) -> dict:
+        cog = self.cog_module.Utilities(None)
+        for name in LOOP_NAMES:
+            loop = getattr(cog, name)
+            loop.change_interval(seconds=(loop.hours * 3600 + loop.minutes * 60 + loop.seconds) / self.speed)
+        commands = {c.qualified_name: c for c in cog.walk_app_commands()}
+
+        self.lag_sampler.start()
+        await cog.cog_load()
+        await cog._warm_up_task
+        # the warm-up's requests aren't part of the trace
+        requests_before = [len(s.request_times) for s in self.spreadsheets]
+        methods_before = [collections.Counter(s.requests) for s in self.spreadsheets]
+        command_events = [e for e in self.events if e["type"] == "command"]
+        print(f"Replaying {len(command_events)} command(s) spanning {command_events[-1]['t'] if command_events else 0:.0f}s "
+              f"of trace time at {self.speed:g}x speed...")
+        tasks = []
+        start = time.monotonic()
+        try:
+            for event in command_events:
+                command = commands.get(event["command"])
+                arguments = self.arguments(event["options"])
+                if command is None or arguments is None:
+                    self.skipped[event["command"]] += 1
+                    continue
+                await asyncio.sleep(max(0.0, start + event["t"] / self.speed - time.monotonic()))
+                # each in its own task, as Discord runs each command
+                tasks.append(asyncio.create_task(self.invoke(cog, command, event, arguments)))
+            await asyncio.gather(*tasks)
+            # count the writes the replayed commands still owe the sheets
+            for leaderboard_type in ("Club Leaderboard", "Friendly Leaderboard"):
+                await cog._push_leaderboard(leaderboard_type)
+        finally:
+            await cog.cog_unload()
+            self.lag_sampler.stop()
+
+        sheets_times = []
+        sheets_methods = collections.Counter()
+        for spreadsheet, times_before, counts_before in zip(self.spreadsheets, requests_before, methods_before):
+            sheets_times += [(t - start) * self.speed for t in spreadsheet.request_times[times_before:]]
+            for (_, method), count in (spreadsheet.requests - counts_before).items():
+                sheets_methods[method] += count
+        from ext.Utilities.sheets import scheduler
+        result = summarize(self.latencies, sheets_times, sheets_methods, scheduler.rate_limited)
+        result["errors"] = dict(self.errors)
+        result["skipped"] = dict(self.skipped)
+        result["loop_lag_p99"] = percentile(self.lag_sampler.lags, 0.99) if self.lag_sampler.lags else None
+        return result
+
+
+def print_comparison(recorded: dict, replayed: dict, baseline: dict | None) -> None:
+    columns = [("recorded", recorded)] + ([("baseline", baseline)] if baseline else []) + [("replayed", replayed)]
+    rows = [["command"] + [f"{label} {stat}" for label, _ in columns for stat in ("n", "p50 ms", "p99 ms")]]
+    commands = sorted(set().union(*(result["commands"] for _, result in columns)))
+    for command in commands:
+        row = [f"/{command}"]
+        for _, result in columns:
+            stats = result["commands"].get(command)
+            row += [f"{stats['count']:,}", format_ms(stats["p50"]), format_ms(stats["p99"])] if stats else ["-"] * 3
+        rows.append(row)
+    print_table(rows)
+    print()
+
+    rows = [["sheets"] + [label for label, _ in columns]]
+    for key, label in (("requests", "requests"), ("peak_per_minute", "peak requests/min"), ("rate_limited", "429s")):
+        rows.append([label] + [f"{result['sheets'][key]:,}" for _, result in columns])
+    methods = sorted(set().union(*(result["sheets"]["by_method"] for _, result in columns)))
+    for method in methods:
+        rows.append([f"  {method}"] + [f"{result['sheets']['by_method'].get(method, 0):,}" for _, result in columns])
+    print_table(rows)
+
+    if replayed["loop_lag_p99"] is not None:
+        print(f"\nEvent loop lag p99 during the replay: {format_ms(replayed['loop_lag_p99'])} ms (real time).")
+    if replayed["errors"]:
+        print(f"\nFailed commands: {replayed['errors']}")
+    if replayed["skipped"]:
+        print(f"Skipped commands: {replayed['skipped']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", help="a trace saved by `rc/trace stop`")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay this many times faster than recorded")
+    parser.add_argument("--save", help="write the replay's results to this JSON file")
+    parser.add_argument("--compare", help="results saved (with --save) by a replay of another code version")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    save_path = os.path.abspath(args.save) if args.save else None
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    replay = Replay(args)
+    replayed = asyncio.run(replay.run())
+    replayed["trace"] = replay.trace_path
+    replayed["speed"] = replay.speed
+    print()
+    print_comparison(summarize_trace(replay.events), replayed, baseline)
+    if save_path:
+        with open(save_path, "w") as f:
+            json.dump(replayed, f, indent=2)
+        print(f"\nSaved the results to {save_path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the vectorized rescore (`ruleset.score_games()`) against scoring
+the same synthetic games one at a time with
+`helpers.calculate_placement_and_final_score()`, as `/enter_scores` does.
+Needs no Discord, Google or `config.env` (see `offline.py`):
+
+    python -m benchmarks.rescore [game_count]
+"""
+import numpy as np
+import sys
+import time
+
+from .fakes import FakeMember
+from .offline import import_utilities
+
+import_utilities()
+
+from ext.Utilities.helpers import PlayerScore, calculate_placement_and_final_score
+from ext.Utilities.ruleset import Ruleset, SEAT_PRIORITY, score_games
+
+SEATS = ["East", "South", "West", "North"]
+
+RULESET = Ruleset(
+    tiebreaker_method="split",
+    chombo_penalty=-20,
+    starting_points={"Yonma": 25000, "Sanma": 35000},
+    uma={"Yonma": {"Hanchan": [15, 5, -5, -15]}, "Sanma": {"Hanchan": [15, 0, -15]}},
+)
+
+
+def synthetic_games(game_count: int, seed: int = 0) -> np.ndarray:
+    """
+    Yonma raw scores (multiples of 100 summing to 100,000) with plenty of ties.
+    """
+    rng = np.random.default_rng(seed)
+    raw_scores = rng.integers(-50, 500, size=(game_count, 4)) * 100
+    raw_scores[:, 3] = 100_000 - raw_scores[:, :3].sum(axis=1)
+    # tie ~10% of games
+    tied = rng.random(game_count) < 0.1
+    raw_scores[tied, 1] = raw_scores[tied, 0]
+    raw_scores[tied, 3] = 100_000 - raw_scores[tied, :3].sum(axis=1)
+    return raw_scores
+
+
+def main(game_count: int) -> None:
+    raw_scores = synthetic_games(game_count)
+    seat_priorities = np.tile([SEAT_PRIORITY[s] for s in SEATS], (game_count, 1))
+    chombo_counts = np.zeros_like(raw_scores)
+    chombo_counts[::50, 0] = 1
+
+    start = time.perf_counter()
+    placements, umas, penalties, final_scores = score_games(
+        RULESET, "Yonma", "Hanchan", raw_scores.astype(float), seat_priorities, chombo_counts)
+    vectorized = time.perf_counter() - start
+
+    members = [FakeMember(f"player{i}") for i in range(len(SEATS))]
+    games = [[PlayerScore(seat, member, raw_score, chombo) for seat, member, raw_score, chombo in zip(SEATS, members, r, c)]
+             for r, c in zip(raw_scores.tolist(), chombo_counts.tolist())]
+    start = time.perf_counter()
+    for players in games:
+        calculate_placement_and_final_score("Yonma", "Hanchan", players, ruleset=RULESET)
+    looped = time.perf_counter() - start
+    expected = [[(p.placement, p.uma, p.penalty, p.final_score) for p in players] for players in games]
+
+    expected = np.array(expected, dtype=float)
+    assert np.array_equal(placements, expected[:, :, 0])
+    assert np.allclose(umas, expected[:, :, 1])
+    assert np.allclose(penalties, expected[:, :, 2])
+    assert np.allclose(final_scores, expected[:, :, 3])
+
+    print(f"{game_count:,} games: per-game loop {looped:.3f}s, vectorized {vectorized:.3f}s ({looped / vectorized:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
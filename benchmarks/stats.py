@@ -0,0 +1,48 @@
+"""
+Helpers shared by the benchmarks: percentiles, event loop lag and reports.
+"""
+import asyncio
+import time
+
+
+def format_ms(seconds: float) -> str:
+    milliseconds = seconds * 1000
+    return f"{milliseconds:,.1f}" if milliseconds >= 10 else f"{milliseconds:.3f}"
+
+
+def percentile(values: list[float], q: float) -> float:
+    # nearest rank
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+class LoopLagSampler:
+    """
+    Like `metrics.monitor_loop_lag()`, but at a finer interval and with
+    samples that can be reset between scenarios.
+    """
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _sample(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._sample())
+
+    def stop(self) -> None:
+        self._task.cancel()
+
+
+def print_table(rows: list[list[str]]) -> None:
+    """
+    The first row is the header; the first column is left-aligned, the rest right-aligned.
+    """
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(cell.ljust(w) if i == 0 else cell.rjust(w) for i, (cell, w) in enumerate(zip(row, widths))))
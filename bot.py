@@ -1,17 +1,28 @@
 # note that `global_stuff` loads the `config.env` variables and configures logging
 from global_stuff import assert_getenv
 
+import asyncio
 import discord
+import io
 from discord import app_commands, Interaction
 from discord.ext import commands
+from command_sync import command_sync
 import logging
+import metrics
+import profiling
+import time
+import tracing
 import traceback
+from os import getenv
+from typing import *
 
 DISCORD_TOKEN = assert_getenv("bot_token")
 EXTENSIONS_FILE = assert_getenv("extensions_file")
 COMMAND_PREFIX = assert_getenv("command_prefix")
 BOT_MAINTAINER_ID = assert_getenv("bot_maintainer_id")
 BOT_TEST_CHANNEL_ID = assert_getenv("bot_test_channel_id")
+# optional; serve Prometheus metrics on this (localhost) port
+METRICS_PORT = getenv("metrics_port")
 
 try:
     with open(EXTENSIONS_FILE, 'r') as f:
@@ -28,20 +39,23 @@ bot = commands.Bot(
     command_prefix=COMMAND_PREFIX,
     intents=intents)
 
+metrics.gauge("bot_gateway_latency_seconds", "Discord gateway heartbeat latency.", callback=lambda: bot.latency)
+
 # bot commands (non-slash; only for the admin/owner)
 # ====================
 @bot.command(name='sync', hidden=True)
 @commands.is_owner()
 async def sync(ctx: commands.Context):
-    # note that global commands need to be explicitly copied to the guild
-    await bot.tree.sync(guild=ctx.guild)
-    await ctx.send(f"Synced slash commands exclusive to this server ({ctx.guild.name}).")
+    # note that global commands need to be explicitly copied to the guild.
+    # commands are also synced automatically on startup whenever they changed
+    count = await command_sync.sync(bot.tree, ctx.guild)
+    await ctx.send(f"Synced {count} slash command(s) exclusive to this server ({ctx.guild.name}).")
 
 @bot.command(name='sync_global', hidden=True)
 @commands.is_owner()
 async def sync_global(ctx: commands.Context):
-    await bot.tree.sync()
-    await ctx.send("Synced global slash commands.")
+    count = await command_sync.sync(bot.tree)
+    await ctx.send(f"Synced {count} global slash command(s).")
 
 # Assuming we configured the service to restart the bot automatically,
 # we only need to gracefully shut down the bot for the "restart" command.
@@ -78,6 +92,102 @@ async def reload_extension(ctx: commands.Context, extension_name: str=""):
         
         await ctx.send(f"Reloaded all extensions: {EXTENSIONS}.")
 
+@bot.command(name='stats', hidden=True)
+@commands.is_owner()
+async def stats(ctx: commands.Context):
+    def ms(seconds: float | None) -> str:
+        return "n/a" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+    lines = [f"**Gateway latency:** {ms(bot.latency)}"]
+    lines.append(f"**Event loop lag:** last {ms(metrics.loop_lag_last.values.get(()))}, "
+                 f"p99 {ms(metrics.loop_lag.quantile(0.99))}")
+
+    lines.append("**Commands** (count, p50, p95, max):")
+    for (command,), series in sorted(metrics.command_latency.series.items()):
+        lines.append(f"- `{command}`: {series.count}, {ms(metrics.command_latency.quantile(0.5, command=command))}, "
+                     f"{ms(metrics.command_latency.quantile(0.95, command=command))}, {ms(series.max)}")
+
+    lines.append("**Lock waits** (count, mean, max):")
+    for (lock,), series in sorted(metrics.lock_wait.series.items()):
+        lines.append(f"- `{lock}`: {series.count}, {ms(series.sum / series.count)}, {ms(series.max)}")
+
+    sheets_latency = metrics.registry.metrics.get("bot_sheets_request_seconds")
+    if sheets_latency is not None:
+        lines.append("**Sheets requests** (count, mean, max):")
+        for (worksheet, method), series in sorted(sheets_latency.series.items()):
+            lines.append(f"- `{worksheet or '-'}.{method}`: {series.count}, {ms(series.sum / series.count)}, {ms(series.max)}")
+
+    # keep within Discord's message length limit
+    response = ""
+    for line in lines:
+        if len(response) + len(line) > 1900:
+            response += "\n..."
+            break
+        response += line + "\n"
+    await ctx.send(response)
+
+@bot.command(name='loop_debug', hidden=True)
+@commands.is_owner()
+async def loop_debug(ctx: commands.Context, state: Literal["on", "off"], slow_callback_ms: int = 100):
+    profiling.set_loop_debug(state == "on", slow_callback_ms / 1000)
+    if state == "on":
+        await ctx.send(f"asyncio debug mode on: callbacks blocking the loop for over {slow_callback_ms} ms are logged. "
+                       "Note that debug mode itself slows the bot down a little.")
+    else:
+        await ctx.send("asyncio debug mode off.")
+
+@bot.command(name='profile', hidden=True)
+@commands.is_owner()
+async def profile(ctx: commands.Context, action: Literal["start", "stop"], seconds: int = 30):
+    if action == "stop":
+        if not profiling.profiler.running:
+            await ctx.send("No profiling session is running.")
+            return
+        profiling.profiler.stop()
+        return
+
+    def on_stop():
+        # post the results where the session was started
+        report = profiling.dump_report()
+        logging.info(report)
+        task = asyncio.create_task(ctx.send(
+            "Profiling session finished.",
+            file=discord.File(io.BytesIO(report.encode()), filename="profile.txt")))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    try:
+        profiling.profiler.start(seconds, on_stop)
+    except (RuntimeError, ValueError) as e:
+        await ctx.send(f"Could not start profiling: {e}")
+        return
+    await ctx.send(f"Profiling the event loop for {seconds}s (`{COMMAND_PREFIX}profile stop` to stop early).")
+
+@bot.command(name='profile_dump', hidden=True)
+@commands.is_owner()
+async def profile_dump(ctx: commands.Context, top: int = 30, sort: Literal["tottime", "cumulative", "ncalls"] = "tottime"):
+    report = profiling.dump_report(top, sort)
+    logging.info(report)
+    await ctx.send(file=discord.File(io.BytesIO(report.encode()), filename="profile.txt"))
+
+@bot.command(name='trace', hidden=True)
+@commands.is_owner()
+async def trace(ctx: commands.Context, action: Literal["start", "stop"], minutes: float = 60):
+    if action == "start":
+        try:
+            tracing.recorder.start(minutes)
+        except RuntimeError as e:
+            await ctx.send(str(e))
+            return
+        await ctx.send(f"Recording slash commands and Sheets requests for up to {minutes:g} minute(s) "
+                       f"(`{COMMAND_PREFIX}trace stop` to stop early).")
+    else:
+        try:
+            path, event_count = await tracing.recorder.stop()
+        except RuntimeError as e:
+            await ctx.send(str(e))
+            return
+        await ctx.send(f"Saved a trace of {event_count} event(s) to `{path}`. Replay it with `python -m benchmarks.replay {path}`.")
+
 # bot events
 # ====================
 @bot.event
@@ -107,6 +217,8 @@ async def on_command_error(ctx: commands.Context, error: commands.CommandError):
 # https://stackoverflow.com/a/75815621/21452015
 # also see here: https://discordpy.readthedocs.io/en/stable/ext/commands/api.html#discord.ext.commands.Cog.cog_app_command_error
 async def on_app_command_error(interaction: Interaction, error: app_commands.AppCommandError):
+    if interaction.command is not None:
+        metrics.command_errors.inc(command=f"/{interaction.command.qualified_name}")
     if isinstance(error, app_commands.errors.MissingRole):
         await interaction.response.send_message(f"You do not have the required role ({error.missing_role}) to use this command.", ephemeral=True)
     elif isinstance(error, app_commands.errors.MissingAnyRole):
@@ -127,12 +239,34 @@ async def on_app_command_error(interaction: Interaction, error: app_commands.App
         raise error
 bot.tree.on_error = on_app_command_error
 
+_background_tasks = set()  # keep references so the tasks aren't garbage-collected
+
+async def sync_commands_when_ready():
+    # in the background, once the extensions are loaded (so the tree is
+    # complete) and the guilds are known; only changed scopes are synced
+    await bot.wait_until_ready()
+    start = time.perf_counter()
+    try:
+        await command_sync.sync_changed(bot)
+    except Exception as e:
+        logging.error(f"Failed to sync the slash commands: {e!r}")
+        return
+    logging.info(f"Startup timing: checking the slash commands took {time.perf_counter() - start:.2f}s.")
+
 async def setup_hook():
+    _background_tasks.add(asyncio.create_task(metrics.monitor_loop_lag()))
+    if METRICS_PORT:
+        await metrics.start_http_server(int(METRICS_PORT))
+
     # note that extensions should be loaded before the slash commands
     # are synched. Here we ensure that by only allowing manual synching
-    # once the bot finishes loading (i.e., `setup_hook()` has been called)
+    # once the bot finishes loading (i.e., `setup_hook()` has been called),
+    # and by starting the automatic sync after the extensions are loaded
     for extension in EXTENSIONS:
+        start = time.perf_counter()
         await bot.load_extension(extension)
+        logging.info(f"Startup timing: loading extension {extension} took {time.perf_counter() - start:.2f}s.")
+    _background_tasks.add(asyncio.create_task(sync_commands_when_ready()))
 bot.setup_hook = setup_hook
 bot.remove_command('help')  # not bothering with a help command
 
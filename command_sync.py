@@ -0,0 +1,100 @@
+import asyncio
+import discord
+import hashlib
+import json
+import logging
+import os
+from discord import app_commands
+from discord.ext import commands
+from typing import *
+
+# fingerprints of the command trees as last synced, per application and scope
+COMMAND_SYNC_PATH = "./data/command_sync.json"
+
+
+def tree_fingerprint(tree: app_commands.CommandTree, guild: discord.abc.Snowflake | None = None) -> str:
+    """
+    A stable hash of what `tree.sync(guild=guild)` would send to Discord.
+    """
+    payload = sorted((command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+                     key=lambda command: (command.get("type", 1), command["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class CommandSync:
+    """
+    Syncs the slash commands of each scope (global, and each guild) only if
+    they changed since that scope was last synced, going by the fingerprints
+    saved in `path`. Restarts that don't touch the commands cost no requests,
+    so Discord's sync rate limit is left for the syncs that matter.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._fingerprints: Dict[str, str] | None = None
+
+    def _read(self) -> Dict[str, str]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            # at worst, every scope gets synced once more
+            logging.warning(f"Ignoring the unreadable {self.path}: {e!r}")
+            return {}
+
+    def _write(self, fingerprints: Dict[str, str]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(fingerprints, f, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+
+    async def _get_fingerprints(self) -> Dict[str, str]:
+        if self._fingerprints is None:
+            self._fingerprints = await asyncio.to_thread(self._read)
+        return self._fingerprints
+
+    @staticmethod
+    def _key(tree: app_commands.CommandTree, guild: discord.abc.Snowflake | None) -> str:
+        # a different bot account has its own commands
+        return f"{tree.client.application_id}/{guild.id if guild is not None else 'global'}"
+
+    async def sync(self, tree: app_commands.CommandTree, guild: discord.abc.Snowflake | None = None) -> int:
+        """
+        Sync one scope unconditionally (e.g., for `rc/sync`) and remember its
+        fingerprint. Returns the number of commands synced.
+        """
+        fingerprint = tree_fingerprint(tree, guild)
+        synced = await tree.sync(guild=guild)
+        fingerprints = await self._get_fingerprints()
+        fingerprints[self._key(tree, guild)] = fingerprint
+        await asyncio.to_thread(self._write, dict(fingerprints))
+        return len(synced)
+
+    async def sync_changed(self, bot: commands.Bot) -> None:
+        """
+        Sync the global commands, and those of each guild the bot is in,
+        wherever they changed since the last sync; one request per scope.
+        """
+        fingerprints = await self._get_fingerprints()
+        unchanged = 0
+        for guild in [None, *bot.guilds]:
+            scope = "globally" if guild is None else f"to {guild.name} ({guild.id})"
+            stored = fingerprints.get(self._key(bot.tree, guild))
+            if stored == tree_fingerprint(bot.tree, guild):
+                unchanged += 1
+                continue
+            if stored is None and guild is not None and not bot.tree.get_commands(guild=guild):
+                # this guild never had commands of its own
+                unchanged += 1
+                continue
+            try:
+                count = await self.sync(bot.tree, guild)
+            except discord.HTTPException as e:
+                logging.error(f"Failed to sync the slash commands {scope}: {e!r}")
+                continue
+            logging.info(f"Synced {count} slash command(s) {scope}; they changed since the last sync.")
+        logging.info(f"Slash commands were already up to date in {unchanged} scope(s).")
+
+
+command_sync = CommandSync(COMMAND_SYNC_PATH)
@@ -17,4 +17,4 @@ sudo systemctl daemon-reload
 cd "$(dirname "$0")/.."
 
 rm -r .venv/
-rm logs/*.log
+rm -f logs/*.log logs/*.log.*
@@ -2,94 +2,290 @@ import asyncio
 import datetime
 import discord
 import logging
+import time
 from discord.ext import commands, tasks
+from os import getenv
 from typing import *
-from .same_day_event import RecurringSameDayEvent
+from .events_file import EventsFile
+from .reminders import ReminderScheduler
+from .same_day_event import RecurringSameDayEvent, posted_event_urls
 
 from global_stuff import assert_getenv
 
 GUILD_ID                 = int(assert_getenv("guild_id"))
 ANNOUNCEMENTS_CHANNEL_ID = int(assert_getenv("announcements_channel_id"))
 
-excluded_dates = {
-    # datetime.date(2025, 9, 6)  # QCR local tournament 2025
-}
-
-events = [
-    RecurringSameDayEvent(
-        starting_date=datetime.date(year=2025, month=7, day=12),
-        frequency=datetime.timedelta(weeks=4),
-        remind_before=datetime.timedelta(days=1),
-        name="Saturday Afternoon Riichi",
-        description="This is our 4-weekly Saturday meetup! No experience required -- we'll be happy to teach!",
-        start_time=datetime.time(hour=13),
-        end_time=datetime.time(hour=18),
-        location="Element Eatery (5350 Medpace Way, Cincinnati, OH 45227)",
-        excluded_dates=excluded_dates
-    ),
-    RecurringSameDayEvent(
-        starting_date=datetime.date(year=2025, month=7, day=6),
-        frequency=datetime.timedelta(weeks=2),
-        remind_before=datetime.timedelta(days=1),
-        name="Sunday Afternoon Riichi",
-        description="This is our biweekly Sunday meetup! No experience required -- we'll be happy to teach!",
-        start_time=datetime.time(hour=13),
-        end_time=datetime.time(hour=18),
-        location="Element Eatery (5350 Medpace Way, Cincinnati, OH 45227)",
-        excluded_dates=excluded_dates
-    )
-]
+# which reminders were sent, so restarts don't need to read message history
+REMINDER_STATE_PATH = "./data/reminders.json"
+
+# the recurring events; edits are picked up without reloading the cog
+EVENTS_FILE = getenv("events_file") or "./ext/EventPoster/events.json"
+EVENTS_FILE_CHECK_SECONDS = 30
+# minimum gap between posting two scheduled events, so a batch of look-ahead
+# occurrences doesn't trip Discord's rate limits
+EVENT_POST_INTERVAL = 2.0
+# how many reminders are reconciled at once
+RECONCILE_CONCURRENCY = 4
+
+# scheduled events that are over no longer count as posted
+ENDED_STATUSES = (discord.EventStatus.completed, discord.EventStatus.canceled)
 
 class EventPoster(commands.Cog):
-    def __init__(self, bot: commands.Bot, events: List[RecurringSameDayEvent]):
+    def __init__(self, bot: commands.Bot, events_file: EventsFile, events: List[RecurringSameDayEvent]):
         self.bot = bot
+        self.events_file = events_file
         self.events = events
+        self.reminders = ReminderScheduler(REMINDER_STATE_PATH)
         # the following are fetched in `self.async_setup()`
         self.guild: discord.Guild = None
+        self.announcements_channel: discord.TextChannel = None
+        # the guild's scheduled events by ID, from the gateway cache; kept up to
+        # date by the `on_scheduled_event_*` listeners and `resync_events`
+        self.scheduled_events: Dict[int, discord.ScheduledEvent] = {}
+        # one reconciliation at a time, so a gateway event arriving mid-post
+        # never posts the same occurrence twice
+        self._reconcile_lock = asyncio.Lock()
+        self._last_post = -EVENT_POST_INTERVAL  # monotonic time
+        # the first `on_ready` is the startup, which `resync_events` already covers
+        self._skip_next_ready = not bot.is_ready()
+        # background tasks, so their errors are reported and `cog_unload()` can cancel them
+        self._tasks: Set[asyncio.Task] = set()
 
-    @tasks.loop(hours=12, reconnect=True)
-    async def try_post_events(self):
-        logging.info("Checking if any event needs to be posted...")
-        
-        curr_events = await self.guild.fetch_scheduled_events()
+    def _spawn(self, coro: Coroutine, description: str) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
 
-        for e in self.events:
-            # for each intended event, check if it's already posted on Discord.
-            # if already posted, reconcile the bot's internal state for reminder posting.
-            # if not already posted, post the event and set up reminders.
-            matching_events = [curr_event for curr_event in curr_events if curr_event.name == e.name]
-            if matching_events:
-                await e.reconcile_event_reminder(matching_events)
+        def on_done(task: asyncio.Task):
+            self._tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logging.error(f"Error in {description}: {task.exception()!r}")
+        task.add_done_callback(on_done)
+        return task
+
+    def _track(self, scheduled_event: discord.ScheduledEvent):
+        if scheduled_event.status in ENDED_STATUSES:
+            self.scheduled_events.pop(scheduled_event.id, None)
+        else:
+            self.scheduled_events[scheduled_event.id] = scheduled_event
+
+    def _load_from_cache(self):
+        self.scheduled_events = {}
+        for scheduled_event in self.guild.scheduled_events:
+            self._track(scheduled_event)
+
+    async def _post_batch(self, batch: List[Tuple[datetime.date, RecurringSameDayEvent]]):
+        """
+        Post occurrences, soonest first, at most one per `EVENT_POST_INTERVAL`.
+        """
+        for date, e in sorted(batch, key=lambda item: item[0]):
+            await asyncio.sleep(max(0.0, self._last_post + EVENT_POST_INTERVAL - time.monotonic()))
+            self._last_post = time.monotonic()
+            try:
+                self._track(await e.post_occurrence(date))
+            except Exception as error:
+                logging.error(f"Error in posting event \"{e.name}\" on {date}: {error!r}")
+
+    async def _reconcile_named(self, *names: str):
+        """
+        Post the occurrences missing from each named recurring event's
+        look-ahead (in one batch), then make sure the reminders of its posted
+        occurrences are (or will be) sent.
+        """
+        async with self._reconcile_lock:
+            events = [e for e in self.events if e.name in names]
+            batch = []
+            for e in events:
+                try:
+                    matching_events = [se for se in self.scheduled_events.values() if se.name == e.name]
+                    batch += [(date, e) for date in e.missing_dates(matching_events)]
+                except Exception as error:
+                    logging.error(f"Error in reconciling event \"{e.name}\": {error!r}")
+            await self._post_batch(batch)
+
+            occurrences = [(e, se) for e in events for se in self.scheduled_events.values() if se.name == e.name]
+            posted_urls = await self._scan_reminder_history(occurrences)
+            semaphore = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+
+            async def reconcile_reminder(e: RecurringSameDayEvent, scheduled_event: discord.ScheduledEvent):
+                if posted_urls is not None and e.reminder_channel.id not in posted_urls:
+                    return  # the history couldn't be read; try again next time
+                async with semaphore:
+                    try:
+                        await e.reconcile_event_reminder(
+                            scheduled_event, posted_urls[e.reminder_channel.id] if posted_urls is not None else None)
+                    except Exception as error:
+                        logging.error(f"Error in reconciling event \"{e.name}\": {error!r}")
+            await asyncio.gather(*(reconcile_reminder(e, se) for e, se in occurrences))
+
+    async def _scan_reminder_history(self, occurrences: List[Tuple[RecurringSameDayEvent, discord.ScheduledEvent]]) -> Dict[int, Set[str]] | None:
+        """
+        Without the reminder scheduler's state file, fetch the history of each
+        reminder channel once, from the earliest time one of the occurrences'
+        reminders could have been posted. Returns the event URLs found by
+        channel ID (missing if the history couldn't be read), or None if the
+        state file makes this unnecessary.
+        """
+        if self.reminders.state_loaded:
+            return None
+        posted_urls = {e.reminder_channel.id: set() for e, _ in occurrences}
+        search_starts: Dict[int, Tuple[discord.TextChannel, datetime.datetime]] = {}
+        for e, scheduled_event in occurrences:
+            if scheduled_event.start_time is None:
                 continue
+            start = e.history_search_start(scheduled_event)
+            channel = e.reminder_channel
+            if start is not None and (channel.id not in search_starts or start < search_starts[channel.id][1]):
+                search_starts[channel.id] = (channel, start)
+        results = await asyncio.gather(
+            *(posted_event_urls(channel, self.guild.me, start) for channel, start in search_starts.values()),
+            return_exceptions=True)
+        for (channel, _), result in zip(search_starts.values(), results):
+            if isinstance(result, Exception):
+                logging.error(f"Error in reading the history of #{channel}: {result!r}")
+                del posted_urls[channel.id]
+            else:
+                posted_urls[channel.id] = result
+        return posted_urls
+
+    async def _apply_events(self, events: List[RecurringSameDayEvent]):
+        async with self._reconcile_lock:
+            for e in events:
+                e.set_guild_and_channel(self.guild, self.announcements_channel, self.reminders)
+            self.events = events
+            # reminders may be due at different times now; reconciling
+            # schedules them again (reminders already sent stay sent)
+            self.reminders.cancel_all()
+        await self._reconcile_named(*(e.name for e in self.events))
+
+    def _is_ours(self, scheduled_event: discord.ScheduledEvent) -> bool:
+        # listeners may fire before `async_setup()` is done
+        return self.guild is not None and scheduled_event.guild_id == self.guild.id
 
-            asyncio.create_task(e.post_next_event_and_schedule_reminder())
+    @commands.Cog.listener()
+    async def on_scheduled_event_create(self, scheduled_event: discord.ScheduledEvent):
+        if not self._is_ours(scheduled_event):
+            return
+        if scheduled_event.id in self.scheduled_events:
+            return  # we posted it ourselves and already reconciled it
+        self._track(scheduled_event)
+        await self._reconcile_named(scheduled_event.name)
+
+    @commands.Cog.listener()
+    async def on_scheduled_event_update(self, before: discord.ScheduledEvent, after: discord.ScheduledEvent):
+        if not self._is_ours(after):
+            return
+        self._track(after)
+        # a reminder scheduled for the old start time (or for an event that is over) is stale
+        if before.start_time != after.start_time or after.status in ENDED_STATUSES or before.name != after.name:
+            for e in self.events:
+                e.cancel_reminder(after.id)
+        await self._reconcile_named(before.name, after.name)
+
+    @commands.Cog.listener()
+    async def on_scheduled_event_delete(self, scheduled_event: discord.ScheduledEvent):
+        if not self._is_ours(scheduled_event):
+            return
+        self.scheduled_events.pop(scheduled_event.id, None)
+        for e in self.events:
+            e.cancel_reminder(scheduled_event.id)
+        await self._reconcile_named(scheduled_event.name)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # after a reconnect, the cache is rebuilt from scratch and may hold
+        # changes we never got an event for
+        if self._skip_next_ready:
+            self._skip_next_ready = False
+            return
+        if self.guild is None:
+            return
+        self.guild = self.bot.get_guild(GUILD_ID) or self.guild
+        self._load_from_cache()
+        await self._reconcile_named(*(e.name for e in self.events))
+
+    @tasks.loop(hours=24, reconnect=True)
+    async def resync_events(self):
+        """
+        Safety net for anything the listeners missed: rebuild the view over
+        REST and reconcile every recurring event. The first iteration (at
+        startup) uses the gateway cache instead.
+        """
+        if self.resync_events.current_loop == 0:
+            self._load_from_cache()
+        else:
+            logging.info("Resyncing scheduled events...")
+            self.scheduled_events = {}
+            for scheduled_event in await self.guild.fetch_scheduled_events():
+                self._track(scheduled_event)
+
+        await self._reconcile_named(*(e.name for e in self.events))
+
+    @tasks.loop(seconds=EVENTS_FILE_CHECK_SECONDS)
+    async def watch_events_file(self):
+        """
+        Hot-reload the events file. A broken edit is logged and ignored, and
+        the previous events stay in effect.
+        """
+        if not self.events_file.changed():
+            return
+        try:
+            events = await asyncio.to_thread(self.events_file.load)
+        except (OSError, ValueError) as error:
+            logging.error(f"Ignoring the changes to {self.events_file.path}: {error}")
+            return
+        logging.info(f"Reloaded {len(events)} recurring event(s) from {self.events_file.path}.")
+        await self._apply_events(events)
 
     async def async_setup(self):
         await self.bot.wait_until_ready()
-        self.guild = self.bot.get_guild(GUILD_ID)
-        announcements_channel = self.guild.get_channel(ANNOUNCEMENTS_CHANNEL_ID)
+        guild = self.bot.get_guild(GUILD_ID)
+        announcements_channel = guild.get_channel(ANNOUNCEMENTS_CHANNEL_ID)
         
         if announcements_channel is None:
             raise Exception(f"Announcements channel ID specified ({ANNOUNCEMENTS_CHANNEL_ID}) but no channel found!")
         elif not isinstance(announcements_channel, discord.TextChannel):
             raise Exception(f"Announcements found (ID: {ANNOUNCEMENTS_CHANNEL_ID}) but it's not a text channel!")
         
+        await asyncio.to_thread(self.reminders.load)
+        self.reminders.start()
         for e in self.events:
-            e.set_guild_and_channel(self.guild, announcements_channel)
+            e.set_guild_and_channel(guild, announcements_channel, self.reminders)
+
+        self.announcements_channel = announcements_channel
+        self.guild = guild
+        self.resync_events.start()
+        self.watch_events_file.start()
+
+    async def cog_load(self):
+        self._spawn(self.async_setup(), "setting up EventPoster")
+
+    async def cog_unload(self):
+        for task in list(self._tasks):
+            task.cancel()
+        self.resync_events.cancel()
+        self.watch_events_file.cancel()
+        # the next load schedules the pending reminders again
+        self.reminders.stop()
+
+    # ensure bot is ready before resync_events is called
+    @resync_events.before_loop
+    async def resync_events_ready(self):
+        await self.bot.wait_until_ready()
 
-        self.try_post_events.start()
+    @resync_events.error
+    async def resync_events_error(self, error):
+        logging.error(f"Error in resyncing events: {error}")
 
-    # ensure bot is ready before try_post_events is called
-    @try_post_events.before_loop
-    async def try_post_events_ready(self):
+    @watch_events_file.before_loop
+    async def watch_events_file_ready(self):
         await self.bot.wait_until_ready()
 
-    @try_post_events.error
-    async def try_post_events_error(self, error):
-        logging.error(f"Error in posting events: {error}")
+    @watch_events_file.error
+    async def watch_events_file_error(self, error):
+        logging.error(f"Error in reloading the events file: {error}")
 
 async def setup(bot: commands.Bot):
     logging.info(f"Loading cog `{EventPoster.__name__}`...")
-    instance = EventPoster(bot, events)
-    asyncio.create_task(instance.async_setup())
+    events_file = EventsFile(EVENTS_FILE)
+    instance = EventPoster(bot, events_file, events_file.load())
     await bot.add_cog(instance, guild=discord.Object(id=GUILD_ID))
\ No newline at end of file
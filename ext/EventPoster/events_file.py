@@ -0,0 +1,101 @@
+import datetime
+import json
+import os
+from typing import List
+
+from .recurrence import parse_recurrence
+from .same_day_event import RecurringSameDayEvent
+
+# Discord's limit on scheduled event names
+MAX_NAME_LEN = 100
+
+
+def _parse_dates(values: list) -> set[datetime.date]:
+    if not isinstance(values, list):
+        raise ValueError("excluded_dates must be a list")
+    return {datetime.date.fromisoformat(v) for v in values}
+
+
+def parse_events(config: dict) -> List[RecurringSameDayEvent]:
+    """
+    Build the recurring events of a parsed events file (see `events.json`).
+    Raises `ValueError` (naming the event) if anything is malformed.
+    """
+    try:
+        default_look_ahead = int(config.get("look_ahead", 1))
+        shared_excluded_dates = _parse_dates(config.get("excluded_dates", []))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"top level: {e}") from None
+    if not isinstance(config.get("events", []), list):
+        raise ValueError("events must be a list")
+    events = []
+    for i, event in enumerate(config.get("events", [])):
+        if not isinstance(event, dict):
+            raise ValueError(f"event #{i + 1}: must be an object")
+        name = event.get("name", f"#{i + 1}")
+        try:
+            if not isinstance(event["name"], str) or not 0 < len(event["name"]) <= MAX_NAME_LEN:
+                raise ValueError(f"the name must be 1 to {MAX_NAME_LEN} characters long")
+            if any(e.name == event["name"] for e in events):
+                raise ValueError("another event has the same name")
+            if not isinstance(event.get("description", ""), str) or not isinstance(event["location"], str):
+                raise ValueError("the description and location must be strings")
+            if not isinstance(event["recurrence"], dict):
+                raise ValueError("the recurrence must be an object")
+            start_time = datetime.time.fromisoformat(event["start_time"])
+            end_time = datetime.time.fromisoformat(event["end_time"])
+            if end_time <= start_time:
+                raise ValueError("the end time must be after the start time")
+            look_ahead = int(event.get("look_ahead", default_look_ahead))
+            if look_ahead < 1:
+                raise ValueError("look_ahead must be at least 1")
+            events.append(RecurringSameDayEvent(
+                rule=parse_recurrence(event["recurrence"]),
+                remind_before=datetime.timedelta(hours=float(event["remind_before_hours"])),
+                name=event["name"],
+                description=event.get("description", ""),
+                start_time=start_time,
+                end_time=end_time,
+                location=event["location"],
+                excluded_dates=shared_excluded_dates | _parse_dates(event.get("excluded_dates", [])),
+                look_ahead=look_ahead))
+        except KeyError as e:
+            raise ValueError(f"event \"{name}\": missing {e}") from None
+        except (TypeError, ValueError, OverflowError) as e:
+            raise ValueError(f"event \"{name}\": {e}") from None
+    return events
+
+
+class EventsFile():
+    """
+    The JSON file the recurring events are configured in. `changed()` tells
+    whether it was modified since the last `load()`, for hot reloading.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._loaded_mtime: int | None = None
+
+    def _mtime(self) -> int | None:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def changed(self) -> bool:
+        return self._mtime() != self._loaded_mtime
+
+    def load(self) -> List[RecurringSameDayEvent]:
+        """
+        Raises `ValueError` (or `OSError`) if the file can't be used; the
+        modification time is remembered either way, so a broken file is
+        reported once rather than on every check.
+        """
+        self._loaded_mtime = self._mtime()
+        with open(self.path, "r", encoding="utf-8") as f:
+            try:
+                config = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{self.path} is not valid JSON: {e}") from None
+        if not isinstance(config, dict):
+            raise ValueError(f"{self.path} must hold a JSON object")
+        return parse_events(config)
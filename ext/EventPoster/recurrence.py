@@ -0,0 +1,134 @@
+import bisect
+import calendar
+import datetime
+from typing import Iterator, List, Set
+
+# how far ahead `OccurrenceIndex` precomputes dates
+INDEX_HORIZON = datetime.timedelta(days=366)
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+class RecurrenceRule():
+    """
+    A rule that generates the dates of a recurring event.
+    """
+    def dates(self, start: datetime.date, end: datetime.date) -> Iterator[datetime.date]:
+        """
+        The rule's dates in [start, end), in order.
+        """
+        raise NotImplementedError
+
+
+class IntervalRule(RecurrenceRule):
+    """
+    Every `interval` (whole days only) since `starting_date`.
+    """
+    def __init__(self, starting_date: datetime.date, interval: datetime.timedelta):
+        if interval.days < 1:
+            raise ValueError("the interval must be at least one day")
+        self.starting_date = starting_date
+        self.interval = datetime.timedelta(days=interval.days)
+
+    def dates(self, start: datetime.date, end: datetime.date) -> Iterator[datetime.date]:
+        date = self.starting_date
+        if start > date:
+            # the first occurrence on or after `start`
+            date += -((self.starting_date - start) // self.interval) * self.interval
+        while date < end:
+            yield date
+            date += self.interval
+
+
+class NthWeekdayRule(RecurrenceRule):
+    """
+    The `nth` `weekday` (0 is Monday) of every `interval_months`-th month,
+    counting from `starting_date`'s month; `nth = -1` is the last one. Months
+    without an `nth` such weekday (e.g., a fifth Saturday) are skipped.
+    """
+    def __init__(self, starting_date: datetime.date, weekday: int, nth: int, interval_months: int = 1):
+        if nth not in (-1, 1, 2, 3, 4, 5):
+            raise ValueError("nth must be 1 to 5, or -1 for the last")
+        if not 0 <= weekday <= 6:
+            raise ValueError("the weekday must be 0 (Monday) to 6 (Sunday)")
+        if interval_months < 1:
+            raise ValueError("the interval must be at least one month")
+        self.starting_date = starting_date
+        self.weekday = weekday
+        self.nth = nth
+        self.interval_months = interval_months
+
+    def _date_in_month(self, year: int, month: int) -> datetime.date | None:
+        days = [week[self.weekday] for week in calendar.monthcalendar(year, month) if week[self.weekday] != 0]
+        if self.nth == -1:
+            return datetime.date(year, month, days[-1])
+        if self.nth > len(days):
+            return None
+        return datetime.date(year, month, days[self.nth - 1])
+
+    def dates(self, start: datetime.date, end: datetime.date) -> Iterator[datetime.date]:
+        start = max(start, self.starting_date)
+        months = self.starting_date.year * 12 + self.starting_date.month - 1
+        # skip straight to the first month that can matter
+        start_months = start.year * 12 + start.month - 1
+        if start_months > months:
+            months += (start_months - months) // self.interval_months * self.interval_months
+        while True:
+            year, month = divmod(months, 12)
+            if datetime.date(year, month + 1, 1) >= end:
+                return
+            date = self._date_in_month(year, month + 1)
+            if date is not None and start <= date < end:
+                yield date
+            months += self.interval_months
+
+
+class OccurrenceIndex():
+    """
+    The dates of a rule minus excluded dates, precomputed for `INDEX_HORIZON`
+    and searched with bisection. Rebuilt when half the horizon is used up.
+    """
+    def __init__(self, rule: RecurrenceRule, excluded_dates: Set[datetime.date] | None = None):
+        self.rule = rule
+        self.excluded_dates = excluded_dates or set()
+        self._dates: List[datetime.date] = []
+        self._built_from: datetime.date | None = None
+
+    def _build(self, start: datetime.date):
+        self._dates = [d for d in self.rule.dates(start, start + INDEX_HORIZON) if d not in self.excluded_dates]
+        self._built_from = start
+
+    def next_dates(self, after: datetime.date, count: int) -> List[datetime.date]:
+        """
+        Up to `count` dates on or after `after`.
+        """
+        if self._built_from is None or not self._built_from <= after <= self._built_from + INDEX_HORIZON / 2:
+            self._build(after)
+        i = bisect.bisect_left(self._dates, after)
+        return self._dates[i:i + count]
+
+
+def parse_recurrence(recurrence: dict) -> RecurrenceRule:
+    """
+    Either `{"starting_date": "2025-07-12", "every_days": 14}` (or "every_weeks")
+    or `{"starting_date": "2025-07-01", "nth": 2, "weekday": "saturday"}`,
+    optionally with `"every_months"`. Raises `ValueError` if malformed.
+    """
+    recurrence = dict(recurrence)
+    try:
+        starting_date = datetime.date.fromisoformat(recurrence.pop("starting_date"))
+        if "nth" in recurrence:
+            weekday_name = str(recurrence.pop("weekday")).lower()
+            if weekday_name not in WEEKDAYS:
+                raise ValueError(f"unknown weekday \"{weekday_name}\"")
+            weekday = WEEKDAYS.index(weekday_name)
+            rule = NthWeekdayRule(starting_date, weekday, int(recurrence.pop("nth")), int(recurrence.pop("every_months", 1)))
+        elif "every_weeks" in recurrence:
+            rule = IntervalRule(starting_date, datetime.timedelta(weeks=int(recurrence.pop("every_weeks"))))
+        else:
+            rule = IntervalRule(starting_date, datetime.timedelta(days=int(recurrence.pop("every_days"))))
+    except KeyError as e:
+        raise ValueError(f"missing {e} in the recurrence") from None
+    if recurrence:
+        raise ValueError(f"unknown recurrence keys: {', '.join(recurrence)}")
+    return rule
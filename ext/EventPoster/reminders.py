@@ -0,0 +1,180 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+# never sleep longer than this at once, so a multi-day wait follows the wall
+# clock (e.g., across a suspend or clock adjustment) instead of drifting
+MAX_SLEEP = datetime.timedelta(hours=1)
+# a reminder that fails to send is tried again after this long (or halfway
+# to its event, if that's sooner), unless its event is less than
+# MIN_RETRY_LEAD away
+RETRY_DELAY = datetime.timedelta(minutes=5)
+MIN_RETRY_LEAD = datetime.timedelta(minutes=1)
+# sent reminders are remembered this long after their event starts
+SENT_RETENTION = datetime.timedelta(days=30)
+
+
+class _Reminder:
+    def __init__(self, event_id: int, event_start: datetime.datetime, due: datetime.datetime, send: Callable[[], Awaitable]):
+        self.event_id = event_id
+        self.event_start = event_start
+        self.due = due
+        self.send = send
+
+
+class ReminderScheduler:
+    """
+    Sends every reminder from one task that sleeps until the earliest
+    deadline (kept in a min-heap). Which reminder was sent for which event
+    (ID and start time) is persisted to a small JSON file, so after a
+    restart `was_sent()` answers without reading the channel history.
+    """
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+        # event ID -> start time (ISO format) of the occurrence its reminder was sent for
+        self._sent: Dict[str, str] = {}
+        # False if there was no state file (e.g., the first run with one)
+        self.state_loaded = False
+        self._heap: List[Tuple[datetime.datetime, int, int]] = []  # (due, sequence, event ID)
+        self._sequence = itertools.count()
+        self._scheduled: Dict[int, Tuple[int, _Reminder]] = {}  # event ID -> (sequence, reminder)
+        # reminders being sent (until recorded by `mark_sent()`): event ID -> event start
+        self._in_flight: Dict[int, datetime.datetime] = {}
+        self._wake_up = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._write_lock = asyncio.Lock()
+
+    # ===================================================
+    # STATE FILE
+    # ===================================================
+    def load(self):
+        try:
+            with open(self.state_path, "r") as f:
+                self._sent = json.load(f)["sent"]
+            self.state_loaded = True
+        except FileNotFoundError:
+            self._sent = {}
+        except (json.JSONDecodeError, KeyError) as e:
+            logging.error(f"Ignoring the unreadable reminder state in {self.state_path}: {e!r}")
+            self._sent = {}
+
+    def _write(self, sent: Dict[str, str]):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"sent": sent}, f)
+        os.replace(temp_path, self.state_path)
+
+    def was_sent(self, event_id: int, event_start: datetime.datetime) -> bool:
+        return self._sent.get(str(event_id)) == event_start.isoformat()
+
+    async def mark_sent(self, event_id: int, event_start: datetime.datetime):
+        self._sent[str(event_id)] = event_start.isoformat()
+        # prune reminders of long-past events
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - SENT_RETENTION
+        self._sent = {k: v for k, v in self._sent.items() if datetime.datetime.fromisoformat(v) > cutoff}
+        # one write at a time, as they share the temporary file
+        async with self._write_lock:
+            await asyncio.to_thread(self._write, dict(self._sent))
+
+    # ===================================================
+    # SCHEDULING
+    # ===================================================
+    def is_scheduled(self, event_id: int, event_start: datetime.datetime | None = None) -> bool:
+        """
+        Whether the event's reminder is scheduled or being sent (for the
+        occurrence starting at `event_start`, if given).
+        """
+        if event_id in self._scheduled:
+            return True
+        in_flight = self._in_flight.get(event_id)
+        return in_flight is not None and (event_start is None or in_flight == event_start)
+
+    def schedule(self, event_id: int, event_start: datetime.datetime, due: datetime.datetime, send: Callable[[], Awaitable]):
+        """
+        (Re)schedule the reminder of an event; `send()` is awaited at `due`.
+        """
+        sequence = next(self._sequence)
+        self._scheduled[event_id] = (sequence, _Reminder(event_id, event_start, due, send))
+        heapq.heappush(self._heap, (due, sequence, event_id))
+        self._wake_up.set()
+
+    def cancel(self, event_id: int) -> bool:
+        # the heap entry is skipped when it comes up
+        return self._scheduled.pop(event_id, None) is not None
+
+    def _pop_stale(self):
+        while self._heap:
+            _, sequence, event_id = self._heap[0]
+            scheduled = self._scheduled.get(event_id)
+            if scheduled is not None and scheduled[0] == sequence:
+                return
+            heapq.heappop(self._heap)
+
+    async def _run(self):
+        while True:
+            self._pop_stale()
+            self._wake_up.clear()
+            if not self._heap:
+                await self._wake_up.wait()
+                continue
+            due = self._heap[0][0]
+            delay = due - datetime.datetime.now(datetime.timezone.utc)
+            if delay > datetime.timedelta(0):
+                # wake up early if an earlier reminder is scheduled
+                try:
+                    await asyncio.wait_for(self._wake_up.wait(), timeout=min(delay, MAX_SLEEP).total_seconds())
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, event_id = heapq.heappop(self._heap)
+            _, reminder = self._scheduled.pop(event_id)
+            # until it's recorded as sent, so reconciling meanwhile doesn't schedule it again
+            self._in_flight[event_id] = reminder.event_start
+            try:
+                await self._send(reminder)
+            finally:
+                if self._in_flight.get(event_id) == reminder.event_start:
+                    del self._in_flight[event_id]
+
+    async def _send(self, reminder: _Reminder):
+        event_id = reminder.event_id
+        try:
+            await reminder.send()
+        except Exception as e:
+            # from now, not from the due time: a catch-up reminder is long overdue
+            now = datetime.datetime.now(datetime.timezone.utc)
+            if reminder.event_start - now > MIN_RETRY_LEAD:
+                retry_delay = min(RETRY_DELAY, (reminder.event_start - now) / 2)
+                logging.error(f"Failed to send the reminder for event {event_id}: {e!r}; retrying in {retry_delay}.")
+                self.schedule(event_id, reminder.event_start, now + retry_delay, reminder.send)
+            else:
+                logging.error(f"Failed to send the reminder for event {event_id}: {e!r}; giving up.")
+            return
+        try:
+            await self.mark_sent(event_id, reminder.event_start)
+        except OSError as e:
+            logging.error(f"Failed to save the reminder state: {e!r}")
+
+    def cancel_all(self):
+        # reminders being sent can't be taken back; they finish on their own
+        self._scheduled.clear()
+        self._heap.clear()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(
+                lambda t: t.cancelled() or logging.error(f"The reminder scheduler stopped: {t.exception()!r}"))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.cancel_all()
@@ -1,36 +1,52 @@
-import asyncio
 import datetime
 import zoneinfo
 import discord
 import logging
-from typing import Sequence, Set
+import re
+from typing import List, Sequence, Set
 
 from global_stuff import assert_getenv
+from .recurrence import OccurrenceIndex, RecurrenceRule
+from .reminders import ReminderScheduler
 
 TIME_ZONE = zoneinfo.ZoneInfo(assert_getenv("time_zone"))
 
+# how `discord.ScheduledEvent.url` links appear in reminder messages
+EVENT_URL_PATTERN = re.compile(r"https://discord\.com/events/\d+/\d+")
+
+async def posted_event_urls(channel: discord.TextChannel, me: discord.Member | None, after: datetime.datetime) -> Set[str]:
+    """
+    The scheduled event URLs in our messages in `channel` since `after`. One
+    fetch serves every recurring event that reminds in that channel.
+    """
+    urls = set()
+    # one page should be more than enough; few messages are sent in the reminder channel
+    async for message in channel.history(limit=100, after=after):
+        if me is not None and message.author.id != me.id:
+            continue
+        urls.update(EVENT_URL_PATTERN.findall(message.content))
+    return urls
+
 class RecurringSameDayEvent():
     """
-    Must provide guild and channel with `self.set_guild_and_channel()`
-    before calling self.post_next_event()
+    Must provide guild, channel and reminder scheduler with
+    `self.set_guild_and_channel()` before posting occurrences.
     """
     def __init__(self,
-        starting_date: datetime.date,
-        frequency: datetime.timedelta,
+        rule: RecurrenceRule,
         remind_before: datetime.timedelta,
         name: str,
         description: str,
         start_time: datetime.time,
         end_time: datetime.time,
         location: str,
-        excluded_dates: Set[datetime.date] | None = None):
+        excluded_dates: Set[datetime.date] | None = None,
+        look_ahead: int = 1):
         """
-        NOTE: frequency's precision is up to "days" -- hours, etc. are discarded
-        when used for calculation in self.get_next_event_date()
+        `look_ahead` is how many upcoming occurrences are kept posted.
         """
 
-        self.starting_date = starting_date
-        self.frequency = frequency
+        self.rule = rule
         self.remind_before = remind_before
         self.name = name
         self.description = description
@@ -38,43 +54,58 @@ class RecurringSameDayEvent():
         self.end_time = end_time
         self.location = location
         self.excluded_dates = excluded_dates
+        self.look_ahead = look_ahead
+        self.occurrences = OccurrenceIndex(rule, excluded_dates)
 
         # the following must be set with self.set_guild_and_channel()
         self.reminder_channel: discord.TextChannel = None
         self.guild: discord.Guild = None
-        self._pending_reminder_event_ids: Set[int] = set()  # tracks event IDs with scheduled reminder tasks
+        self.reminders: ReminderScheduler = None  # shared by all recurring events
 
-    def set_guild_and_channel(self, guild: discord.Guild, reminder_channel: discord.TextChannel):
+    def set_guild_and_channel(self, guild: discord.Guild, reminder_channel: discord.TextChannel, reminders: ReminderScheduler):
         self.reminder_channel = reminder_channel
         self.guild = guild
+        self.reminders = reminders
     
-    def get_next_event_date(self) -> datetime.date:
+    def upcoming_dates(self, count: int) -> List[datetime.date]:
         """
-        find the next date of an event, given the first event's date
-        and the frequency.
+        The dates of the next `count` occurrences that haven't started yet.
         """
-        today = datetime.datetime.now(TIME_ZONE).date()
-        if today <= self.starting_date:
-            return self.starting_date
-        
-        time_since_start = today - self.starting_date
-        time_since_last_event = time_since_start % self.frequency
-        last_event_date = today - time_since_last_event
-
-        return last_event_date + self.frequency
-    
-    async def wait_and_send_reminder(self, delay: float, scheduled_event: discord.ScheduledEvent):
-        await asyncio.sleep(delay)
-        await self._send_reminder(scheduled_event)
-        self._pending_reminder_event_ids.discard(scheduled_event.id)
+        now = datetime.datetime.now(TIME_ZONE)
+        dates = self.occurrences.next_dates(now.date(), count + 1)
+        return [d for d in dates if self._start_datetime(d) > now][:count]
+
+    def missing_dates(self, existing_events: Sequence[discord.ScheduledEvent]) -> List[datetime.date]:
+        """
+        The dates to post so the next `self.look_ahead` occurrences are posted.
+        An upcoming posted event that isn't on one of those dates (e.g., one
+        that was moved by hand) stands in for the soonest missing one.
+        """
+        now = datetime.datetime.now(TIME_ZONE)
+        wanted = self.upcoming_dates(self.look_ahead)
+        upcoming = [e.start_time.astimezone(TIME_ZONE).date() for e in existing_events if e.start_time is not None and e.start_time > now]
+        posted = set(upcoming)
+        others = sum(1 for d in upcoming if d not in wanted)
+        return [d for d in wanted if d not in posted][others:]
+
+    def _start_datetime(self, date: datetime.date) -> datetime.datetime:
+        return datetime.datetime.combine(date=date, time=self.start_time, tzinfo=TIME_ZONE)
+
+    def cancel_reminder(self, event_id: int):
+        """
+        Cancel the scheduled reminder (if any) of an event that was deleted,
+        ended or rescheduled; reconciling again schedules a new one if needed.
+        """
+        if self.reminders.cancel(event_id):
+            logging.info(f"Cancelled the scheduled reminder for \"{self.name}\" ({event_id}).")
     
     def _schedule_reminder(self, event_datetime: datetime.datetime, scheduled_event: discord.ScheduledEvent):
         reminder_datetime = event_datetime - self.remind_before
         delay_td = reminder_datetime - datetime.datetime.now(TIME_ZONE)
 
         logging.info(f"Scheduling reminder for \"{self.name}\" in {delay_td}.")
-        self._pending_reminder_event_ids.add(scheduled_event.id)
-        asyncio.create_task(self.wait_and_send_reminder(delay_td.total_seconds(), scheduled_event))
+        self.reminders.schedule(
+            scheduled_event.id, event_datetime, reminder_datetime, lambda: self._send_reminder(scheduled_event))
 
     def _build_reminder_message(self, scheduled_event: discord.ScheduledEvent) -> str:
         return (
@@ -87,92 +118,69 @@ class RecurringSameDayEvent():
         logging.info(f"Sending reminder for \"{self.name}\".")
         await self.reminder_channel.send(self._build_reminder_message(scheduled_event))
 
-    async def _reminder_already_posted(self, scheduled_event: discord.ScheduledEvent, reminder_datetime: datetime.datetime) -> bool:
-        # Search a bounded range to avoid scanning entire channel history.
-        # (1 hour before reminder time to 1 hour after event start time)
-        search_after = reminder_datetime - datetime.timedelta(hours=1)
-        search_before = scheduled_event.start_time + datetime.timedelta(hours=1)
-        me = self.guild.me
-
-        # 20 should be more than enough; few messages are sent in the reminder channel
-        async for message in self.reminder_channel.history(limit=20, after=search_after, before=search_before):
-            if me is not None and message.author.id != me.id:
-                continue
-            if scheduled_event.url in message.content:
-                return True
-
-        return False
+    def history_search_start(self, scheduled_event: discord.ScheduledEvent) -> datetime.datetime | None:
+        """
+        Where to start looking for the event's reminder in the channel history
+        (1 hour before the reminder time), or None if it can't be posted yet.
+        """
+        search_after = scheduled_event.start_time - self.remind_before - datetime.timedelta(hours=1)
+        return search_after if search_after < datetime.datetime.now(TIME_ZONE) else None
     
-    async def reconcile_event_reminder(self, existing_events: Sequence[discord.ScheduledEvent]):
+    async def reconcile_event_reminder(self, scheduled_event: discord.ScheduledEvent, posted_urls: Set[str] | None = None):
         """
-        Ensure the reminder is/will be posted for the next upcoming event in existing_events.
+        Ensure the reminder is/will be posted for an upcoming occurrence.
         This is idempotent and can be called every startup/loop.
+
+        `posted_urls` are the event URLs found by `posted_event_urls()` in
+        the reminder channel; needed only without the scheduler's state file.
         """
-        # filter for the next upcoming event, if there are multiple events with the same name.
         now = datetime.datetime.now(TIME_ZONE)
-        upcoming = [e for e in existing_events if e.start_time is not None and e.start_time > now]
-        if not upcoming:
-            return # no upcoming event, so nothing to reconcile
-        
-        scheduled_event = min(upcoming, key=lambda e: e.start_time)
+        if scheduled_event.start_time is None or scheduled_event.start_time <= now:
+            return # not upcoming, so nothing to reconcile
+
         event_datetime = scheduled_event.start_time
         reminder_datetime = event_datetime - self.remind_before
 
-        # unschedule the reminder task if the reminder has already been posted
-        if await self._reminder_already_posted(scheduled_event, reminder_datetime):
-            self._pending_reminder_event_ids.discard(scheduled_event.id)
-            logging.info(
-                f"Reminder already exists for event \"{self.name}\" ({scheduled_event.id}). Removed the event from pending set."
-            )
+        # unschedule the reminder if it has already been posted. The scheduler's
+        # state file says so; only without one (e.g., the first run after an
+        # upgrade) do we look through the channel history.
+        already_posted = self.reminders.was_sent(scheduled_event.id, event_datetime)
+        if not already_posted and posted_urls is not None:
+            already_posted = scheduled_event.url in posted_urls
+            if already_posted:
+                await self.reminders.mark_sent(scheduled_event.id, event_datetime)
+        if already_posted:
+            self.cancel_reminder(scheduled_event.id)
             return
 
-        # skip if a reminder task is already scheduled for this event
-        if scheduled_event.id in self._pending_reminder_event_ids:
+        # skip if a reminder is already scheduled for this event
+        if self.reminders.is_scheduled(scheduled_event.id, event_datetime):
             return
 
-        # reminder not scheduled but the post time has already passed, so send the
-        # reminder now to catch up
+        # reminder not scheduled but the post time has already passed; the
+        # scheduler sends it right away to catch up
         if now >= reminder_datetime:
             logging.info(
                 f"Reminder time has passed for \"{self.name}\" ({scheduled_event.id}); sending catch-up reminder now."
             )
-            await self._send_reminder(scheduled_event)
-            return
 
-        # otherwise, schedule the reminder for the future
         self._schedule_reminder(event_datetime, scheduled_event)
-    
-    async def post_next_event_and_schedule_reminder(self):
-        """
-        Post the next event unless its date is excluded. Then schedule a reminder
-        to be sent before the event starts.
-
-        NOTE: we don't schedule the posting of the next recurrence here intentionally.
-        It's easier to schedule next events based on the presence of events (e.g., so
-        we don't post a new one every restart)
 
-        Reminders are reconciled against Discord state (scheduled event + message history)
-        so restart does not lose them.
+    async def post_occurrence(self, date: datetime.date) -> discord.ScheduledEvent:
         """
-        
-        next_event_date = self.get_next_event_date()
-        
-        if self.excluded_dates is not None and next_event_date in self.excluded_dates:
-            logging.info(f"Did not post event \"{self.name}\" because its date ({next_event_date}) is excluded.")
-            return
-        
-        start_datetime = datetime.datetime.combine(date=next_event_date, time=self.start_time, tzinfo=TIME_ZONE)
-        end_datetime = datetime.datetime.combine(date=next_event_date, time=self.end_time, tzinfo=TIME_ZONE)
+        Post the occurrence on `date`. Its reminder is scheduled when the
+        caller reconciles reminders.
 
-        logging.info(f"Posting event \"{self.name}\".")
-        scheduled_event = await self.guild.create_scheduled_event(
+        NOTE: we don't post based on timers. It's easier to post occurrences
+        based on the presence of events (e.g., so we don't post a new one every
+        restart); see `self.missing_dates()`.
+        """
+        logging.info(f"Posting event \"{self.name}\" on {date}.")
+        return await self.guild.create_scheduled_event(
             name = self.name,
             description = self.description,
-            start_time = start_datetime,
-            end_time = end_datetime,
+            start_time = self._start_datetime(date),
+            end_time = datetime.datetime.combine(date=date, time=self.end_time, tzinfo=TIME_ZONE),
             entity_type = discord.EntityType.external,
             privacy_level = discord.PrivacyLevel.guild_only,
             location = self.location)
-
-        # Schedule reminder and let regular reconciliation keep things correct after restarts.
-        await self.reconcile_event_reminder([scheduled_event])
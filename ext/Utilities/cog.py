@@ -1,13 +1,23 @@
+import asyncio
 import datetime
 import discord
 import gspread
+import io
 import logging
-from discord.ext import commands
+import metrics
+import time
+import tracing
+from discord.ext import commands, tasks
 from discord import app_commands, Interaction
 from typing import *
 
 from .config import *
 from .helpers import *
+from .store import PENDING, GAMES_WRITTEN, FLUSHED, GameRecord, pair_sheet_rows
+from .submissions import Fingerprint, Submission, fingerprint
+from .ruleset import rescore_games
+from .registry import TOMBSTONE, RegistryConflict, RegistryWriteFailed, merge_paid_membership, reconcile_registries
+from .sheets import INTERACTIVE, CallCounter, may_have_been_applied, scheduler as sheets_scheduler, sheets_call_counter, sheets_priority
 
 
 class Utilities(commands.Cog):
@@ -16,37 +26,277 @@ class Utilities(commands.Cog):
     """
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # IDs of the games in the last append to each (leaderboard, worksheet)
+        # that failed but may have been applied anyway; see `_push_leaderboard()`
+        self._unconfirmed_appends: Dict[Tuple[str, str], list[str]] = {}
+        # leaderboards without a "Standings" worksheet, not published to until the cog reloads
+        self._standings_disabled: Set[str] = set()
+
+    async def cog_load(self):
+        await leaderboard_store.open()
+        self.ruleset_version = await asyncio.to_thread(ruleset_history.register, CURRENT_RULESET)
+        standings_engine.rebuild(await leaderboard_store.aggregate_scores())
+        # so a game resubmitted across a restart is still caught
+        since = (datetime.datetime.now(TIME_ZONE) - DUPLICATE_WINDOW).strftime("%Y-%m-%d %H:%M:%S")
+        for game in await leaderboard_store.recent_games(since):
+            submission_index.seed(game.leaderboard_type, game.game_row[1], game.game_row[0], game.game_id, game.score_rows)
+        self._published_standings_rows: Dict[str, int] = {}
+        # serve registrations and standings from the last snapshot (if still
+        # good) until the registries are checked against Google
+        start = time.perf_counter()
+        self._registry_indexes_loaded = await warm_start_snapshot.restore(
+            self._registry_indexes(), registry_consistency, leaderboard_store)
+        self._snapshot_stale = False
+        if self._registry_indexes_loaded:
+            logging.info(f"Startup timing: restoring the registries from {WARM_START_SNAPSHOT_PATH} took {time.perf_counter() - start:.2f}s.")
+        # connect to Google in the background so loading the cog (and thus
+        # `setup_hook()`) never waits on it
+        self._warm_up_task = asyncio.create_task(self._warm_up())
+        self.revalidate_registry_indexes.start()
+        self.save_snapshot.start()
+        self.compact_registries.start()
+        self.push_scores.start()
+        self.pull_scores.start()
+        self.publish_standings.start()
+
+    async def _warm_up(self):
+        start = time.perf_counter()
+        restored = self._registry_indexes_loaded
+        try:
+            # open all six worksheets concurrently
+            opening = asyncio.gather(*(ws.get_worksheet() for ws in (
+                club_leaderboard_registry, club_leaderboard_games, club_leaderboard_scores,
+                friendly_leaderboard_registry, friendly_leaderboard_games, friendly_leaderboard_scores)))
+            if restored:
+                # registrations wait for the check, but it needn't wait for the worksheets
+                await asyncio.gather(opening, self._check_registry_snapshot())
+            else:
+                await opening
+                await self._ensure_registry_indexes_loaded()
+        except Exception as e:
+            # commands will try again on first use
+            logging.error(f"Failed to connect to the leaderboards: {e!r}")
+            if restored:
+                self._registry_indexes_loaded = False
+            return
+        logging.info(f"Startup timing: connecting to the leaderboards took {time.perf_counter() - start:.2f}s.")
+
+    async def cog_unload(self):
+        self._warm_up_task.cancel()
+        self.revalidate_registry_indexes.cancel()
+        self.save_snapshot.cancel()
+        if self._registry_indexes_loaded:
+            await warm_start_snapshot.save(self._registry_indexes(), registry_consistency)
+        else:
+            # out of date, and maybe not even consistent with the sheets
+            warm_start_snapshot.discard()
+        self.compact_registries.cancel()
+        self.push_scores.cancel()
+        self.pull_scores.cancel()
+        self.publish_standings.cancel()
+        # replication steps are shielded from cancellation; wait for any in progress
+        async with club_leaderboard_game_entry_lock, friendly_leaderboard_game_entry_lock:
+            await leaderboard_store.close()
+        sheets_scheduler.shutdown()
+
+    # commands are awaited by a user, so their Sheets calls go ahead of the
+    # background loops'. Both hooks run in the command's own task.
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        sheets_priority.set(INTERACTIVE)
+        sheets_call_counter.set(CallCounter())
+        tracing.recorder.record_command(interaction)
+        return True
+
+    async def cog_before_invoke(self, ctx: commands.Context) -> None:
+        sheets_priority.set(INTERACTIVE)
+        sheets_call_counter.set(CallCounter())
+
+    def _log_command(self, command_name: str, guild_id: int | None, started_at: datetime.datetime) -> None:
+        latency_ms = round((discord.utils.utcnow() - started_at).total_seconds() * 1000)
+        counter = sheets_call_counter.get()
+        message = f"Command {command_name} completed {latency_ms} ms after it was invoked"
+        if counter is not None:
+            message += f" ({counter.count} Sheets call(s))"
+        metrics.command_latency.observe(latency_ms / 1000, command=command_name)
+        tracing.recorder.record_completion(latency_ms / 1000)
+        logging.info(message, extra={
+            "command": command_name,
+            "guild": guild_id,
+            "latency_ms": latency_ms,
+            "sheets_calls": counter.count if counter is not None else None,
+        })
+
+    # dispatched from the command's own task, so the Sheets call counter is still visible here
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, interaction: Interaction, command: app_commands.Command):
+        self._log_command(f"/{command.qualified_name}", interaction.guild_id, interaction.created_at)
+
+    async def cog_after_invoke(self, ctx: commands.Context) -> None:
+        self._log_command(f"{ctx.prefix}{ctx.command.qualified_name}", ctx.guild.id if ctx.guild else None, ctx.message.created_at)
+
+    @commands.command(name="registry_status", hidden=True)
+    @commands.is_owner()
+    async def registry_status(self, ctx: commands.Context):
+        if registry_consistency.checked_at is None:
+            await ctx.send("The registries haven't been reconciled yet.")
+            return
+        checked_at = int(registry_consistency.checked_at.timestamp())
+        status = "consistent" if registry_consistency.consistent else "**inconsistent**"
+        response = f"The registries are {status} (last reconciled <t:{checked_at}:R>, {registry_consistency.fixed} fix(es))."
+        for conflict in registry_consistency.conflicts[:10]:
+            response += f"\n- {conflict}"
+        await ctx.send(response)
+
+    @commands.command(name="sheets_stats", hidden=True)
+    @commands.is_owner()
+    async def sheets_stats(self, ctx: commands.Context):
+        stats = sheets_scheduler.stats()
+        await ctx.send("Google Sheets requests:\n" + "\n".join(f"- {k}: {v}" for k, v in stats.items()))
 
     # ===================================================
     # REGISTRATION LOGIC
     # ===================================================
-    def _register_on_one_leaderboard(
-        self,
-        old_registration_cell: gspread.cell.Cell | None,
-        discord_name: str,
-        name: str,
-        registry: gspread.Worksheet
-    ) -> None:
-        # this helper should only be called within a `registry_lock`
+    def _registry_indexes(self) -> Dict[str, RegistryIndex]:
+        return {"Club Leaderboard": club_leaderboard_registry_index, "Friendly Leaderboard": friendly_leaderboard_registry_index}
+
+    async def _load_registry_indexes(self) -> None:
+        """
+        Fetch both registries, fix any drift between them, and (re)load the indexes.
+        """
+        # this helper should only be called within `registry_lock.exclusive()`
+        registries = (club_leaderboard_registry, friendly_leaderboard_registry)
 
-        found_old_registration = old_registration_cell is not None
+        # settle any registration left half-written (e.g., by a crash) before reading the registries
+        await registry_writer.resume()
 
-        # TODO: ensure consistency of paid membership status across both leaderboards
-        paid_membership = "no"
+        # one `values_batch_get` per spreadsheet (just one if both registries share it)
+        urls = list(dict.fromkeys(ws.url for ws in registries))
+        fetched = await asyncio.gather(*(
+            sheets_connection.values_batch_get(url, [f"'{ws.title}'!A:C" for ws in registries if ws.url == url])
+            for url in urls))
+        values_by_url = {url: iter(values) for url, values in zip(urls, fetched)}
+        club_values, friendly_values = (next(values_by_url[ws.url]) for ws in registries)
 
-        # grab existing paid membership status & remove old registration if it exists
-        if found_old_registration:
-            [_, _, paid_membership] = registry.row_values(old_registration_cell.row)
-            registry.delete_rows(old_registration_cell.row)
+        club_writes, friendly_writes, conflicts = reconcile_registries(club_values, friendly_values)
+        if club_writes or friendly_writes:
+            # one batch write per spreadsheet
+            data_by_url: Dict[str, list[dict]] = {}
+            for ws, writes, values in zip(registries, (club_writes, friendly_writes), (club_values, friendly_values)):
+                if writes:
+                    await ws.ensure_row_count(len(values))
+                    data_by_url.setdefault(ws.url, []).extend(
+                        {"range": f"'{ws.title}'!{w['range']}", "values": w["values"]} for w in writes)
+            await asyncio.gather(*(sheets_connection.values_batch_update(url, data) for url, data in data_by_url.items()))
+            logging.info(f"Reconciled the registries: {len(club_writes)} fix(es) on the Club Leaderboard, "
+                         f"{len(friendly_writes)} on the Friendly Leaderboard.")
+        for conflict in conflicts:
+            logging.warning(f"Registry inconsistency needs manual attention: {conflict}")
+        registry_consistency.record(len(club_writes) + len(friendly_writes), conflicts)
+
+        club_leaderboard_registry_index.load_values(club_values)
+        friendly_leaderboard_registry_index.load_values(friendly_values)
+        # the registries stay sheet-first (names must be unique across manual
+        # edits too); the store keeps a mirror for local reads
+        await leaderboard_store.replace_registry("Club Leaderboard", club_leaderboard_registry_index.entries())
+        await leaderboard_store.replace_registry("Friendly Leaderboard", friendly_leaderboard_registry_index.entries())
+        self._registry_indexes_loaded = True
+        self._snapshot_stale = True
+
+    async def _check_registry_snapshot(self) -> None:
+        """
+        Make sure the registries didn't change while the bot was down, and reload them if they did.
+        """
+        async with registry_lock.exclusive():
+            # only the last row in use (and the one after it) of each registry; one small read per spreadsheet
+            indexes = list(self._registry_indexes().values())
+            urls = list(dict.fromkeys(index.worksheet.url for index in indexes))
+            fetched = await asyncio.gather(*(
+                sheets_connection.values_batch_get(url, [index.tail_range() for index in indexes if index.worksheet.url == url])
+                for url in urls))
+            values_by_url = {url: iter(values) for url, values in zip(urls, fetched)}
+            if all(index.matches_tail(next(values_by_url[index.worksheet.url])) for index in indexes):
+                return
+            logging.info("The registries changed since the snapshot was saved; reloading them.")
+            await self._load_registry_indexes()
+
+    async def _ensure_registry_indexes_loaded(self) -> None:
+        if self._registry_indexes_loaded:
+            return
+        async with registry_lock.exclusive():
+            # someone else may have loaded them while we waited
+            if not self._registry_indexes_loaded:
+                await self._load_registry_indexes()
+
+    async def _write_registry_rows(self, writes: list[Tuple[RegistryIndex, int, list[str], list[str]]]) -> str | None:
+        """
+        Write `(index, row, values, previous values)` to both leaderboards at once.
+        Returns the response string if that failed.
+        """
+        # this helper should only be called within `registry_lock.keys()` for the rows' members
+        try:
+            await registry_writer.write(writes)
+        except RegistryWriteFailed as e:
+            logging.error(f"Failed to write to the registries: {e}")
+            if e.rolled_back:
+                # new rows are blank again, so later registrations can take them
+                for index, row, _, _ in writes:
+                    index.release(row)
+                return "Couldn't reach the leaderboards, so nothing was changed. Please try again in a bit."
+            # left in the outbox; resumed (and the registries reconciled) on next use
+            registry_consistency.invalidate()
+            self._registry_indexes_loaded = False
+            return "Couldn't update both leaderboards; the change will be undone automatically. Please try again in a bit."
+        return None
+
+    @tasks.loop(minutes=30, reconnect=True)
+    async def revalidate_registry_indexes(self):
+        # catch (and reconcile) any manual edits officers made to the Registry
+        # worksheets. the first iteration is skipped; `_warm_up()` does the initial load.
+        if self.revalidate_registry_indexes.current_loop == 0:
+            return
+        async with registry_lock.exclusive():
+            await self._load_registry_indexes()
+
+    @revalidate_registry_indexes.error
+    async def revalidate_registry_indexes_error(self, error):
+        logging.error(f"Error in revalidating registry indexes: {error}")
+
+    @tasks.loop(minutes=5, reconnect=True)
+    async def save_snapshot(self):
+        # so even an unclean shutdown leaves a recent snapshot (`cog_unload()` saves one too)
+        if self._registry_indexes_loaded and self._snapshot_stale:
+            self._snapshot_stale = False
+            await warm_start_snapshot.save(self._registry_indexes(), registry_consistency)
+
+    @save_snapshot.error
+    async def save_snapshot_error(self, error):
+        logging.error(f"Error in saving the warm start snapshot: {error}")
+
+    @tasks.loop(hours=24, reconnect=True)
+    async def compact_registries(self):
+        """
+        Delete the tombstone rows left by unregistrations, one request per registry.
+        """
+        if self.compact_registries.current_loop == 0:
+            return
+        async with registry_lock.exclusive():
+            # start from fresh (and reconciled) indexes, so only real tombstones are deleted
+            await self._load_registry_indexes()
+            indexes = [index for index in (club_leaderboard_registry_index, friendly_leaderboard_registry_index) if index.tombstone_rows]
+            if not indexes:
+                return
+            tombstone_count = sum(len(index.tombstone_rows) for index in indexes)
+            try:
+                await asyncio.gather(*(index.worksheet.delete_row_set(index.tombstone_rows) for index in indexes))
+            finally:
+                # every row below a tombstone moved up
+                await self._load_registry_indexes()
+            logging.info(f"Compacted the registries: deleted {tombstone_count} tombstone row(s).")
+
+    @compact_registries.error
+    async def compact_registries_error(self, error):
+        logging.error(f"Error in compacting registries: {error}")
 
-        # add new registration information
-        data = [
-            discord_name,
-            name,
-            paid_membership
-        ]
-        registry.append_row(data)
-    
     async def _register(self, server_member: discord.Member, name: str) -> str:
         """
         Add player to the registry on both leaderboards, removing any existing registration first.
@@ -57,48 +307,88 @@ class Utilities(commands.Cog):
         if len(name) > MAX_NAME_LEN:
             return f"Please keep your preferred name within {MAX_NAME_LEN} characters and `/register` again."
 
-        async with registry_lock:
-            # check if the `name` is already taken on either leaderboard
-            # since the registry should be consistent across both leaderboards,
-            # we complain when it's only taken on one of the leaderboards
-            found_name_cell = club_leaderboard_registry.find(name, in_column=2)
-            name_taken_club = found_name_cell is not None
-            
-            found_name_cell = friendly_leaderboard_registry.find(name, in_column=2)
-            name_taken_friendly = found_name_cell is not None
-
-            if name_taken_club or name_taken_friendly:
-                if name_taken_club and name_taken_friendly:
-                    return f"The name **\"{name}\"** is already taken. Please choose a different name."
-                elif name_taken_club:
-                    return f"The name **\"{name}\"** is already taken on the Club Leaderboard, but it's not present on the Friendly Leaderboard. Please contact <@{BOT_MAINTAINER_ID}> to resolve this inconsistency."
-                else:
-                    return f"The name **\"{name}\"** is already taken on the Friendly Leaderboard, but it's not present on the Club Leaderboard. Please contact <@{BOT_MAINTAINER_ID}> to resolve this inconsistency."
-
-            # similarly, check if the current member is already registered, by Discord ID.
-            # since the registry should be consistent across both leaderboards,
-            # we complain when it only shows up on one of the leaderboards
-            discord_name = get_discord_name(server_member)
-
-            found_discord_cell_club = club_leaderboard_registry.find(discord_name, in_column=1)
-            discord_taken_club = found_discord_cell_club is not None
-            
-            found_discord_cell_friendly = friendly_leaderboard_registry.find(discord_name, in_column=1)
-            discord_taken_friendly = found_discord_cell_friendly is not None
+        # only registrations of the same member or the same name wait on each other
+        discord_name = get_discord_name(server_member)
+        for attempt in (1, 2):
+            await self._ensure_registry_indexes_loaded()
+            try:
+                async with registry_lock.keys(("member", discord_name), ("name", name)):
+                    return await self._register_locked(server_member, name)
+            except RegistryConflict as e:
+                if attempt == 2:
+                    raise
+                # the sheet changed under us (e.g., manual edits); reload and try once more
+                logging.warning(f"Registry conflict while registering: {e}. Reloading registry indexes.")
+                self._registry_indexes_loaded = False
 
-            if discord_taken_club and not discord_taken_friendly:
-                return f"You are already registered on the Club Leaderboard, but not on the Friendly Leaderboard. Please contact <@{BOT_MAINTAINER_ID}> to resolve this inconsistency."
-            elif discord_taken_friendly and not discord_taken_club:
-                return f"You are already registered on the Friendly Leaderboard, but not on the Club Leaderboard. Please contact <@{BOT_MAINTAINER_ID}> to resolve this inconsistency."
+    async def _register_locked(self, server_member: discord.Member, name: str) -> str:
+        # this helper should only be called within `registry_lock.keys()` for the member and `name`
 
-            self._register_on_one_leaderboard(found_discord_cell_club, discord_name, name, club_leaderboard_registry)
-            self._register_on_one_leaderboard(found_discord_cell_friendly, discord_name, name, friendly_leaderboard_registry)
+        # check if the `name` is already taken on either leaderboard
+        # since the registry should be consistent across both leaderboards,
+        # we complain when it's only taken on one of the leaderboards
+        name_taken_club = club_leaderboard_registry_index.get_by_name(name) is not None
+        name_taken_friendly = friendly_leaderboard_registry_index.get_by_name(name) is not None
 
-            if discord_taken_club:
-                return f"{server_member.mention} updated their registration with name **\"{name}\"**."
+        if name_taken_club or name_taken_friendly:
+            if name_taken_club and name_taken_friendly:
+                return f"The name **\"{name}\"** is already taken. Please choose a different name."
+            elif registry_consistency.consistent:
+                # drifted since the last reconciliation; reconciling again may fix it
+                raise RegistryConflict(f"the name {name!r} is only taken on one leaderboard")
+            elif name_taken_club:
+                return f"The name **\"{name}\"** is already taken on the Club Leaderboard, but it's not present on the Friendly Leaderboard. Please contact <@{BOT_MAINTAINER_ID}> to resolve this inconsistency."
             else:
-                return f"{server_member.mention} registered with name **\"{name}\"**."
-            
+                return f"The name **\"{name}\"** is already taken on the Friendly Leaderboard, but it's not present on the Club Leaderboard. Please contact <@{BOT_MAINTAINER_ID}> to resolve this inconsistency."
+
+        # similarly, check if the current member is already registered, by Discord ID.
+        # since the registry should be consistent across both leaderboards,
+        # we complain when it only shows up on one of the leaderboards
+        discord_name = get_discord_name(server_member)
+
+        old_entry_club = club_leaderboard_registry_index.get(discord_name)
+        discord_taken_club = old_entry_club is not None
+
+        old_entry_friendly = friendly_leaderboard_registry_index.get(discord_name)
+        discord_taken_friendly = old_entry_friendly is not None
+
+        if discord_taken_club != discord_taken_friendly and registry_consistency.consistent:
+            raise RegistryConflict(f"{discord_name} is only registered on one leaderboard")
+        elif discord_taken_club and not discord_taken_friendly:
+            return f"You are already registered on the Club Leaderboard, but not on the Friendly Leaderboard. Please contact <@{BOT_MAINTAINER_ID}> to resolve this inconsistency."
+        elif discord_taken_friendly and not discord_taken_club:
+            return f"You are already registered on the Friendly Leaderboard, but not on the Club Leaderboard. Please contact <@{BOT_MAINTAINER_ID}> to resolve this inconsistency."
+
+        # make sure the rows we are about to replace are still where we think they are
+        # (this also grabs the latest paid membership status) before writing anything
+        if discord_taken_club:
+            await asyncio.gather(
+                club_leaderboard_registry_index.verify(old_entry_club),
+                friendly_leaderboard_registry_index.verify(old_entry_friendly))
+
+        # both leaderboards get the same paid membership status
+        paid_membership = "no"
+        if discord_taken_club:
+            paid_membership = merge_paid_membership(old_entry_club.paid_membership, old_entry_friendly.paid_membership)
+
+        # rewrite the existing rows in place (or add new ones), one request per spreadsheet, concurrently
+        indexes = (("Club Leaderboard", club_leaderboard_registry_index), ("Friendly Leaderboard", friendly_leaderboard_registry_index))
+        entries = [index.plan_upsert(discord_name, name, paid_membership) for _, index in indexes]
+        previous = [old_entry.values() if old_entry is not None else ["", "", ""] for old_entry in (old_entry_club, old_entry_friendly)]
+        error = await self._write_registry_rows([
+            (index, entry.row, entry.values(), old_values) for (_, index), entry, old_values in zip(indexes, entries, previous)])
+        if error is not None:
+            return error
+        for (leaderboard_type, index), entry in zip(indexes, entries):
+            index.apply(entry)
+            await leaderboard_store.upsert_registration(leaderboard_type, discord_name, name, paid_membership)
+        self._snapshot_stale = True
+
+        if discord_taken_club:
+            return f"{server_member.mention} updated their registration with name **\"{name}\"**."
+        else:
+            return f"{server_member.mention} registered with name **\"{name}\"**."
+        
     
     @app_commands.command(name="register", description="Register with your name (or update your current registration) on our leaderboards.")
     @app_commands.describe(
@@ -126,21 +416,39 @@ class Utilities(commands.Cog):
 
         # since we are just unregistering, we don't need to worry about consistency checks
         # just remove any existing registration on both leaderboards
-        async with registry_lock:
-            found_discord_cell_club = club_leaderboard_registry.find(discord_name, in_column=1)
-            registered_club = found_discord_cell_club is not None
-            if registered_club:
-                club_leaderboard_registry.delete_rows(found_discord_cell_club.row)
-
-            found_discord_cell_friendly = friendly_leaderboard_registry.find(discord_name, in_column=1)
-            registered_friendly = found_discord_cell_friendly is not None
-            if registered_friendly:
-                friendly_leaderboard_registry.delete_rows(found_discord_cell_friendly.row)
-
-            if registered_club or registered_friendly:
-                return f"{server_member.mention} has been unregistered."
-            else:
-                return f"{server_member.mention} is not registered."
+        for attempt in (1, 2):
+            await self._ensure_registry_indexes_loaded()
+            try:
+                async with registry_lock.keys(("member", discord_name)):
+                    return await self._unregister_locked(server_member, discord_name)
+            except RegistryConflict as e:
+                if attempt == 2:
+                    raise
+                logging.warning(f"Registry conflict while unregistering: {e}. Reloading registry indexes.")
+                self._registry_indexes_loaded = False
+
+    async def _unregister_locked(self, server_member: discord.Member, discord_name: str) -> str:
+        # this helper should only be called within `registry_lock.keys()` for the member
+        registrations = []
+        for leaderboard_type, index in (("Club Leaderboard", club_leaderboard_registry_index), ("Friendly Leaderboard", friendly_leaderboard_registry_index)):
+            entry = index.get(discord_name)
+            if entry is not None:
+                registrations.append((leaderboard_type, index, entry))
+        if not registrations:
+            return f"{server_member.mention} is not registered."
+
+        # overwrite the rows with tombstones instead of deleting them, so no
+        # other row moves; `compact_registries` deletes them later in bulk
+        await asyncio.gather(*(index.verify(entry) for _, index, entry in registrations))
+        error = await self._write_registry_rows([(index, entry.row, [TOMBSTONE, "", ""], entry.values()) for _, index, entry in registrations])
+        if error is not None:
+            return error
+        for leaderboard_type, index, entry in registrations:
+            index.apply_removal(entry)
+            await leaderboard_store.delete_registration(leaderboard_type, discord_name)
+        self._snapshot_stale = True
+
+        return f"{server_member.mention} has been unregistered."
 
     @app_commands.command(name="unregister", description="Remove your registered information.")
     async def unregister(self, interaction: Interaction):
@@ -160,9 +468,9 @@ class Utilities(commands.Cog):
     # ===================================================
     # SCORE ENTRY LOGIC
     # ===================================================
-    async def _enter_scores(
+    def _score_game(
         self,
-        leaderboard_type: str,
+        timestamp: str,
         game_length: str,
         player_east: discord.Member, score_east: int,
         player_south: discord.Member, score_south: int,
@@ -173,24 +481,29 @@ class Utilities(commands.Cog):
         chombo_south: int = 0,
         chombo_west: int = 0,
         chombo_north: int = 0
-    ) -> str:
+    ) -> Tuple[list[PlayerScore], list, list[list]]:
+        """
+        Validate and score a single game.
+        Returns the player scores, the "Games" row, and the "Scores" rows.
+        Raises `ScoreEntryError` (with a user-facing message) for invalid input.
+        """
         # INPUT CHECKING LOGIC
         # =======================
         if chombo_east < 0 or chombo_south < 0 or chombo_west < 0 or chombo_north < 0:
-            return "Error: negative chombo count."
+            raise ScoreEntryError("Error: negative chombo count.")
 
         # identify the game mode based on whether the North player is present
         if player_north is None:
             if len(set([player_east, player_south, player_west])) != 3:
-                return "Error: duplicate player entered."
+                raise ScoreEntryError("Error: duplicate player entered.")
             
             expected_total = 3 * SANMA_STARTING_POINTS
             game_mode = "Sanma"
         else:
             if len(set([player_east, player_south, player_west, player_north])) != 4:
-                return "Error: duplicate player entered."
+                raise ScoreEntryError("Error: duplicate player entered.")
             if score_north is None:
-                return "Error: missing Player 4's score."
+                raise ScoreEntryError("Error: missing Player 4's score.")
             expected_total = 4 * YONMA_STARTING_POINTS
             game_mode = "Yonma"
         
@@ -200,15 +513,15 @@ class Utilities(commands.Cog):
             total_score += score_north
         
         if total_score != expected_total:
-            return f"Error: Entered scores sum up to be {total_score}.\nExpected {expected_total} for {game_mode}."
+            raise ScoreEntryError(f"Error: Entered scores sum up to be {total_score}.\nExpected {expected_total} for {game_mode}.")
         
         # initialize the East, South, West PlayerScore. If Yonma, also initialize the North PlayerScore.
-        player_score_east = PlayerScore("East", player_east, score_east, chombo_east * DEFAULT_CHOMBO_PENALTY)
-        player_score_south = PlayerScore("South", player_south, score_south, chombo_south * DEFAULT_CHOMBO_PENALTY)
-        player_score_west = PlayerScore("West", player_west, score_west, chombo_west * DEFAULT_CHOMBO_PENALTY)
+        player_score_east = PlayerScore("East", player_east, score_east, chombo_east)
+        player_score_south = PlayerScore("South", player_south, score_south, chombo_south)
+        player_score_west = PlayerScore("West", player_west, score_west, chombo_west)
         player_scores = [player_score_east, player_score_south, player_score_west]
         if game_mode == "Yonma":
-            player_score_north = PlayerScore("North", player_north, score_north, chombo_north * DEFAULT_CHOMBO_PENALTY)
+            player_score_north = PlayerScore("North", player_north, score_north, chombo_north)
             player_scores.append(player_score_north)
 
         # OUTPUT CONSTRUCTION LOGIC
@@ -216,13 +529,13 @@ class Utilities(commands.Cog):
         # the magic helper
         calculate_placement_and_final_score(game_mode, game_length, player_scores)
         
-        timestamp = str(datetime.datetime.now(TIME_ZONE)).split(".")[0]
         game_type = f"{game_mode} {game_length}"
 
         game_row = [
             timestamp,
             game_type,
-            leftover_points
+            leftover_points,
+            self.ruleset_version
         ]
 
         score_rows = []
@@ -236,32 +549,460 @@ class Utilities(commands.Cog):
                 ps.placement,
                 ps.uma,
                 ps.penalty,
-                ps.final_score
+                ps.final_score,
+                self.ruleset_version
             ]
             score_rows.append(score_row)
 
-        # enter the scores into the sheet
-        if leaderboard_type == "Club Leaderboard":
-            games_sheet = club_leaderboard_games
-            scores_sheet = club_leaderboard_scores
-            game_entry_lock = club_leaderboard_game_entry_lock
-            url = CLUB_LEADERBOARD_URL
-        else:
-            games_sheet = friendly_leaderboard_games
-            scores_sheet = friendly_leaderboard_scores
-            game_entry_lock = friendly_leaderboard_game_entry_lock
-            url = FRIENDLY_LEADERBOARD_URL
+        return player_scores, game_row, score_rows
 
-        async with game_entry_lock:
-            games_sheet.append_row(game_row)
-            scores_sheet.append_rows(score_rows)
+    def _duplicate_error(self, duplicate: Submission) -> str:
+        if duplicate.game_id is None:
+            return "Error: the same game is being entered by another submission right now, so it was not entered again."
+        minutes = int((datetime.datetime.now(TIME_ZONE).replace(tzinfo=None) - duplicate.entered_at).total_seconds() // 60)
+        return (f"Error: the same game was already entered {minutes} minute(s) ago (Game ID `{duplicate.game_id}`), "
+                f"so it was not entered again. Use `/score_status` to check that it reached the leaderboard.")
+
+    async def _enter_scores(
+        self,
+        leaderboard_type: str,
+        game_length: str,
+        player_east: discord.Member, score_east: int,
+        player_south: discord.Member, score_south: int,
+        player_west: discord.Member, score_west: int,
+        player_north: discord.Member | None = None, score_north: int | None = None,
+        leftover_points: int = 0,
+        chombo_east: int = 0,
+        chombo_south: int = 0,
+        chombo_west: int = 0,
+        chombo_north: int = 0,
+        interaction_id: int | None = None
+    ) -> str:
+        # a retried interaction gets the first attempt's answer
+        if interaction_id is not None:
+            previous = submission_index.find_interaction(interaction_id)
+            if previous is not None:
+                return previous.response or "Error: this submission is still being entered."
+
+        timestamp = str(datetime.datetime.now(TIME_ZONE)).split(".")[0]
+        try:
+            player_scores, game_row, score_rows = self._score_game(
+                timestamp, game_length,
+                player_east, score_east,
+                player_south, score_south,
+                player_west, score_west,
+                player_north, score_north,
+                leftover_points,
+                chombo_east, chombo_south, chombo_west, chombo_north)
+        except ScoreEntryError as e:
+            return str(e)
 
-        score_printout = f"Successfully entered scores for a {game_type} game onto **[{leaderboard_type}]({url})**:\n"
+        key = fingerprint(leaderboard_type, game_row[1], score_rows)
+        duplicate = submission_index.find_game(key)
+        if duplicate is not None:
+            return self._duplicate_error(duplicate)
+        # reserved before the first `await`, so a concurrent resubmission sees it
+        submission = submission_index.reserve_game(key)
+        interaction_submission = submission_index.reserve_interaction(interaction_id) if interaction_id is not None else None
+
+        # record the scores in the local store; `push_scores` writes them to the sheet
+        try:
+            game = await leaderboard_store.add_game(leaderboard_type, game_row, score_rows)
+        except BaseException:
+            submission_index.release_game(key)
+            if interaction_id is not None:
+                submission_index.release_interaction(interaction_id)
+            raise
+        submission.game_id = game.game_id
+        standings_engine.add_game(leaderboard_type, score_rows)
+        _, _, _, url = self._get_leaderboard(leaderboard_type)
+
+        score_printout = f"Successfully entered scores for a {game_row[1]} game onto **[{leaderboard_type}]({url})**:\n"
         for ps in player_scores:
             score_printout += f"\n{ps}\n"
+        score_printout += f"\nGame ID: `{game.game_id}` (use `/score_status` to check that it reached the leaderboard)"
 
+        if interaction_submission is not None:
+            interaction_submission.game_id = game.game_id
+            interaction_submission.response = score_printout
         return score_printout
 
+    async def _enter_scores_bulk(self, guild: discord.Guild, leaderboard_type: str, games: list[dict[str, str]]) -> Tuple[str, str]:
+        """
+        Validate and score every game of a bulk entry file; enter them all only if all of them are valid.
+        Returns the summary and the per-game report.
+        """
+        timestamp = str(datetime.datetime.now(TIME_ZONE)).split(".")[0]
+
+        def parse_int(game: dict[str, str], column: str, default: int | None) -> int | None:
+            if not game[column]:
+                return default
+            try:
+                return int(game[column])
+            except ValueError:
+                raise ScoreEntryError(f"Error: `{column}` must be a whole number, got \"{game[column]}\".")
+
+        def get_member(game: dict[str, str], column: str) -> discord.Member | None:
+            if not game[column]:
+                return None
+            member = guild.get_member_named(game[column])
+            if member is None:
+                raise ScoreEntryError(f"Error: no server member named \"{game[column]}\" (`{column}`).")
+            return member
+
+        scored_games = []
+        keys: Dict[Fingerprint, int] = {}  # fingerprint -> game number in the file
+        report_lines = []
+        error_count = 0
+        for i, game in enumerate(games, 1):
+            try:
+                if game["game_length"] not in ("Hanchan", "Tonpuu"):
+                    raise ScoreEntryError(f"Error: `game_length` must be Hanchan or Tonpuu, got \"{game['game_length']}\".")
+                for column in ("player_east", "score_east", "player_south", "score_south", "player_west", "score_west"):
+                    if not game[column]:
+                        raise ScoreEntryError(f"Error: missing `{column}`.")
+                player_scores, game_row, score_rows = self._score_game(
+                    timestamp, game["game_length"],
+                    get_member(game, "player_east"), parse_int(game, "score_east", None),
+                    get_member(game, "player_south"), parse_int(game, "score_south", None),
+                    get_member(game, "player_west"), parse_int(game, "score_west", None),
+                    get_member(game, "player_north"), parse_int(game, "score_north", None),
+                    parse_int(game, "leftover_points", 0),
+                    parse_int(game, "chombo_east", 0), parse_int(game, "chombo_south", 0),
+                    parse_int(game, "chombo_west", 0), parse_int(game, "chombo_north", 0))
+                key = fingerprint(leaderboard_type, game_row[1], score_rows)
+                if key in keys:
+                    raise ScoreEntryError(f"Error: the same game as game {keys[key]}.")
+                duplicate = submission_index.find_game(key)
+                if duplicate is not None:
+                    raise ScoreEntryError(self._duplicate_error(duplicate))
+                keys[key] = i
+            except ScoreEntryError as e:
+                error_count += 1
+                report_lines.append(f"Game {i}: {e}".replace("\n", " "))
+                continue
+            except AssertionError as e:
+                # e.g., a raw score that isn't a multiple of 100
+                error_count += 1
+                report_lines.append(f"Game {i}: Error: {e}")
+                continue
+            scored_games.append((game_row, score_rows))
+            results = ", ".join(f"{ps.discord_name} {PLACEMENT_KEY[ps.placement]} ({ps.final_score:.1f})" for ps in player_scores)
+            report_lines.append(f"Game {i} ({game_row[1]}): {results}")
+
+        report = "\n".join(report_lines)
+        if error_count:
+            return f"No games were entered: {error_count} of {len(games)} game(s) have errors. Please fix them and upload the file again.", report
+
+        # one transaction for all games; `push_scores` then writes them with one append per worksheet
+        submissions = [submission_index.reserve_game(key) for key in keys]
+        try:
+            records = await leaderboard_store.add_games(leaderboard_type, scored_games)
+        except BaseException:
+            for key in keys:
+                submission_index.release_game(key)
+            raise
+        for submission, record in zip(submissions, records):
+            submission.game_id = record.game_id
+        for game_row, score_rows in scored_games:
+            standings_engine.add_game(leaderboard_type, score_rows)
+        _, _, _, url = self._get_leaderboard(leaderboard_type)
+        return f"Successfully entered {len(records)} game(s) onto **[{leaderboard_type}]({url})** (game IDs `{records[0].game_id}` to `{records[-1].game_id}`).", report
+
+    @app_commands.command(name="enter_scores_bulk", description=f"Enter many games at once from a CSV or JSON file. Only usable by @{OFFICER_ROLE}.")
+    @app_commands.describe(
+        leaderboard_type="Which leaderboard to enter the games into.",
+        file="A CSV file (with a header row) or a JSON list of games. See the README for the columns.")
+    @app_commands.checks.has_role(OFFICER_ROLE)
+    async def enter_scores_bulk(
+        self,
+        interaction: Interaction,
+        leaderboard_type: Literal["Club Leaderboard", "Friendly Leaderboard"],
+        file: discord.Attachment
+    ) -> None:
+        await interaction.response.defer()
+
+        if file.size > BULK_ENTRY_MAX_BYTES:
+            await interaction.followup.send(content=f"Error: the file is too large (max {BULK_ENTRY_MAX_BYTES:,} bytes).")
+            return
+        try:
+            games = parse_bulk_games(file.filename, await file.read())
+        except ScoreEntryError as e:
+            await interaction.followup.send(content=str(e))
+            return
+        if not games:
+            await interaction.followup.send(content="Error: the file contains no games.")
+            return
+
+        summary, report = await self._enter_scores_bulk(interaction.guild, leaderboard_type, games)
+        # keep within Discord's message length limit; attach the report if it's long
+        if len(summary) + len(report) < 1900:
+            await interaction.followup.send(content=f"{summary}\n```\n{report}\n```", suppress_embeds=True)
+        else:
+            report_file = discord.File(io.BytesIO(report.encode()), filename="bulk_entry_report.txt")
+            await interaction.followup.send(content=summary, file=report_file, suppress_embeds=True)
+
+    def _get_leaderboard(self, leaderboard_type: str) -> Tuple[AsyncWorksheet, AsyncWorksheet, asyncio.Lock, str]:
+        """
+        Returns the `Games` worksheet, `Scores` worksheet, game entry lock, and URL of a leaderboard.
+        """
+        if leaderboard_type == "Club Leaderboard":
+            return club_leaderboard_games, club_leaderboard_scores, club_leaderboard_game_entry_lock, CLUB_LEADERBOARD_URL
+        else:
+            return friendly_leaderboard_games, friendly_leaderboard_scores, friendly_leaderboard_game_entry_lock, FRIENDLY_LEADERBOARD_URL
+
+    # ===================================================
+    # REPLICATION LOGIC
+    # ===================================================
+    async def _push_leaderboard(self, leaderboard_type: str) -> None:
+        """
+        Write all unflushed games of one leaderboard with (at most) one
+        `append_rows` per worksheet. The "Games" and "Scores" steps are marked
+        separately so a failure in between never duplicates "Games" rows.
+
+        An append that failed after possibly being applied (a 5xx or a
+        dropped connection) is checked against the worksheet before its games
+        are appended again, so a lost response never duplicates rows either.
+        """
+        games_sheet, scores_sheet, game_entry_lock, _ = self._get_leaderboard(leaderboard_type)
+
+        async with game_entry_lock:
+            unflushed = await leaderboard_store.unflushed_games(leaderboard_type)
+
+            games_to_write = [g for g in unflushed if g.status == PENDING]
+            written = await self._find_unconfirmed_append(leaderboard_type, games_sheet, games_to_write, lambda g: [g.game_row], 2)
+            if written:
+                await leaderboard_store.mark_games(written, GAMES_WRITTEN)
+                games_to_write = [g for g in games_to_write if g not in written]
+            if games_to_write:
+                await self._append_games(leaderboard_type, games_sheet, games_to_write, lambda g: [g.game_row])
+                await leaderboard_store.mark_games(games_to_write, GAMES_WRITTEN)
+
+            scores_to_write = [g for g in unflushed if g.status == GAMES_WRITTEN]
+            # (timestamp, game type, seat, Discord name) identify a "Scores" row
+            written = await self._find_unconfirmed_append(leaderboard_type, scores_sheet, scores_to_write, lambda g: g.score_rows, 4)
+            if written:
+                await leaderboard_store.mark_games(written, FLUSHED)
+                scores_to_write = [g for g in scores_to_write if g not in written]
+            if scores_to_write:
+                await self._append_games(leaderboard_type, scores_sheet, scores_to_write, lambda g: g.score_rows)
+                await leaderboard_store.mark_games(scores_to_write, FLUSHED)
+            if written or scores_to_write:
+                logging.info(f"Flushed {len(written) + len(scores_to_write)} game(s) to the {leaderboard_type}.")
+
+    async def _append_games(self, leaderboard_type: str, sheet: AsyncWorksheet, games: list[GameRecord], rows_of: Callable[[GameRecord], list[list]]) -> None:
+        """
+        Append the rows (`rows_of(game)`) of `games` with one `append_rows`,
+        remembering the games if it failed but may have been applied.
+        """
+        try:
+            await sheet.append_rows([row for g in games for row in rows_of(g)])
+        except Exception as e:
+            if may_have_been_applied(e):
+                self._unconfirmed_appends[(leaderboard_type, sheet.title)] = [g.game_id for g in games]
+            raise
+
+    async def _find_unconfirmed_append(
+        self, leaderboard_type: str, sheet: AsyncWorksheet, games: list[GameRecord],
+        rows_of: Callable[[GameRecord], list[list]], key_columns: int
+    ) -> list[GameRecord]:
+        """
+        The games of an earlier append to `sheet` that failed ambiguously (see
+        `_append_games()`) but was applied after all. An append is all or
+        nothing, so it was applied if its rows, compared by their first
+        `key_columns` columns, are the last rows of the worksheet.
+        """
+        game_ids = self._unconfirmed_appends.get((leaderboard_type, sheet.title))
+        if game_ids is None:
+            return []
+        appended = [g for g in games if g.game_id in game_ids]
+        expected = [[str(v) for v in row[:key_columns]] for g in appended for row in rows_of(g)]
+        values = await sheet.get_all_values()
+        del self._unconfirmed_appends[(leaderboard_type, sheet.title)]
+        tail = [(row + [""] * key_columns)[:key_columns] for row in values[len(values) - len(expected):]]
+        if not expected or tail != expected:
+            return []
+        logging.warning(f"A failed append of {len(appended)} game(s) to {sheet.title} of the {leaderboard_type} was applied after all.")
+        return appended
+
+    async def _pull_leaderboard(self, leaderboard_type: str) -> None:
+        """
+        Mirror the "Games" and "Scores" worksheets (including manual edits) into the store.
+        """
+        games_sheet, scores_sheet, game_entry_lock, _ = self._get_leaderboard(leaderboard_type)
+
+        async with game_entry_lock:
+            games_values, scores_values = await asyncio.gather(
+                games_sheet.get_all_values(),
+                scores_sheet.get_all_values())
+            await leaderboard_store.replace_flushed_games(leaderboard_type, games_values, scores_values)
+            # manual edits may have touched any game, so recount everything.
+            # the store runs one query at a time and resumes its callers in order,
+            # so no `add_game()` can be lost between the query and the rebuild.
+            standings_engine.rebuild(await leaderboard_store.aggregate_scores())
+
+    @tasks.loop(seconds=10, reconnect=True)
+    async def push_scores(self):
+        for leaderboard_type in ("Club Leaderboard", "Friendly Leaderboard"):
+            try:
+                # shielded so unloading the cog never interrupts a push between
+                # the sheet write and marking the games as written
+                await asyncio.shield(self._push_leaderboard(leaderboard_type))
+            except Exception as e:
+                # the games stay in the store; try again next iteration
+                logging.warning(f"Failed to push scores to the {leaderboard_type}: {e!r}")
+
+    @tasks.loop(minutes=15, reconnect=True)
+    async def pull_scores(self):
+        for leaderboard_type in ("Club Leaderboard", "Friendly Leaderboard"):
+            try:
+                await asyncio.shield(self._pull_leaderboard(leaderboard_type))
+            except Exception as e:
+                logging.warning(f"Failed to pull scores from the {leaderboard_type}: {e!r}")
+
+    # ===================================================
+    # RESCORE LOGIC
+    # ===================================================
+    async def _rescore_leaderboard(self, leaderboard_type: str, dry_run: bool) -> int:
+        """
+        Rescore every game of a leaderboard under the current ruleset and write
+        back only the changed cells, with one `values_batch_update`.
+        Returns the number of changed games.
+        """
+        games_sheet, scores_sheet, game_entry_lock, url = self._get_leaderboard(leaderboard_type)
+        # get every entered game onto the sheets first, so none is left on the old ruleset
+        await self._push_leaderboard(leaderboard_type)
+
+        async with game_entry_lock:
+            games_values, scores_values = await asyncio.gather(
+                games_sheet.get_all_values(),
+                scores_sheet.get_all_values())
+            changed = rescore_games(
+                pair_sheet_rows(games_values, scores_values), CURRENT_RULESET, self.ruleset_version, ruleset_history)
+            if dry_run or not changed:
+                return len(changed)
+
+            data = []
+            for game, score_rows in changed:
+                if game.games_row_number is not None:
+                    data.append({"range": f"'{games_sheet.title}'!D{game.games_row_number}", "values": [[self.ruleset_version]]})
+                for row_number, row in zip(game.score_row_numbers, score_rows):
+                    data.append({"range": f"'{scores_sheet.title}'!F{row_number}:J{row_number}", "values": [row[5:]]})
+            await sheets_connection.values_batch_update(url, data)
+
+        # mirror the rewritten sheets into the store and recount the standings
+        await self._pull_leaderboard(leaderboard_type)
+        return len(changed)
+
+    @commands.command(name="rescore", hidden=True)
+    @commands.is_owner()
+    async def rescore(self, ctx: commands.Context, leaderboard: Literal["club", "friendly"], dry_run: bool = False):
+        leaderboard_type = "Club Leaderboard" if leaderboard == "club" else "Friendly Leaderboard"
+        async with ctx.typing():
+            start = time.perf_counter()
+            changed = await asyncio.shield(self._rescore_leaderboard(leaderboard_type, dry_run))
+        verb = "would change" if dry_run else "changed"
+        await ctx.send(f"Rescoring the {leaderboard_type} under ruleset version {self.ruleset_version} {verb} {changed} game(s) "
+                       f"({time.perf_counter() - start:.1f}s).")
+
+    # ===================================================
+    # STANDINGS LOGIC
+    # ===================================================
+    def _get_registered_names(self, leaderboard_type: str) -> Dict[str, str]:
+        if leaderboard_type == "Club Leaderboard":
+            index = club_leaderboard_registry_index
+        else:
+            index = friendly_leaderboard_registry_index
+        return {discord_name: name for discord_name, name, _ in index.entries()}
+
+    async def _publish_standings(self, leaderboard_type: str) -> None:
+        """
+        Overwrite the "Standings" worksheet with one `batch_update`, blanking
+        out any rows left over from a longer previous version. A leaderboard
+        without that worksheet is skipped until the cog is reloaded.
+        """
+        if leaderboard_type == "Club Leaderboard":
+            standings_sheet = club_leaderboard_standings
+        else:
+            standings_sheet = friendly_leaderboard_standings
+
+        # mark clean first, so changes made while we write get published next time
+        standings_engine.dirty.discard(leaderboard_type)
+        if leaderboard_type in self._standings_disabled:
+            return
+        values = standings_engine.to_values(leaderboard_type, self._get_registered_names(leaderboard_type))
+        try:
+            row_count = await standings_sheet.ensure_row_count(len(values))
+            previous_rows = self._published_standings_rows.get(leaderboard_type, row_count)
+            width = len(values[0])
+            values += [[""] * width for _ in range(max(0, previous_rows - len(values)))]
+            await standings_sheet.batch_update([{"range": "A1", "values": values}])
+        except gspread.exceptions.WorksheetNotFound:
+            # publishing the standings is optional
+            logging.info(f"The {leaderboard_type} has no \"{standings_sheet.title}\" worksheet; not publishing its standings.")
+            self._standings_disabled.add(leaderboard_type)
+            return
+        except Exception:
+            standings_engine.dirty.add(leaderboard_type)
+            raise
+        self._published_standings_rows[leaderboard_type] = len(values)
+
+    @tasks.loop(minutes=5, reconnect=True)
+    async def publish_standings(self):
+        for leaderboard_type in list(standings_engine.dirty):
+            try:
+                await self._publish_standings(leaderboard_type)
+            except Exception as e:
+                logging.warning(f"Failed to publish standings to the {leaderboard_type}: {e!r}")
+
+    @app_commands.command(name="leaderboard", description="Show the current standings.")
+    @app_commands.describe(
+        leaderboard_type="Which leaderboard? (default: Club Leaderboard)",
+        game_type="Which game type? (default: Yonma Hanchan)")
+    async def leaderboard(
+        self,
+        interaction: Interaction,
+        leaderboard_type: Literal["Club Leaderboard", "Friendly Leaderboard"] = "Club Leaderboard",
+        game_type: Literal["Yonma Hanchan", "Yonma Tonpuu", "Sanma Hanchan", "Sanma Tonpuu"] = "Yonma Hanchan"
+    ):
+        ranked = standings_engine.ranked(leaderboard_type, game_type)
+        if not ranked:
+            await interaction.response.send_message(f"No {game_type} games on the {leaderboard_type} yet.")
+            return
+
+        _, _, _, url = self._get_leaderboard(leaderboard_type)
+        names = self._get_registered_names(leaderboard_type)
+        response = f"**{game_type}** standings on the **[{leaderboard_type}]({url})**:\n"
+        # keep within Discord's message length limit
+        for rank, p in enumerate(ranked[:20], 1):
+            name = names.get(p.discord_name, p.discord_name)
+            response += f"\n{rank}. **{name}** — {p.total_final_score:.1f} ({p.games} games, avg. placement {p.average_placement:.2f})"
+        if len(ranked) > 20:
+            response += f"\n...and {len(ranked) - 20} more."
+        await interaction.response.send_message(response, suppress_embeds=True)
+
+    @app_commands.command(name="score_status", description=f"Check whether entered scores reached the leaderboard. Only usable by @{OFFICER_ROLE} and @{ELDER_ROLE}.")
+    @app_commands.describe(game_id="(optional) The game ID shown when the scores were entered.")
+    @app_commands.checks.has_any_role(OFFICER_ROLE, ELDER_ROLE)
+    async def score_status(self, interaction: Interaction, game_id: str | None = None):
+        if game_id is not None:
+            game = await leaderboard_store.get_game(game_id)
+            if game is None:
+                response = f"No game with ID `{game_id}`."
+            else:
+                response = f"Game `{game_id}` ({game.game_row[1]} on the {game.leaderboard_type}): **{game.status}**."
+        else:
+            pending = await leaderboard_store.unflushed_games()
+            if not pending:
+                response = "All entered scores have reached the leaderboards."
+            else:
+                response = f"{len(pending)} game(s) waiting to reach the leaderboards:\n"
+                # keep within Discord's message length limit
+                response += "\n".join(f"- `{g.game_id}` ({g.game_row[1]} on the {g.leaderboard_type}): {g.status}" for g in pending[:20])
+                if len(pending) > 20:
+                    response += f"\n...and {len(pending) - 20} more."
+        await interaction.response.send_message(response, ephemeral=True)
+
     @app_commands.command(name="enter_scores_club", description=f"Enter scores for a club game. Only usable by @{OFFICER_ROLE} and @{ELDER_ROLE}.")
     @app_commands.describe(
         game_length="Hanchan or tonpuu?",
@@ -307,7 +1048,8 @@ class Utilities(commands.Cog):
             chombo_east=chombo_east,
             chombo_south=chombo_south,
             chombo_west=chombo_west,
-            chombo_north=chombo_north
+            chombo_north=chombo_north,
+            interaction_id=interaction.id
         )
 
         await interaction.followup.send(content=response, suppress_embeds=True)
@@ -356,7 +1098,8 @@ class Utilities(commands.Cog):
             chombo_east=chombo_east,
             chombo_south=chombo_south,
             chombo_west=chombo_west,
-            chombo_north=chombo_north
+            chombo_north=chombo_north,
+            interaction_id=interaction.id
         )
 
         await interaction.followup.send(content=response, suppress_embeds=True)
@@ -2,8 +2,10 @@
 # ========================
 # Discord Stuff
 # ========================
+import datetime
 import zoneinfo
 from global_stuff import assert_getenv
+from metrics import TimedLock
 
 GUILD_ID: int                 = int(assert_getenv("guild_id"))
 TIME_ZONE: zoneinfo.ZoneInfo  = zoneinfo.ZoneInfo(assert_getenv("time_zone"))
@@ -15,32 +17,63 @@ ELDER_ROLE: str               = assert_getenv("elder_role")
 # ========================
 # Google Sheets Stuff
 # ========================
-import gspread
-import asyncio
+from .sheets import AsyncWorksheet, SheetsConnection
+from .registry import RegistryConsistency, RegistryIndex, RegistryLock, RegistryWriter
+from .store import LeaderboardStore
+from .snapshot import WarmStartSnapshot
+from .standings import StandingsEngine
+from .submissions import SubmissionIndex
+from .ruleset import Ruleset, RulesetHistory
 
 CLUB_LEADERBOARD_URL: str     = assert_getenv("club_leaderboard_url")
 FRIENDLY_LEADERBOARD_URL: str = assert_getenv("friendly_leaderboard_url")
 MAX_NAME_LEN: int     = int(assert_getenv("max_name_len"))
+BULK_ENTRY_MAX_BYTES: int = 1_000_000  # for `/enter_scores_bulk` attachments
+
+# nothing connects to Google at import time; the worksheets are opened on
+# first use (see `sheets.py`), and every call runs off the event loop
+sheets_connection = SheetsConnection("gs_service_account.json")
 
-gs_client = gspread.service_account(filename='gs_service_account.json')
 # club leaderboard
-club_leaderboard_gs = gs_client.open_by_url(CLUB_LEADERBOARD_URL)
-club_leaderboard_registry = club_leaderboard_gs.worksheet("Registry")
-club_leaderboard_games = club_leaderboard_gs.worksheet("Games")
-club_leaderboard_scores = club_leaderboard_gs.worksheet("Scores")
+club_leaderboard_registry = AsyncWorksheet(sheets_connection, CLUB_LEADERBOARD_URL, "Registry")
+club_leaderboard_games = AsyncWorksheet(sheets_connection, CLUB_LEADERBOARD_URL, "Games")
+club_leaderboard_scores = AsyncWorksheet(sheets_connection, CLUB_LEADERBOARD_URL, "Scores")
+club_leaderboard_standings = AsyncWorksheet(sheets_connection, CLUB_LEADERBOARD_URL, "Standings")
 
-club_leaderboard_game_entry_lock = asyncio.Lock() # for both `games` and `scores` worksheets
+club_leaderboard_game_entry_lock = TimedLock("club_game_entry") # for both `games` and `scores` worksheets
 
 # friendly leaderboard
-friendly_leaderboard_gs = gs_client.open_by_url(FRIENDLY_LEADERBOARD_URL)
-friendly_leaderboard_registry = friendly_leaderboard_gs.worksheet("Registry")
-friendly_leaderboard_games = friendly_leaderboard_gs.worksheet("Games")
-friendly_leaderboard_scores = friendly_leaderboard_gs.worksheet("Scores")
+friendly_leaderboard_registry = AsyncWorksheet(sheets_connection, FRIENDLY_LEADERBOARD_URL, "Registry")
+friendly_leaderboard_games = AsyncWorksheet(sheets_connection, FRIENDLY_LEADERBOARD_URL, "Games")
+friendly_leaderboard_scores = AsyncWorksheet(sheets_connection, FRIENDLY_LEADERBOARD_URL, "Scores")
+friendly_leaderboard_standings = AsyncWorksheet(sheets_connection, FRIENDLY_LEADERBOARD_URL, "Standings")
+
+friendly_leaderboard_game_entry_lock = TimedLock("friendly_game_entry") # for both `games` and `scores` worksheets
+
+# local SQLite store, the source of truth for both leaderboards; see `store.py`
+STORE_PATH: str = "./data/leaderboards.sqlite3"
+leaderboard_store = LeaderboardStore(STORE_PATH)
+
+# in-memory registry indexes; loaded in the background when the Utilities cog loads
+club_leaderboard_registry_index = RegistryIndex(club_leaderboard_registry)
+friendly_leaderboard_registry_index = RegistryIndex(friendly_leaderboard_registry)
+
+# the indexes as of the last shutdown, so restarts can serve registrations right away; see `snapshot.py`
+WARM_START_SNAPSHOT_PATH: str = "./data/warm_start.json"
+warm_start_snapshot = WarmStartSnapshot(WARM_START_SNAPSHOT_PATH)
+
+# writes registrations to both registries at once, rolling back partial failures; see `RegistryWriter`
+registry_writer = RegistryWriter(leaderboard_store, [club_leaderboard_registry, friendly_leaderboard_registry])
+
+# recently entered games and score entry interactions, to reject resubmissions; see `submissions.py`
+DUPLICATE_WINDOW = datetime.timedelta(hours=1)
+submission_index = SubmissionIndex(TIME_ZONE, DUPLICATE_WINDOW, max_size=2000)
 
-friendly_leaderboard_game_entry_lock = asyncio.Lock() # for both `games` and `scores` worksheets
+# outcome of the last reconciliation of the two registries
+registry_consistency = RegistryConsistency()
 
-# registry lock (used for both leaderboards)
-registry_lock = asyncio.Lock()
+# registry lock (used for both leaderboards and their indexes); see `RegistryLock`
+registry_lock = RegistryLock("registry")
 
 
 # ========================
@@ -71,3 +104,24 @@ SANMA_TONPUU_UMA_1: int       = int(assert_getenv("sanma_tonpuu_uma_1"))
 SANMA_TONPUU_UMA_2: int       = int(assert_getenv("sanma_tonpuu_uma_2"))
 SANMA_TONPUU_UMA_3: int       = int(assert_getenv("sanma_tonpuu_uma_3"))
 
+# the ruleset above, versioned so games remember what they were scored under; see `ruleset.py`
+CURRENT_RULESET = Ruleset(
+    tiebreaker_method=TIEBREAKER_METHOD,
+    chombo_penalty=DEFAULT_CHOMBO_PENALTY,
+    starting_points={"Yonma": YONMA_STARTING_POINTS, "Sanma": SANMA_STARTING_POINTS},
+    uma={
+        "Yonma": {
+            "Hanchan": [YONMA_HANCHAN_UMA_1, YONMA_HANCHAN_UMA_2, YONMA_HANCHAN_UMA_3, YONMA_HANCHAN_UMA_4],
+            "Tonpuu": [YONMA_TONPUU_UMA_1, YONMA_TONPUU_UMA_2, YONMA_TONPUU_UMA_3, YONMA_TONPUU_UMA_4],
+        },
+        "Sanma": {
+            "Hanchan": [SANMA_HANCHAN_UMA_1, SANMA_HANCHAN_UMA_2, SANMA_HANCHAN_UMA_3],
+            "Tonpuu": [SANMA_TONPUU_UMA_1, SANMA_TONPUU_UMA_2, SANMA_TONPUU_UMA_3],
+        },
+    },
+)
+RULESET_HISTORY_PATH: str = "./data/rulesets.json"
+ruleset_history = RulesetHistory(RULESET_HISTORY_PATH)
+
+# in-memory standings for both leaderboards; see `standings.py`
+standings_engine = StandingsEngine(DEFAULT_CHOMBO_PENALTY)
@@ -1,7 +1,12 @@
+import csv
 import discord
+import io
+import json
+import numpy as np
 from typing import Literal
 
 from .config import *
+from .ruleset import SEAT_PRIORITY, Ruleset, score_games
 
 def get_discord_name(member: discord.Member) -> str:
     discord_name = member.name
@@ -11,14 +16,6 @@ def get_discord_name(member: discord.Member) -> str:
         discord_name += "#" + discriminator
     return discord_name
 
-# for "seat" tiebreaker method
-SEAT_SORT_KEY = {
-    "East": 4,
-    "South": 3,
-    "West": 2,
-    "North": 1,
-}
-
 PLACEMENT_KEY = {
     1: "1st",
     2: "2nd",
@@ -26,35 +23,46 @@ PLACEMENT_KEY = {
     4: "4th",
 }
 
-# placement uma lookup table based on ruleset, game type, and placement
-PLACEMENT_UMA = {
-    "Yonma": {
-        "Hanchan": {
-            1: YONMA_HANCHAN_UMA_1,
-            2: YONMA_HANCHAN_UMA_2,
-            3: YONMA_HANCHAN_UMA_3,
-            4: YONMA_HANCHAN_UMA_4,
-        },
-        "Tonpuu": {
-            1: YONMA_TONPUU_UMA_1,
-            2: YONMA_TONPUU_UMA_2,
-            3: YONMA_TONPUU_UMA_3,
-            4: YONMA_TONPUU_UMA_4,
-        },
-    },
-    "Sanma": {
-        "Hanchan": {
-            1: SANMA_HANCHAN_UMA_1,
-            2: SANMA_HANCHAN_UMA_2,
-            3: SANMA_HANCHAN_UMA_3,
-        },
-        "Tonpuu": {
-            1: SANMA_TONPUU_UMA_1,
-            2: SANMA_TONPUU_UMA_2,
-            3: SANMA_TONPUU_UMA_3,
-        },
-    },
-}
+
+class ScoreEntryError(Exception):
+    """
+    Invalid score entry; the message is shown to the user as is.
+    """
+
+
+# columns of a bulk score entry file; same names as the `enter_scores_*` parameters
+BULK_GAME_COLUMNS = [
+    "game_length",
+    "player_east", "score_east",
+    "player_south", "score_south",
+    "player_west", "score_west",
+    "player_north", "score_north",
+    "leftover_points",
+    "chombo_east", "chombo_south", "chombo_west", "chombo_north",
+]
+
+def parse_bulk_games(filename: str, data: bytes) -> list[dict[str, str]]:
+    """
+    Parse a bulk score entry file: either a CSV with a header row, or a JSON
+    list of objects, using the `BULK_GAME_COLUMNS` names. Missing or empty
+    values are returned as "". Raises `ScoreEntryError` if unreadable.
+    """
+    try:
+        text = data.decode("utf-8-sig")
+        if filename.lower().endswith(".json"):
+            games = json.loads(text)
+            if not isinstance(games, list) or not all(isinstance(g, dict) for g in games):
+                raise ScoreEntryError("Error: the JSON file must contain a list of games.")
+        else:
+            games = list(csv.DictReader(io.StringIO(text)))
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+        raise ScoreEntryError(f"Error: could not read `{filename}` ({e}).")
+
+    unknown_columns = set().union(*(g.keys() for g in games)) - set(BULK_GAME_COLUMNS) if games else set()
+    if unknown_columns:
+        raise ScoreEntryError(f"Error: unknown column(s) {sorted(unknown_columns)}. Expected {BULK_GAME_COLUMNS}.")
+
+    return [{c: str(g.get(c) if g.get(c) is not None else "").strip() for c in BULK_GAME_COLUMNS} for g in games]
 
 
 class PlayerScore:
@@ -63,43 +71,24 @@ class PlayerScore:
         seat: str,
         member: discord.Member,
         raw_score: int,
-        penalty: float=0.0
+        chombo: int = 0
     ):
         # columns of the "Scores" worksheet
-        assert seat in SEAT_SORT_KEY, f"Invalid seat: {seat}. Must be one of {list(SEAT_SORT_KEY.keys())}."
+        assert seat in SEAT_PRIORITY, f"Invalid seat: {seat}. Must be one of {list(SEAT_PRIORITY.keys())}."
         self.seat: str = seat
         self.discord_name: str = get_discord_name(member)
         assert raw_score % 100 == 0, f"Invalid raw score: {raw_score}. Must be a multiple of 100."
         self.raw_score: int = raw_score
         self.placement: int | None = None  # to be assigned later
         self.uma: float | None = None  # to be assigned later based on placement and ruleset
-        assert penalty <= 0, f"Invalid penalty: {penalty}. Must be non-positive."
-        self.penalty: float = penalty
+        assert chombo >= 0, f"Invalid chombo count: {chombo}. Must be non-negative."
+        self.chombo: int = chombo
+        self.penalty: float | None = None  # to be assigned later based on chombo count and ruleset
         self.final_score: float | None = None  # to be calculated later based on placement and tiebreaker
 
         # for Discord announcement
         self.mention: str = member.mention
         
-    # instead of implementing the rich comparison methods,
-    # we provide a sort key function for easier use 
-    # with different tiebreaker methods.
-    def sort_key(self) -> tuple:
-        """
-        Returns a tuple usable for sorting.
-        Higher raw_score is always better.
-        """
-        if TIEBREAKER_METHOD == "split":
-            # Only raw score matters; ties remain ties
-            return (self.raw_score,)
-        elif TIEBREAKER_METHOD == "seat":
-            # Raw score first, then seat priority
-            return (
-                self.raw_score,
-                SEAT_SORT_KEY[self.seat],
-            )
-        else:
-            raise ValueError(f"Unknown tiebreaker: {TIEBREAKER_METHOD}")
-
     # TODO: turn this include a rich embed with a table
     def __str__(self) -> str:
         """
@@ -125,62 +114,26 @@ class PlayerScore:
 def calculate_placement_and_final_score(
     game_mode: Literal["Yonma", "Sanma"],
     game_length: Literal["Hanchan", "Tonpuu"],
-    players: list[PlayerScore]
+    players: list[PlayerScore],
+    ruleset: Ruleset = CURRENT_RULESET
 ) -> None:
     """
     Takes in a list of PlayerScore objects representing results of a single game.
     
-    Modifies the PlayerScore objects in-place to assign placements and final scores
-    based on game mode, game length, and tiebreaker method.
+    Modifies the PlayerScore objects in-place to assign placements, uma,
+    penalties and final scores under `ruleset` (the configured one by
+    default). Scores through `score_games()`, like `rc/rescore`, so a game
+    is scored the same either way.
     
     Does not modify the input list order.
     """
-    if game_mode == "Yonma":
-        starting_points = YONMA_STARTING_POINTS
-    else:
-        starting_points = SANMA_STARTING_POINTS
-
-    # first, sort the players without explicit placement assignment
-    sorted_players = sorted(
-        players,
-        key=lambda p: p.sort_key(),
-        reverse=True
-    )
-
-    # then, assign placement, uma, final_score based on tiebreaker (implemented as a sort key)
-    i = 0
-    while i < len(sorted_players):
-        player = sorted_players[i]
-        current_placement = i + 1  # placements are 1-indexed
-
-        # look ahead to find ties; if found, resolve all ties at once
-        if i < len(sorted_players) - 1 and player.sort_key() == sorted_players[i+1].sort_key():
-            # find all players in this tie group
-            tie_group = [player, sorted_players[i+1]]  # at least these two are tied
-            
-            for j in range(i+2, len(sorted_players)):
-                if sorted_players[j].sort_key() == player.sort_key():
-                    tie_group.append(sorted_players[j])
-                else:
-                    break
-            
-            # calculate the combined uma, then divide into equal shares for the tie group
-            combined_uma = 0
-            for k in range(current_placement, current_placement + len(tie_group)):
-                combined_uma += PLACEMENT_UMA[game_mode][game_length][k]
-            individual_uma = combined_uma / len(tie_group)
-
-            for tied_player in tie_group:
-                tied_player.placement = current_placement
-                tied_player.uma = individual_uma
-                tied_player.final_score = (tied_player.raw_score - starting_points) / 1000 + tied_player.uma + tied_player.penalty
-            
-            # skip ahead by the size of the tie group
-            i += len(tie_group)
-            continue
-        
-        # the normal case: no tie, just assign placement, uma, and final_score directly
-        player.placement = current_placement
-        player.uma = PLACEMENT_UMA[game_mode][game_length][current_placement]
-        player.final_score = (player.raw_score - starting_points) / 1000 + player.uma + player.penalty
-        i += 1
+    placements, umas, penalties, final_scores = score_games(
+        ruleset, game_mode, game_length,
+        np.array([[p.raw_score for p in players]], dtype=float),
+        np.array([[SEAT_PRIORITY[p.seat] for p in players]]),
+        np.array([[p.chombo for p in players]]))
+    for i, player in enumerate(players):
+        player.placement = placements[0, i].item()
+        player.uma = umas[0, i].item()
+        player.penalty = penalties[0, i].item()
+        player.final_score = final_scores[0, i].item()
@@ -0,0 +1,510 @@
+import asyncio
+import contextlib
+import datetime
+import heapq
+import itertools
+import logging
+import time
+from typing import *
+
+from metrics import lock_wait
+from .sheets import AsyncWorksheet
+from .store import LeaderboardStore
+
+
+class RegistryConflict(Exception):
+    """
+    The Registry worksheet no longer matches the in-memory index
+    (e.g., an officer edited or sorted the sheet by hand).
+    """
+
+
+# column A of a row whose registration was removed; the Utilities cog's
+# compaction loop deletes these rows in bulk. (Discord usernames can't
+# contain parentheses or spaces.)
+TOMBSTONE = "(unregistered)"
+
+
+class RegistryLock:
+    """
+    Concurrency control for the registries and their indexes.
+
+    Registrations and unregistrations take `keys()`, one lock per Discord
+    name and per requested name, so the ones that don't touch the same
+    member or name run in parallel. Loading (and compacting) the indexes
+    takes `exclusive()`, which waits for every `keys()` holder to finish and
+    goes ahead of those still waiting, so a stream of registrations can't
+    starve it.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._key_locks: Dict[Hashable, asyncio.Lock] = {}
+        self._key_users: Dict[Hashable, int] = {}
+        self._shared = 0  # `keys()` holders
+        self._exclusive = False
+        self._exclusive_waiting = 0
+        self._waiters: list[asyncio.Future] = []
+
+    def _wake_up(self) -> None:
+        # synchronous, so it's safe in `finally` blocks of cancelled tasks
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def _wait_until(self, predicate: Callable[[], bool]) -> None:
+        while not predicate():
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                self._waiters.remove(waiter)
+
+    @contextlib.asynccontextmanager
+    async def exclusive(self) -> AsyncIterator[None]:
+        start = time.perf_counter()
+        self._exclusive_waiting += 1
+        try:
+            await self._wait_until(lambda: not self._exclusive and self._shared == 0)
+        finally:
+            self._exclusive_waiting -= 1
+            self._wake_up()  # `keys()` callers may have been waiting on us
+        self._exclusive = True
+        lock_wait.observe(time.perf_counter() - start, lock=self.name)
+        try:
+            yield
+        finally:
+            self._exclusive = False
+            self._wake_up()
+
+    @contextlib.asynccontextmanager
+    async def keys(self, *keys: Hashable) -> AsyncIterator[None]:
+        start = time.perf_counter()
+        await self._wait_until(lambda: not self._exclusive and self._exclusive_waiting == 0)
+        self._shared += 1
+        # in a fixed order, so two holders never wait on each other's keys
+        keys = sorted(set(keys))
+        for key in keys:
+            self._key_users[key] = self._key_users.get(key, 0) + 1
+        acquired = []
+        try:
+            for key in keys:
+                lock = self._key_locks.setdefault(key, asyncio.Lock())
+                await lock.acquire()
+                acquired.append(lock)
+            lock_wait.observe(time.perf_counter() - start, lock=self.name)
+            yield
+        finally:
+            for lock in acquired:
+                lock.release()
+            for key in keys:
+                self._key_users[key] -= 1
+                if not self._key_users[key]:
+                    del self._key_users[key]
+                    del self._key_locks[key]
+            self._shared -= 1
+            self._wake_up()
+
+
+class RegistryEntry:
+    def __init__(self, row: int, discord_name: str, name: str, paid_membership: str):
+        # columns of the "Registry" worksheet, plus the (1-indexed) row they live on
+        self.row = row
+        self.discord_name = discord_name
+        self.name = name
+        self.paid_membership = paid_membership
+
+    def values(self) -> list[str]:
+        return [self.discord_name, self.name, self.paid_membership]
+
+    def __repr__(self) -> str:
+        return f"RegistryEntry(row={self.row}, discord_name={self.discord_name!r}, name={self.name!r}, paid_membership={self.paid_membership!r})"
+
+
+class RegistryIndex:
+    """
+    In-memory mirror of one leaderboard's "Registry" worksheet, keyed by
+    Discord name and by real name, so lookups never need a network call.
+
+    Every row is indexed (including any header row), matching what
+    `Worksheet.find()` used to search. Registrations are rewritten in place
+    and removals leave a tombstone row, so row numbers only change when
+    tombstones are compacted (followed by a reload). Rows are re-checked
+    right before they are rewritten, and a mismatch raises `RegistryConflict`
+    so the caller can `load()` again. Must only be mutated within
+    `registry_lock`: loaded within `exclusive()`, and a member's entries
+    changed within `keys()` for that member and name.
+    """
+    def __init__(self, worksheet: AsyncWorksheet):
+        self.worksheet = worksheet
+        self._by_discord_name: Dict[str, RegistryEntry] = {}
+        self._by_name: Dict[str, RegistryEntry] = {}
+        self._row_count = 0  # number of rows currently in use on the sheet
+        self._reserved_rows: Set[int] = set()  # new rows planned but not yet applied
+        self._free_rows: list[int] = []  # heap of released rows below `_row_count`, reused first
+        self.tombstone_rows: list[int] = []
+
+    async def load(self) -> None:
+        self.load_values(await self.worksheet.get_all_values())
+
+    def load_values(self, values: list[list[str]]) -> None:
+        """
+        Index the full content of the worksheet, as fetched by the caller.
+        """
+        by_discord_name = {}
+        by_name = {}
+        tombstone_rows = []
+        for i, row in enumerate(values):
+            row = row + [""] * (3 - len(row))
+            if row[0] == TOMBSTONE:
+                tombstone_rows.append(i + 1)
+                continue
+            entry = RegistryEntry(i + 1, row[0], row[1], row[2] or "no")
+            if entry.discord_name:
+                by_discord_name.setdefault(entry.discord_name, entry)
+            if entry.name:
+                by_name.setdefault(entry.name, entry)
+        self._by_discord_name = by_discord_name
+        self._by_name = by_name
+        self._row_count = len(values)
+        self._reserved_rows = set()
+        self._free_rows = []
+        self.tombstone_rows = tombstone_rows
+        logging.info(f"Loaded {len(by_discord_name)} registrations from {self.worksheet.title}.")
+
+    def __len__(self) -> int:
+        return len(self._by_discord_name)
+
+    def entries(self) -> list[Tuple[str, str, str]]:
+        return [(e.discord_name, e.name, e.paid_membership) for e in self._by_discord_name.values()]
+
+    def to_values(self) -> list[list[str]]:
+        """
+        Rows that `load_values()` indexes exactly like the current content, for
+        snapshots. Rows no lookup can reach (e.g., duplicates) are left empty.
+        """
+        values: list[list[str]] = [[] for _ in range(self._row_count)]
+        for entry in itertools.chain(self._by_discord_name.values(), self._by_name.values()):
+            values[entry.row - 1] = entry.values()
+        for row in self.tombstone_rows:
+            values[row - 1] = [TOMBSTONE, "", ""]
+        return values
+
+    def tail_range(self) -> str:
+        """
+        The last row in use and the one after it, in A1 notation; see `matches_tail()`.
+        """
+        return f"'{self.worksheet.title}'!A{max(self._row_count, 1)}:C{self._row_count + 1}"
+
+    def matches_tail(self, values: list[list[str]]) -> bool:
+        """
+        Whether `tail_range()`, as read from the sheet, still ends where the
+        index does: same last row, and nothing after it.
+        """
+        def trim(rows: list[list[str]]) -> list[list[str]]:
+            # the paid membership column is edited by hand (and read as "no" when empty)
+            rows = [(row + ["", ""])[:2] for row in rows]
+            while rows and not any(rows[-1]):
+                rows.pop()
+            return rows
+        return trim(values) == trim(self.to_values()[-1:])
+
+    def get(self, discord_name: str) -> RegistryEntry | None:
+        return self._by_discord_name.get(discord_name)
+
+    def get_by_name(self, name: str) -> RegistryEntry | None:
+        return self._by_name.get(name)
+
+    async def verify(self, entry: RegistryEntry) -> None:
+        """
+        Re-read the entry's row and make sure it still holds what we think it does.
+        Refreshes the paid membership status, which officers edit by hand.
+        """
+        row = await self.worksheet.row_values(entry.row)
+        row = row + [""] * (3 - len(row))
+        if row[0] != entry.discord_name or row[1] != entry.name:
+            raise RegistryConflict(f"{self.worksheet.title} row {entry.row} is {row[:2]}, expected {[entry.discord_name, entry.name]}")
+        entry.paid_membership = row[2] or "no"
+
+    def plan_upsert(self, discord_name: str, name: str, paid_membership: str | None = None) -> RegistryEntry:
+        """
+        The registration of `discord_name` as it will be written: over its
+        existing row (call `verify()` on that entry first), or on a new row at
+        the end. Keeps the paid membership status unless `paid_membership` is
+        given. Write it with `RegistryWriter.write()`, then `apply()` it, or
+        `release()` its row if nothing was written.
+        """
+        old_entry = self.get(discord_name)
+        if paid_membership is None:
+            paid_membership = old_entry.paid_membership if old_entry is not None else "no"
+        if old_entry is not None:
+            row = old_entry.row
+        else:
+            # reserve the row now, so concurrent registrations get different ones
+            if self._free_rows:
+                row = heapq.heappop(self._free_rows)
+            else:
+                self._row_count += 1
+                row = self._row_count
+            self._reserved_rows.add(row)
+        return RegistryEntry(row, discord_name, name, paid_membership)
+
+    def release(self, row: int) -> None:
+        """
+        Give back a new row reserved by `plan_upsert()` that was never written
+        (or was rolled back). Rows that weren't reserved are left alone.
+        """
+        if row not in self._reserved_rows:
+            return
+        self._reserved_rows.remove(row)
+        free_rows = set(self._free_rows) | {row}
+        # free rows at the end are simply no longer in use
+        while self._row_count in free_rows:
+            free_rows.remove(self._row_count)
+            self._row_count -= 1
+        self._free_rows = sorted(free_rows)  # a sorted list is a valid heap
+
+    def apply(self, entry: RegistryEntry) -> None:
+        old_entry = self.get(entry.discord_name)
+        if old_entry is not None and self._by_name.get(old_entry.name) is old_entry:
+            del self._by_name[old_entry.name]
+        self._by_discord_name[entry.discord_name] = entry
+        self._by_name[entry.name] = entry
+        self._reserved_rows.discard(entry.row)
+        self._row_count = max(self._row_count, entry.row)
+
+    def apply_removal(self, entry: RegistryEntry) -> None:
+        """
+        Forget a registration whose row was overwritten with a tombstone.
+        """
+        del self._by_discord_name[entry.discord_name]
+        if self._by_name.get(entry.name) is entry:
+            del self._by_name[entry.name]
+        self.tombstone_rows.append(entry.row)
+
+
+# directions of a registry write in the outbox
+FINISH = "finish"
+ROLL_BACK = "roll back"
+
+
+class RegistryWriteFailed(Exception):
+    """
+    A registry write didn't reach every registry. If `rolled_back`, none of
+    them changed; otherwise the write was left for `RegistryWriter.resume()`.
+    """
+    def __init__(self, message: str, rolled_back: bool):
+        super().__init__(message)
+        self.rolled_back = rolled_back
+
+
+def _same_registration(row: list[str], values: list[str]) -> bool:
+    # the paid membership column is edited by hand, so only compare the first two
+    row = row + [""] * (3 - len(row))
+    return row[:2] == values[:2]
+
+
+class RegistryWriter:
+    """
+    Writes registry rows to both leaderboards at once, as a small saga.
+
+    The writes, and the values they overwrite, are recorded in the store's
+    outbox first; then every spreadsheet is written concurrently (one
+    `values_batch_update` each). If only some of them succeed, the failed ones
+    are retried once and, failing that, every spreadsheet is rolled back to
+    the previous values. A write still in the outbox (e.g., after a crash, or
+    a failed rollback) is finished or rolled back by `resume()`.
+    """
+    def __init__(self, store: LeaderboardStore, worksheets: list[AsyncWorksheet]):
+        self.store = store
+        self._worksheets = {(ws.url, ws.title): ws for ws in worksheets}
+
+    async def _send(self, url: str, records: list[dict], column: str) -> None:
+        records = [r for r in records if r["url"] == url]
+        # new registrations may need more rows than the worksheet has
+        last_row: Dict[str, int] = {}
+        for record in records:
+            last_row[record["title"]] = max(last_row.get(record["title"], 0), record["row"])
+        await asyncio.gather(*(self._worksheets[(url, title)].ensure_row_count(row) for title, row in last_row.items()))
+        connection = next(iter(self._worksheets.values())).connection
+        await connection.values_batch_update(url, [
+            {"range": f"'{r['title']}'!A{r['row']}:C{r['row']}", "values": [r[column]]} for r in records])
+
+    async def _send_all(self, urls: list[str], records: list[dict], column: str) -> Dict[str, BaseException]:
+        # returns the error of each spreadsheet that failed
+        results = await asyncio.gather(*(self._send(url, records, column) for url in urls), return_exceptions=True)
+        return {url: result for url, result in zip(urls, results) if isinstance(result, BaseException)}
+
+    async def write(self, writes: list[Tuple[RegistryIndex, int, list[str], list[str]]]) -> None:
+        """
+        Overwrite whole registry rows, given as `(index, row, values, previous values)`.
+        Raises `RegistryWriteFailed` unless every registry was written.
+        """
+        records = [{"url": index.worksheet.url, "title": index.worksheet.title, "row": row, "values": values, "previous": previous}
+                   for index, row, values, previous in writes]
+        urls = list(dict.fromkeys(r["url"] for r in records))
+        write_id = await self.store.add_registry_write(FINISH, records)
+
+        failed = await self._send_all(urls, records, "values")
+        if failed:
+            logging.warning(f"Registry write failed on {len(failed)} of {len(urls)} spreadsheet(s), retrying: {list(failed.values())!r}")
+            failed = await self._send_all(list(failed), records, "values")
+        if not failed:
+            await self.store.delete_registry_write(write_id)
+            return
+
+        # undo it everywhere (a failed request may have been applied anyway)
+        error = next(iter(failed.values()))
+        await self.store.set_registry_write_direction(write_id, ROLL_BACK)
+        rollback_failed = await self._send_all(urls, records, "previous")
+        if rollback_failed:
+            raise RegistryWriteFailed(
+                f"{error!r}; rolling back failed too: {next(iter(rollback_failed.values()))!r}", rolled_back=False)
+        await self.store.delete_registry_write(write_id)
+        raise RegistryWriteFailed(f"{error!r} (rolled back)", rolled_back=True)
+
+    async def resume(self) -> int:
+        """
+        Finish, or roll back, the writes left in the outbox. A row is only
+        rewritten if it holds the values on the other side of the write, so
+        rows edited by hand since are left alone. Returns how many writes were resumed.
+        """
+        pending = await self.store.pending_registry_writes()
+        for write_id, direction, records in pending:
+            target, other = ("values", "previous") if direction == FINISH else ("previous", "values")
+            urls = list(dict.fromkeys(r["url"] for r in records))
+            connection = next(iter(self._worksheets.values())).connection
+            fetched = await asyncio.gather(*(connection.values_batch_get(
+                url, [f"'{r['title']}'!A{r['row']}:C{r['row']}" for r in records if r["url"] == url]) for url in urls))
+            rows = {url: iter(values) for url, values in zip(urls, fetched)}
+            stale = []
+            for record in records:
+                row = next(iter(next(rows[record["url"]])), [])
+                if _same_registration(row, record[other]):
+                    stale.append(record)
+                elif not _same_registration(row, record[target]):
+                    logging.warning(f"Not resuming the registry write to {record['title']} row {record['row']} "
+                                    f"of {record['url']}: it now holds {row[:2]}.")
+            stale_urls = list(dict.fromkeys(r["url"] for r in stale))
+            failed = await self._send_all(stale_urls, stale, target)
+            if failed:
+                raise next(iter(failed.values()))
+            await self.store.delete_registry_write(write_id)
+            logging.info(f"Resumed an unfinished registry write ({direction}): rewrote {len(stale)} of {len(records)} row(s).")
+        return len(pending)
+
+
+def merge_paid_membership(club: str, friendly: str) -> str:
+    """
+    Officers may record a payment on either leaderboard, so anything but "no"
+    wins; if both record different payments, the Club Leaderboard's wins.
+    """
+    if club and club != "no":
+        return club
+    return friendly or "no"
+
+
+class RegistryConsistency:
+    """
+    Outcome of the last reconciliation of the Club and Friendly registries.
+    While `consistent`, a registration on one leaderboard implies the same
+    registration on the other, so commands only need to check one of them.
+    """
+    def __init__(self):
+        self.consistent = False
+        self.checked_at: datetime.datetime | None = None
+        self.fixed = 0  # cells/rows rewritten by the last reconciliation
+        self.conflicts: list[str] = []  # drift that needs a human to resolve
+
+    def record(self, fixed: int, conflicts: list[str]) -> None:
+        self.consistent = not conflicts
+        self.checked_at = datetime.datetime.now(datetime.timezone.utc)
+        self.fixed = fixed
+        self.conflicts = conflicts
+
+    def invalidate(self) -> None:
+        # e.g., a write reached only one of the registries
+        self.consistent = False
+
+
+def _parse_registry(values: list[list[str]], title: str, conflicts: list[str]) -> Dict[str, Tuple[int, str, str]]:
+    # discord name -> (row, name, paid membership); the first row is the header
+    entries = {}
+    for i, row in enumerate(values[1:], 2):
+        row = row + [""] * (3 - len(row))
+        if not row[0] or row[0] == TOMBSTONE:
+            continue
+        if row[0] in entries:
+            conflicts.append(f"{row[0]} is registered twice on the {title} (rows {entries[row[0]][0]} and {i}).")
+            continue
+        entries[row[0]] = (i, row[1], row[2] or "no")
+    return entries
+
+
+def reconcile_registries(
+    club_values: list[list[str]],
+    friendly_values: list[list[str]]
+) -> Tuple[list[dict], list[dict], list[str]]:
+    """
+    Diff the Club and Friendly "Registry" worksheets (full content, header row
+    first) and work out the writes that make them agree:
+    - a registration missing from one leaderboard is copied from the other;
+    - a differing name is set to the Club Leaderboard's;
+    - a differing paid membership status is merged with `merge_paid_membership()`.
+
+    Returns `(club_writes, friendly_writes, conflicts)`. Writes are
+    `{"range": ..., "values": ...}` dicts in A1 notation (without the worksheet
+    title) and are also applied to `club_values`/`friendly_values` in place.
+    `conflicts` lists the drift that can't be fixed automatically, e.g., a
+    name that is taken by someone else on the other leaderboard.
+    """
+    conflicts: list[str] = []
+    values = {"Club Leaderboard": club_values, "Friendly Leaderboard": friendly_values}
+    writes: Dict[str, list[dict]] = {"Club Leaderboard": [], "Friendly Leaderboard": []}
+    entries = {title: _parse_registry(v, title, conflicts) for title, v in values.items()}
+    # name -> discord name
+    names = {title: {name: discord_name for discord_name, (_, name, _) in e.items() if name} for title, e in entries.items()}
+
+    def write(title: str, row: int, column: str, cells: list[str]) -> None:
+        sheet = values[title]
+        while len(sheet) < row:
+            sheet.append([])
+        first = ord(column) - ord("A")
+        sheet[row - 1] = sheet[row - 1] + [""] * (first + len(cells) - len(sheet[row - 1]))
+        sheet[row - 1][first:first + len(cells)] = cells
+        last_column = chr(ord(column) + len(cells) - 1)
+        cell_range = f"{column}{row}" if len(cells) == 1 else f"{column}{row}:{last_column}{row}"
+        writes[title].append({"range": cell_range, "values": [cells]})
+
+    def name_taken(title: str, name: str, discord_name: str) -> bool:
+        owner = names[title].get(name)
+        if owner is not None and owner != discord_name:
+            conflicts.append(f"{discord_name} is registered as \"{name}\", but that name belongs to {owner} on the {title}.")
+            return True
+        return False
+
+    club, friendly = entries["Club Leaderboard"], entries["Friendly Leaderboard"]
+    for discord_name in sorted(club.keys() & friendly.keys(), key=lambda d: club[d][0]):
+        club_row, club_name, club_paid = club[discord_name]
+        friendly_row, friendly_name, friendly_paid = friendly[discord_name]
+        if club_name != friendly_name and not name_taken("Friendly Leaderboard", club_name, discord_name):
+            write("Friendly Leaderboard", friendly_row, "B", [club_name])
+            names["Friendly Leaderboard"].pop(friendly_name, None)
+            names["Friendly Leaderboard"][club_name] = discord_name
+        paid = merge_paid_membership(club_paid, friendly_paid)
+        if club_paid != paid:
+            write("Club Leaderboard", club_row, "C", [paid])
+        if friendly_paid != paid:
+            write("Friendly Leaderboard", friendly_row, "C", [paid])
+
+    for source, target in (("Club Leaderboard", "Friendly Leaderboard"), ("Friendly Leaderboard", "Club Leaderboard")):
+        missing = entries[source].keys() - entries[target].keys()
+        for discord_name in sorted(missing, key=lambda d: entries[source][d][0]):
+            _, name, paid = entries[source][discord_name]
+            if name_taken(target, name, discord_name):
+                continue
+            # registries always keep their header row
+            write(target, max(len(values[target]), 1) + 1, "A", [discord_name, name, paid])
+            names[target][name] = discord_name
+
+    return writes["Club Leaderboard"], writes["Friendly Leaderboard"], conflicts
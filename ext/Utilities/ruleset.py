@@ -0,0 +1,178 @@
+import datetime
+import json
+import logging
+import numpy as np
+import os
+from typing import *
+
+from .store import SheetGame
+
+SEAT_PRIORITY = {"East": 4, "South": 3, "West": 2, "North": 1}  # for the "seat" tiebreaker
+PLAYER_COUNT = {"Yonma": 4, "Sanma": 3}
+
+
+class Ruleset:
+    """
+    Everything that determines a game's placements and final scores.
+    `uma[game_mode][game_length]` lists the uma by placement (1st first).
+    """
+    def __init__(
+        self,
+        tiebreaker_method: str,
+        chombo_penalty: int,
+        starting_points: Dict[str, int],
+        uma: Dict[str, Dict[str, list[int]]]
+    ):
+        self.tiebreaker_method = tiebreaker_method
+        self.chombo_penalty = chombo_penalty
+        self.starting_points = starting_points
+        self.uma = uma
+
+    def to_dict(self) -> dict:
+        return {
+            "tiebreaker_method": self.tiebreaker_method,
+            "chombo_penalty": self.chombo_penalty,
+            "starting_points": self.starting_points,
+            "uma": self.uma,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Ruleset":
+        return cls(d["tiebreaker_method"], d["chombo_penalty"], d["starting_points"], d["uma"])
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Ruleset) and self.to_dict() == other.to_dict()
+
+
+class RulesetHistory:
+    """
+    Every ruleset the bot has scored games under, persisted as JSON. Versions
+    start at 1 and never change; games record the version they were scored under.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._versions: Dict[int, Ruleset] = {}
+
+    def register(self, ruleset: Ruleset) -> int:
+        """
+        Load the history and return the version of `ruleset`, adding it as a
+        new version if it hasn't been seen before. Blocking; call at startup.
+        """
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = []
+        self._versions = {e["version"]: Ruleset.from_dict(e["ruleset"]) for e in entries}
+
+        for version, known in self._versions.items():
+            if known == ruleset:
+                return version
+
+        version = max(self._versions, default=0) + 1
+        self._versions[version] = ruleset
+        entries.append({
+            "version": version,
+            "since": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "ruleset": ruleset.to_dict(),
+        })
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+        logging.info(f"Registered a new ruleset as version {version}.")
+        return version
+
+    def get(self, version: int | None) -> Ruleset | None:
+        return self._versions.get(version)
+
+    def oldest(self) -> Ruleset:
+        return self._versions[min(self._versions)]
+
+
+def score_games(
+    ruleset: Ruleset,
+    game_mode: str,
+    game_length: str,
+    raw_scores: np.ndarray,
+    seat_priorities: np.ndarray,
+    chombo_counts: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized `calculate_placement_and_final_score()` for many games of the
+    same game type at once. Inputs are (games x players) arrays; returns
+    (placements, umas, penalties, final_scores) of the same shape.
+
+    Tied players share the best placement of their group and split the uma of
+    the placements the group occupies, exactly like the per-game version.
+    """
+    if ruleset.tiebreaker_method == "split":
+        keys = raw_scores.astype(np.int64)
+    elif ruleset.tiebreaker_method == "seat":
+        # raw scores are multiples of 100, so the seat can't change the score order
+        keys = raw_scores.astype(np.int64) * 10 + seat_priorities
+    else:
+        raise ValueError(f"Unknown tiebreaker: {ruleset.tiebreaker_method}")
+
+    # for each player: how many players in the same game beat them, and how many they tie with (incl. themselves)
+    beaten_by = (keys[:, None, :] > keys[:, :, None]).sum(axis=2)
+    group_size = (keys[:, None, :] == keys[:, :, None]).sum(axis=2)
+    placements = beaten_by + 1
+
+    # the group occupies placements [placement, placement + group_size); average their uma
+    cumulative_uma = np.concatenate([[0], np.cumsum(ruleset.uma[game_mode][game_length])])
+    umas = (cumulative_uma[beaten_by + group_size] - cumulative_uma[beaten_by]) / group_size
+
+    penalties = chombo_counts * ruleset.chombo_penalty
+    final_scores = (raw_scores - ruleset.starting_points[game_mode]) / 1000 + umas + penalties
+    return placements, umas, penalties, final_scores
+
+
+def rescore_games(
+    games: list[SheetGame],
+    ruleset: Ruleset,
+    ruleset_version: int,
+    history: RulesetHistory
+) -> list[Tuple[SheetGame, list[list]]]:
+    """
+    Rescore every game (as grouped by `pair_sheet_rows()`) under `ruleset`.
+    Returns `(game, new_score_rows)` for the games whose placements, uma,
+    penalties, final scores or ruleset version change.
+
+    Chombo counts are recovered from each game's penalty and the chombo
+    penalty of the ruleset it was scored under (the oldest known ruleset
+    for untagged games).
+    """
+    groups: Dict[Tuple[str, int], list[SheetGame]] = {}
+    for game in games:
+        groups.setdefault((game.game_row[1], len(game.score_rows)), []).append(game)
+
+    changed = []
+    for (game_type, player_count), group in groups.items():
+        game_mode, _, game_length = game_type.partition(" ")
+        if PLAYER_COUNT.get(game_mode) != player_count or game_length not in ruleset.uma.get(game_mode, {}):
+            logging.warning(f"Not rescoring {len(group)} {game_type} game(s) with {player_count} player(s).")
+            continue
+
+        rows = [g.score_rows for g in group]
+        raw_scores = np.array([[r[4] for r in g] for g in rows], dtype=float)
+        seat_priorities = np.array([[SEAT_PRIORITY.get(r[2], 0) for r in g] for g in rows])
+        old_penalties = np.nan_to_num(np.array([[r[7] for r in g] for g in rows], dtype=float))
+        old_chombo_penalties = np.array([
+            (history.get(g.score_rows[0][9]) or history.oldest()).chombo_penalty for g in group], dtype=float)[:, None]
+        chombo_counts = np.round(np.divide(
+            old_penalties, old_chombo_penalties, out=np.zeros_like(old_penalties), where=old_chombo_penalties != 0))
+
+        placements, umas, penalties, final_scores = score_games(
+            ruleset, game_mode, game_length, raw_scores, seat_priorities, chombo_counts)
+
+        old = np.array([[r[5:9] for r in g] for g in rows], dtype=float)
+        new = np.stack([placements, umas, penalties, final_scores], axis=2)
+        versions = np.array([[r[9] for r in g] for g in rows], dtype=float)
+        unchanged = np.isclose(old, new).all(axis=(1, 2)) & (versions == ruleset_version).all(axis=1)
+
+        for i in np.flatnonzero(~unchanged):
+            changed.append((group[i], [
+                [*row[:5], int(placements[i, j]), float(umas[i, j]), float(penalties[i, j]), float(final_scores[i, j]), ruleset_version]
+                for j, row in enumerate(rows[i])]))
+    return changed
@@ -0,0 +1,393 @@
+import asyncio
+import contextvars
+import functools
+import gspread
+import heapq
+import itertools
+import logging
+import random
+import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import *
+
+import metrics
+import tracing
+
+# gspread is a blocking (requests-based) client, so every call is a full
+# Google round trip. All worksheet calls go through this small, bounded pool
+# so the event loop (heartbeats, other commands, EventPoster) never waits on them.
+SHEETS_MAX_WORKERS = 4
+
+# Google allows 60 requests per minute per user (i.e., our service account).
+# The token bucket refills at (quota - burst) per minute, so even a full burst
+# followed by a minute of steady traffic stays within the quota.
+SHEETS_QUOTA_PER_MINUTE = 60
+SHEETS_BURST = 10
+
+# retries of rate-limited (429), failed (5xx) and dropped requests
+SHEETS_MAX_ATTEMPTS = 6
+SHEETS_BACKOFF_BASE = 1.0   # seconds
+SHEETS_BACKOFF_MAX = 64.0   # seconds
+
+# request priorities (lower goes first)
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# the priority of the Sheets calls made by the current task (and the tasks it
+# creates). Slash commands set it to `INTERACTIVE`; loops keep the default.
+sheets_priority: contextvars.ContextVar[int] = contextvars.ContextVar("sheets_priority", default=BACKGROUND)
+
+
+class CallCounter:
+    def __init__(self):
+        self.count = 0
+
+# counts the Sheets requests (retries included) made on behalf of the current
+# command, for its log line. Only set by commands that report it.
+sheets_call_counter: contextvars.ContextVar[CallCounter | None] = contextvars.ContextVar("sheets_call_counter", default=None)
+
+
+sheets_requests = metrics.counter(
+    "bot_sheets_requests_total", "Google Sheets requests, by worksheet, method and outcome (ok, retried, failed).",
+    ("worksheet", "method", "outcome"))
+sheets_request_latency = metrics.histogram(
+    "bot_sheets_request_seconds", "Duration of Google Sheets requests (excluding queueing).", ("worksheet", "method"))
+sheets_queue_wait = metrics.histogram(
+    "bot_sheets_queue_wait_seconds", "Time Google Sheets requests waited for a quota token.", ("priority",))
+
+
+def _describe(func: Callable) -> Tuple[str, str]:
+    """
+    (worksheet or spreadsheet title, method name) of a gspread call, for metrics.
+    """
+    if isinstance(func, functools.partial):
+        func = func.func
+    owner = getattr(func, "__self__", None)
+    title = getattr(owner, "title", "") if isinstance(owner, (gspread.Worksheet, gspread.Spreadsheet)) else ""
+    return title, getattr(func, "__name__", "")
+
+
+def _retry_after(e: Exception) -> float | None:
+    """
+    `None` if `e` is not worth retrying; otherwise the delay the server asked
+    for (0 if it didn't).
+    """
+    if isinstance(e, gspread.exceptions.APIError):
+        status = e.response.status_code
+        if status == 429 or status >= 500:
+            try:
+                return float(e.response.headers.get("Retry-After", 0))
+            except ValueError:
+                return 0.0
+        return None
+    if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return 0.0
+    return None
+
+
+def may_have_been_applied(e: Exception) -> bool:
+    """
+    Whether a failed non-idempotent call may have been applied anyway: after a
+    5xx or a dropped connection, unlike a 4xx (which Google rejects outright).
+    """
+    if isinstance(e, gspread.exceptions.APIError):
+        return e.response.status_code >= 500
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class SheetsScheduler:
+    """
+    Runs every Google Sheets request: waits for a token from a bucket sized to
+    the per-minute quota (interactive requests first, then background ones,
+    each in arrival order), runs the call on the Sheets pool, and retries
+    rate-limited or failed calls with exponential backoff and full jitter.
+
+    Non-idempotent calls (appends, deletes) are only retried when Google
+    rejected them outright (429), never after a 5xx or a dropped connection,
+    since they may have been applied.
+    """
+    def __init__(self, quota_per_minute: int, burst: int):
+        self.rate = (quota_per_minute - burst) / 60  # tokens per second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._waiters: list[Tuple[int, int, asyncio.Future]] = []  # heap of (priority, arrival, future)
+        self._arrivals = itertools.count()
+        self._wake_up: asyncio.Event | None = None
+        self._dispatcher: asyncio.Task | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+        # counters; see `stats()`
+        self.requests = 0
+        self.throttled = 0         # requests that had to wait for a token
+        self.rate_limited = 0      # 429 responses
+        self.server_errors = 0     # 5xx responses and dropped connections
+        self.retries = 0
+        self.failures = 0          # requests that failed for good
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def queue_depth(self) -> Dict[str, int]:
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                depth[PRIORITY_NAMES[priority]] += 1
+        return depth
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth(),
+            "tokens": round(self._tokens, 2),
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "rate_limited": self.rate_limited,
+            "server_errors": self.server_errors,
+            "retries": self.retries,
+            "failures": self.failures,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "wait_seconds_max": round(self.wait_seconds_max, 3),
+        }
+
+    # ===================================================
+    # TOKEN BUCKET
+    # ===================================================
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    async def _acquire(self, priority: int) -> float:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wake_up = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._arrivals), future))
+        self._wake_up.set()
+        # if we are cancelled while waiting, the dispatcher skips the done future
+        await future
+        waited = time.monotonic() - start
+        sheets_queue_wait.observe(waited, priority=PRIORITY_NAMES[priority])
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return waited
+
+    async def _dispatch(self) -> None:
+        while True:
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                self._wake_up.clear()
+                await self._wake_up.wait()
+                continue
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                _, _, future = heapq.heappop(self._waiters)
+                future.set_result(None)
+            else:
+                self.throttled += 1
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    # ===================================================
+    # REQUESTS
+    # ===================================================
+    async def run(self, func: Callable[[], Any], idempotent: bool = True) -> Any:
+        priority = sheets_priority.get()
+        worksheet, method = _describe(func)
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=SHEETS_MAX_WORKERS, thread_name_prefix="sheets")
+        for attempt in range(1, SHEETS_MAX_ATTEMPTS + 1):
+            queued = await self._acquire(priority)
+            self.requests += 1
+            counter = sheets_call_counter.get()
+            if counter is not None:
+                counter.count += 1
+            start = time.perf_counter()
+            outcome = "cancelled"  # unless the call completes
+            try:
+                result = await loop.run_in_executor(self._executor, func)
+                outcome = "ok"
+                sheets_requests.inc(worksheet=worksheet, method=method, outcome=outcome)
+                return result
+            except Exception as e:
+                error = e
+                retry_after = _retry_after(e)
+                rate_limited = isinstance(e, gspread.exceptions.APIError) and e.response.status_code == 429
+                if rate_limited:
+                    self.rate_limited += 1
+                elif retry_after is not None:
+                    self.server_errors += 1
+                if retry_after is None or attempt == SHEETS_MAX_ATTEMPTS or not (idempotent or rate_limited):
+                    self.failures += 1
+                    outcome = "failed"
+                    sheets_requests.inc(worksheet=worksheet, method=method, outcome=outcome)
+                    raise
+                outcome = "rate limited" if rate_limited else "retried"
+                sheets_requests.inc(worksheet=worksheet, method=method, outcome="retried")
+            finally:
+                duration = time.perf_counter() - start
+                sheets_request_latency.observe(duration, worksheet=worksheet, method=method)
+                tracing.recorder.record_sheets_request(worksheet, method, PRIORITY_NAMES[priority], queued, duration, outcome)
+            self.retries += 1
+            delay = max(retry_after, random.uniform(0, min(SHEETS_BACKOFF_MAX, SHEETS_BACKOFF_BASE * 2 ** (attempt - 1))))
+            logging.warning(f"Google Sheets request failed ({error!r}); retrying in {delay:.1f}s (attempt {attempt}/{SHEETS_MAX_ATTEMPTS}).")
+            await asyncio.sleep(delay)
+
+    def shutdown(self) -> None:
+        """
+        Called on cog unload so `rc/reload` doesn't leak worker threads or the
+        dispatcher. Calls already running are allowed to finish in the background.
+        """
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# `config.py` and this module are not re-imported by `rc/reload`, so this one
+# scheduler (and its counters) outlives reloads of the cog
+scheduler = SheetsScheduler(SHEETS_QUOTA_PER_MINUTE, SHEETS_BURST)
+
+metrics.gauge(
+    "bot_sheets_queue_depth", "Google Sheets requests waiting for a quota token.", ("priority",),
+    callback=lambda: {(priority,): depth for priority, depth in scheduler.queue_depth().items()})
+metrics.gauge(
+    "bot_sheets_throttled", "Times the Sheets scheduler had to wait for a quota token (since startup).",
+    callback=lambda: scheduler.throttled)
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run an idempotent blocking gspread call through the scheduler and await its result.
+    """
+    return await scheduler.run(functools.partial(func, *args, **kwargs))
+
+async def run_blocking_non_idempotent(func: Callable, *args, **kwargs) -> Any:
+    """
+    Like `run_blocking()`, for calls that must not be repeated once Google may
+    have applied them (appends, deletes).
+    """
+    return await scheduler.run(functools.partial(func, *args, **kwargs), idempotent=False)
+
+
+class SheetsConnection:
+    """
+    Authorizes with Google and opens spreadsheets/worksheets lazily, on first
+    use. Each step runs at most once (concurrent callers share it) and its
+    result is cached for the life of the process; a failed step is retried
+    on the next use.
+
+    `config.py` is not re-imported by `rc/reload`, so the connection made by
+    the first load is reused by every later load of the cog.
+    """
+    def __init__(self, service_account_file: str):
+        self.service_account_file = service_account_file
+        self._steps: Dict[Hashable, asyncio.Future] = {}
+
+    async def _once(self, key: Hashable, coro_func: Callable[[], Awaitable]) -> Any:
+        step = self._steps.get(key)
+        if step is None or (step.done() and step.exception() is not None):
+            step = self._steps[key] = asyncio.ensure_future(coro_func())
+        return await asyncio.shield(step)
+
+    async def _timed(self, description: str, func: Callable, *args) -> Any:
+        start = time.perf_counter()
+        result = await run_blocking(func, *args)
+        logging.info(f"Startup timing: {description} took {time.perf_counter() - start:.2f}s.")
+        return result
+
+    async def client(self) -> gspread.Client:
+        return await self._once("client", lambda: self._timed(
+            "Google Sheets auth", gspread.service_account, self.service_account_file))
+
+    async def spreadsheet(self, url: str) -> gspread.Spreadsheet:
+        async def open_spreadsheet():
+            client = await self.client()
+            return await self._timed(f"opening spreadsheet {url}", client.open_by_url, url)
+        return await self._once(("spreadsheet", url), open_spreadsheet)
+
+    async def worksheet(self, url: str, title: str) -> gspread.Worksheet:
+        async def open_worksheet():
+            spreadsheet = await self.spreadsheet(url)
+            return await run_blocking(spreadsheet.worksheet, title)
+        return await self._once(("worksheet", url, title), open_worksheet)
+
+    async def values_batch_get(self, url: str, ranges: list[str]) -> list[list[list[str]]]:
+        """
+        Read many ranges (in A1 notation, worksheet title included) of one
+        spreadsheet in a single request. Trailing empty rows and cells are omitted.
+        """
+        spreadsheet = await self.spreadsheet(url)
+        response = await run_blocking(spreadsheet.values_batch_get, ranges)
+        return [value_range.get("values", []) for value_range in response["valueRanges"]]
+
+    async def values_batch_update(self, url: str, data: list[dict]) -> None:
+        """
+        Write many ranges (in A1 notation, worksheet title included) of one
+        spreadsheet in a single request.
+        """
+        spreadsheet = await self.spreadsheet(url)
+        await run_blocking(spreadsheet.values_batch_update, {"valueInputOption": "RAW", "data": data})
+
+
+class AsyncWorksheet:
+    """
+    Awaitable facade over a `gspread.Worksheet`, opened through `connection`
+    on first use. Only the methods the bot actually uses are wrapped; use
+    `get_worksheet()` for anything else.
+    """
+    def __init__(self, connection: SheetsConnection, url: str, title: str):
+        self.connection = connection
+        self.url = url
+        self.title = title
+        self._resize_lock = asyncio.Lock()
+
+    async def get_worksheet(self) -> gspread.Worksheet:
+        return await self.connection.worksheet(self.url, self.title)
+
+    async def get_all_values(self) -> list[list[str]]:
+        return await run_blocking((await self.get_worksheet()).get_all_values)
+
+    async def find(self, query: str, in_column: int | None = None) -> gspread.cell.Cell | None:
+        return await run_blocking((await self.get_worksheet()).find, query, in_column=in_column)
+
+    async def row_values(self, row: int) -> list[str]:
+        return await run_blocking((await self.get_worksheet()).row_values, row)
+
+    async def delete_row_set(self, rows: list[int]) -> None:
+        """
+        Delete many (not necessarily adjacent) rows with a single request.
+        """
+        worksheet = await self.get_worksheet()
+        rows = sorted(set(rows), reverse=True)  # bottom-up, so earlier deletions don't shift later ones
+        requests = [
+            {"deleteDimension": {"range": {"sheetId": worksheet.id, "dimension": "ROWS", "startIndex": row - 1, "endIndex": row}}}
+            for row in rows]
+        await run_blocking_non_idempotent(worksheet.spreadsheet.batch_update, {"requests": requests})
+        # keep gspread's cached grid size (used by `ensure_row_count()`) in sync
+        worksheet._properties["gridProperties"]["rowCount"] -= len(rows)
+
+    async def append_rows(self, values: list[list]) -> None:
+        await run_blocking_non_idempotent((await self.get_worksheet()).append_rows, values)
+
+    async def batch_update(self, data: list[dict]) -> None:
+        await run_blocking((await self.get_worksheet()).batch_update, data)
+
+    async def ensure_row_count(self, row_count: int) -> int:
+        """
+        Grow the worksheet to at least `row_count` rows. Returns the resulting row count.
+        """
+        worksheet = await self.get_worksheet()
+        # concurrent registrations would otherwise each add the missing rows
+        async with self._resize_lock:
+            if worksheet.row_count < row_count:
+                await run_blocking_non_idempotent(worksheet.add_rows, row_count - worksheet.row_count)
+        return worksheet.row_count
@@ -0,0 +1,96 @@
+import asyncio
+import datetime
+import json
+import logging
+import os
+from typing import *
+
+from .registry import RegistryConsistency, RegistryIndex
+from .store import LeaderboardStore
+
+# bump whenever the layout below changes; older snapshots are ignored
+SNAPSHOT_VERSION = 1
+
+
+class WarmStartSnapshot:
+    """
+    The registry indexes, and the outcome of the last reconciliation, saved
+    to a local file so a restart can serve registrations and standings right
+    away instead of re-reading both registries from Google first.
+
+    `restore()` only uses a snapshot that agrees with the store's registry
+    mirror (which every registration updates), so a snapshot left behind by
+    a crash is never trusted. The caller still checks the restored indexes
+    against the sheets (see `RegistryIndex.matches_tail()`) once connected.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    async def save(self, indexes: Dict[str, RegistryIndex], consistency: RegistryConsistency) -> None:
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "registries": {
+                leaderboard_type: {"url": index.worksheet.url, "title": index.worksheet.title, "values": index.to_values()}
+                for leaderboard_type, index in indexes.items()},
+            "consistency": {
+                "consistent": consistency.consistent,
+                "checked_at": consistency.checked_at.isoformat() if consistency.checked_at else None,
+                "fixed": consistency.fixed,
+                "conflicts": consistency.conflicts},
+        }
+        await asyncio.to_thread(self._write, json.dumps(snapshot, separators=(",", ":")))
+
+    def _write(self, text: str) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as f:
+            f.write(text)
+        os.replace(self.path + ".tmp", self.path)
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _read(self) -> dict | None:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring the unreadable snapshot {self.path}: {e!r}")
+            return None
+
+    async def restore(self, indexes: Dict[str, RegistryIndex], consistency: RegistryConsistency, store: LeaderboardStore) -> bool:
+        """
+        Load the indexes (and `consistency`) from the snapshot. Returns whether
+        they can be used; if not, the indexes are left empty.
+        """
+        snapshot = await asyncio.to_thread(self._read)
+        if snapshot is None or snapshot.get("version") != SNAPSHOT_VERSION:
+            return False
+        registries = snapshot["registries"]
+        for leaderboard_type, index in indexes.items():
+            registry = registries.get(leaderboard_type)
+            if registry is None or (registry["url"], registry["title"]) != (index.worksheet.url, index.worksheet.title):
+                logging.info(f"Not using the snapshot {self.path}: the {leaderboard_type} registry moved.")
+                return False
+        if await store.pending_registry_writes():
+            # an unfinished write is resumed when the registries are loaded
+            return False
+
+        for leaderboard_type, index in indexes.items():
+            index.load_values(registries[leaderboard_type]["values"])
+            if set(index.entries()) != set(await store.registry_entries(leaderboard_type)):
+                logging.info(f"Not using the snapshot {self.path}: the {leaderboard_type} registry changed since it was saved.")
+                for index in indexes.values():
+                    index.load_values([])
+                return False
+
+        saved = snapshot["consistency"]
+        consistency.consistent = saved["consistent"]
+        consistency.checked_at = datetime.datetime.fromisoformat(saved["checked_at"]) if saved["checked_at"] else None
+        consistency.fixed = saved["fixed"]
+        consistency.conflicts = saved["conflicts"]
+        return True
@@ -0,0 +1,109 @@
+from typing import *
+
+GAME_TYPES = ["Yonma Hanchan", "Yonma Tonpuu", "Sanma Hanchan", "Sanma Tonpuu"]
+
+STANDINGS_HEADER = [
+    "Game Type", "Rank", "Name", "Discord Name", "Games", "Total Score",
+    "Average Score", "Average Placement", "1st", "2nd", "3rd", "4th", "Chombo",
+]
+
+
+class PlayerStanding:
+    def __init__(self, discord_name: str):
+        self.discord_name = discord_name
+        self.games = 0
+        self.total_final_score = 0.0
+        self.total_placement = 0.0
+        self.placement_counts = {1: 0, 2: 0, 3: 0, 4: 0}
+        self.chombo_count = 0
+
+    @property
+    def average_final_score(self) -> float:
+        return self.total_final_score / self.games if self.games else 0.0
+
+    @property
+    def average_placement(self) -> float:
+        return self.total_placement / self.games if self.games else 0.0
+
+    def add(self, placement: float, final_score: float, chombo_count: int) -> None:
+        self.games += 1
+        self.total_final_score += final_score
+        self.total_placement += placement
+        # tied placements are recorded as the shared (best) placement
+        if int(placement) in self.placement_counts:
+            self.placement_counts[int(placement)] += 1
+        self.chombo_count += chombo_count
+
+
+class StandingsEngine:
+    """
+    Running per-player aggregates for every (leaderboard, game type).
+
+    `rebuild()` takes the per-player aggregates computed by the store in one
+    query; `add_game()` then keeps them current in O(players in the game).
+    """
+    def __init__(self, chombo_penalty: int):
+        # the "Scores" worksheet records the total penalty, not the chombo count
+        self.chombo_penalty = chombo_penalty
+        self._standings: Dict[Tuple[str, str], Dict[str, PlayerStanding]] = {}
+        # leaderboards whose standings changed since they were last published
+        self.dirty: Set[str] = set()
+
+    def rebuild(self, aggregates: list[tuple]) -> None:
+        """
+        `aggregates` rows are `(leaderboard, game_type, discord_name, games,
+        total_final_score, total_placement, firsts, seconds, thirds, fourths,
+        total_penalty)`, as returned by `LeaderboardStore.aggregate_scores()`.
+        """
+        standings: Dict[Tuple[str, str], Dict[str, PlayerStanding]] = {}
+        for (leaderboard, game_type, discord_name, games, total_final_score, total_placement,
+                firsts, seconds, thirds, fourths, total_penalty) in aggregates:
+            standing = PlayerStanding(discord_name)
+            standing.games = games
+            standing.total_final_score = total_final_score or 0.0
+            standing.total_placement = total_placement or 0.0
+            standing.placement_counts = {1: firsts, 2: seconds, 3: thirds, 4: fourths}
+            standing.chombo_count = self._chombo_count(total_penalty)
+            standings.setdefault((leaderboard, game_type), {})[discord_name] = standing
+        self.dirty.update(leaderboard for leaderboard, _ in set(standings) | set(self._standings))
+        self._standings = standings
+
+    def add_game(self, leaderboard_type: str, score_rows: list[list]) -> None:
+        """
+        `score_rows` are the game's rows as they go onto the "Scores" worksheet.
+        """
+        for _, game_type, _, discord_name, _, placement, _, penalty, final_score, *_ in score_rows:
+            players = self._standings.setdefault((leaderboard_type, game_type), {})
+            standing = players.get(discord_name)
+            if standing is None:
+                standing = players[discord_name] = PlayerStanding(discord_name)
+            standing.add(placement, final_score, self._chombo_count(penalty))
+        self.dirty.add(leaderboard_type)
+
+    def _chombo_count(self, penalty: float) -> int:
+        if not penalty or not self.chombo_penalty:
+            return 0
+        return round(penalty / self.chombo_penalty)
+
+    def ranked(self, leaderboard_type: str, game_type: str) -> list[PlayerStanding]:
+        """
+        Players ranked by total final score (best first).
+        """
+        players = self._standings.get((leaderboard_type, game_type), {})
+        return sorted(players.values(), key=lambda p: p.total_final_score, reverse=True)
+
+    def to_values(self, leaderboard_type: str, names: Dict[str, str]) -> list[list]:
+        """
+        The "Standings" worksheet content of a leaderboard, header included.
+        `names` maps Discord names to registered names.
+        """
+        values = [STANDINGS_HEADER]
+        for game_type in GAME_TYPES:
+            for rank, p in enumerate(self.ranked(leaderboard_type, game_type), 1):
+                values.append([
+                    game_type, rank, names.get(p.discord_name, ""), p.discord_name, p.games,
+                    round(p.total_final_score, 1), round(p.average_final_score, 2), round(p.average_placement, 2),
+                    p.placement_counts[1], p.placement_counts[2], p.placement_counts[3], p.placement_counts[4],
+                    p.chombo_count,
+                ])
+        return values
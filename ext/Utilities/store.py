@@ -0,0 +1,384 @@
+import asyncio
+import collections
+import functools
+import json
+import logging
+import os
+import secrets
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import *
+
+# replication status of a game
+PENDING = "pending"              # only in the local store
+GAMES_WRITTEN = "games written"  # "Games" row appended, "Scores" rows not yet
+FLUSHED = "flushed"              # fully written to the leaderboard
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registry (
+    leaderboard     TEXT NOT NULL,
+    discord_name    TEXT NOT NULL,
+    name            TEXT NOT NULL,
+    paid_membership TEXT NOT NULL,
+    PRIMARY KEY (leaderboard, discord_name)
+);
+CREATE INDEX IF NOT EXISTS registry_name ON registry (leaderboard, name);
+
+-- registry writes in progress, until they are finished or rolled back; see `RegistryWriter`
+CREATE TABLE IF NOT EXISTS registry_writes (
+    write_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    direction       TEXT NOT NULL,
+    writes          TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS games (
+    game_id         TEXT PRIMARY KEY,
+    seq             INTEGER NOT NULL,
+    leaderboard     TEXT NOT NULL,
+    timestamp       TEXT NOT NULL,
+    game_type       TEXT NOT NULL,
+    leftover_points NUMERIC,
+    ruleset_version INTEGER,
+    status          TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_timestamp ON games (leaderboard, timestamp);
+CREATE INDEX IF NOT EXISTS games_status ON games (status, seq);
+
+CREATE TABLE IF NOT EXISTS scores (
+    game_id         TEXT NOT NULL REFERENCES games (game_id) ON DELETE CASCADE,
+    leaderboard     TEXT NOT NULL,
+    timestamp       TEXT NOT NULL,
+    game_type       TEXT NOT NULL,
+    seat            TEXT NOT NULL,
+    discord_name    TEXT NOT NULL,
+    raw_score       NUMERIC,
+    placement       NUMERIC,
+    uma             NUMERIC,
+    penalty         NUMERIC,
+    final_score     NUMERIC,
+    ruleset_version INTEGER,
+    PRIMARY KEY (game_id, seat)
+);
+CREATE INDEX IF NOT EXISTS scores_discord_name ON scores (leaderboard, discord_name);
+CREATE INDEX IF NOT EXISTS scores_timestamp ON scores (leaderboard, timestamp);
+"""
+
+# columns of the "Games" and "Scores" worksheets, in order
+GAME_COLUMNS = "timestamp, game_type, leftover_points, ruleset_version"
+SCORE_COLUMNS = "timestamp, game_type, seat, discord_name, raw_score, placement, uma, penalty, final_score, ruleset_version"
+GAME_COLUMN_COUNT = len(GAME_COLUMNS.split(","))
+SCORE_COLUMN_COUNT = len(SCORE_COLUMNS.split(","))
+
+# columns added since the first version of the schema
+MIGRATIONS = [
+    ("games", "ruleset_version", "INTEGER"),
+    ("scores", "ruleset_version", "INTEGER"),
+]
+
+
+class GameRecord:
+    def __init__(self, game_id: str, leaderboard_type: str, game_row: list, score_rows: list[list], status: str):
+        self.game_id = game_id
+        self.leaderboard_type = leaderboard_type
+        # the rows exactly as they go onto the "Games" and "Scores" worksheets
+        self.game_row = game_row
+        self.score_rows = score_rows
+        self.status = status
+
+
+def _pad(row: list, length: int) -> list:
+    # a short row leaves its trailing columns empty
+    return list(row) + [None] * (length - len(row))
+
+
+def _to_number(value: str) -> float | None:
+    try:
+        return float(value.replace(",", "")) if isinstance(value, str) else float(value)
+    except ValueError:
+        return None
+
+
+class SheetGame:
+    """
+    One game as found on the "Games" and "Scores" worksheets, with numbers parsed.
+    """
+    def __init__(self, games_row_number: int | None, game_row: list):
+        self.games_row_number = games_row_number  # None if the "Games" row is missing
+        self.game_row = game_row
+        self.score_row_numbers: list[int] = []
+        self.score_rows: list[list] = []
+
+
+def pair_sheet_rows(games_values: list[list[str]], scores_values: list[list[str]]) -> list[SheetGame]:
+    """
+    Group the rows of the "Games" and "Scores" worksheets (as returned by
+    `get_all_values()`) into games.
+
+    The worksheets have no game ID column. Both are appended in the same
+    order, so each "Games" row claims the next run of "Scores" rows with the
+    same (timestamp, game type); a repeated seat starts a new game.
+    Non-numeric rows (i.e., headers) are skipped.
+    """
+    games: list[SheetGame] = []
+    unclaimed: Dict[Tuple[str, str], collections.deque[SheetGame]] = {}
+    for i, row in enumerate(games_values, 1):
+        row = row + [""] * (GAME_COLUMN_COUNT - len(row))
+        leftover_points = _to_number(row[2])
+        if not row[0] or leftover_points is None:
+            continue
+        game = SheetGame(i, [row[0], row[1], leftover_points, _to_number(row[3])])
+        games.append(game)
+        unclaimed.setdefault((row[0], row[1]), collections.deque()).append(game)
+
+    current: SheetGame | None = None
+    for i, row in enumerate(scores_values, 1):
+        row = row + [""] * (SCORE_COLUMN_COUNT - len(row))
+        numbers = [_to_number(v) for v in row[4:10]]
+        if not row[0] or numbers[0] is None:
+            continue
+        key = (row[0], row[1])
+        if current is None or tuple(current.game_row[:2]) != key or any(r[2] == row[2] for r in current.score_rows):
+            if unclaimed.get(key):
+                current = unclaimed[key].popleft()
+            else:
+                # scores without a "Games" row (e.g., it was deleted by hand)
+                current = SheetGame(None, [row[0], row[1], 0, numbers[5]])
+                games.append(current)
+        current.score_row_numbers.append(i)
+        current.score_rows.append([row[0], row[1], row[2], row[3], *numbers])
+    return games
+
+
+class LeaderboardStore:
+    """
+    Local SQLite store: the source of truth for games and scores, and a
+    mirror of both registries.
+
+    New games are written here first with status `PENDING`; the cog's
+    replication loops push them to the "Games"/"Scores" worksheets in batches
+    and pull back any manual edits made on the sheets. Flushed rows always
+    mirror the sheet; pending rows are local until pushed.
+
+    All queries run on one dedicated thread, so the connection is never shared
+    across threads and the event loop never waits on disk.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def _run(self, func: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def open(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")
+        await self._run(self._open)
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        for table, column, column_type in MIGRATIONS:
+            columns = [info[1] for info in self._conn.execute(f"PRAGMA table_info({table})")]
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        self._conn.commit()
+
+    async def close(self) -> None:
+        if self._executor is None:
+            return
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        self._conn = None
+
+    # ===================================================
+    # GAMES & SCORES
+    # ===================================================
+    async def add_game(self, leaderboard_type: str, game_row: list, score_rows: list[list]) -> GameRecord:
+        """
+        Durably record a new game. It is replicated to the leaderboard later.
+        """
+        game = GameRecord(secrets.token_hex(4), leaderboard_type, game_row, score_rows, PENDING)
+        await self._run(self._add_games, [game])
+        return game
+
+    async def add_games(self, leaderboard_type: str, games: list[Tuple[list, list[list]]]) -> list[GameRecord]:
+        """
+        Durably record many `(game_row, score_rows)` games in one transaction.
+        """
+        records = [GameRecord(secrets.token_hex(4), leaderboard_type, game_row, score_rows, PENDING) for game_row, score_rows in games]
+        await self._run(self._add_games, records)
+        return records
+
+    def _add_games(self, games: list[GameRecord]) -> None:
+        with self._conn:
+            self._insert_games(games)
+
+    def _insert_games(self, games: list[GameRecord]) -> None:
+        # callers are responsible for the transaction
+        (next_seq,) = self._conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM games").fetchone()
+        for i, game in enumerate(games):
+            self._conn.execute(
+                f"INSERT INTO games (game_id, seq, leaderboard, {GAME_COLUMNS}, status) VALUES (?, ?, ?, {', '.join('?' * GAME_COLUMN_COUNT)}, ?)",
+                [game.game_id, next_seq + i, game.leaderboard_type, *_pad(game.game_row, GAME_COLUMN_COUNT), game.status])
+            self._conn.executemany(
+                f"INSERT INTO scores (game_id, leaderboard, {SCORE_COLUMNS}) VALUES (?, ?, {', '.join('?' * SCORE_COLUMN_COUNT)})",
+                [[game.game_id, game.leaderboard_type, *_pad(row, SCORE_COLUMN_COUNT)] for row in game.score_rows])
+
+    async def get_game(self, game_id: str) -> GameRecord | None:
+        games = await self._run(self._select_games, "game_id = ?", [game_id])
+        return games[0] if games else None
+
+    async def recent_games(self, since: str) -> list[GameRecord]:
+        """
+        Games of both leaderboards timestamped `since` (same format) or later, oldest first.
+        """
+        return await self._run(self._select_games, "timestamp >= ?", [since])
+
+    async def unflushed_games(self, leaderboard_type: str | None = None) -> list[GameRecord]:
+        """
+        Games not yet fully written to the leaderboard, oldest first.
+        """
+        if leaderboard_type is None:
+            return await self._run(self._select_games, "status != ?", [FLUSHED])
+        return await self._run(self._select_games, "status != ? AND leaderboard = ?", [FLUSHED, leaderboard_type])
+
+    def _select_games(self, where: str, params: list) -> list[GameRecord]:
+        game_rows = self._conn.execute(
+            f"SELECT game_id, leaderboard, status, {GAME_COLUMNS} FROM games WHERE {where} ORDER BY seq", params).fetchall()
+        games = []
+        for game_id, leaderboard, status, *game_row in game_rows:
+            score_rows = self._conn.execute(
+                f"SELECT {SCORE_COLUMNS} FROM scores WHERE game_id = ? ORDER BY rowid", [game_id]).fetchall()
+            games.append(GameRecord(game_id, leaderboard, game_row, [list(r) for r in score_rows], status))
+        return games
+
+    async def mark_games(self, games: list[GameRecord], status: str) -> None:
+        await self._run(self._mark_games, [g.game_id for g in games], status)
+        for game in games:
+            game.status = status
+
+    def _mark_games(self, game_ids: list[str], status: str) -> None:
+        with self._conn:
+            self._conn.executemany("UPDATE games SET status = ? WHERE game_id = ?", [(status, i) for i in game_ids])
+
+    async def replace_flushed_games(self, leaderboard_type: str, games_values: list[list[str]], scores_values: list[list[str]]) -> None:
+        """
+        Replace every flushed game of a leaderboard with the current content of
+        its "Games" and "Scores" worksheets (as returned by `get_all_values()`).
+        Must be called within that leaderboard's game entry lock, so no push is
+        in progress.
+        """
+        await self._run(self._replace_flushed_games, leaderboard_type, games_values, scores_values)
+
+    def _replace_flushed_games(self, leaderboard_type: str, games_values: list[list[str]], scores_values: list[list[str]]) -> None:
+        games = []
+        for sheet_game in pair_sheet_rows(games_values, scores_values):
+            if sheet_game.games_row_number is not None:
+                game_id = f"sheet-{leaderboard_type}-games-{sheet_game.games_row_number}"
+            else:
+                game_id = f"sheet-{leaderboard_type}-scores-{sheet_game.score_row_numbers[0]}"
+            games.append(GameRecord(game_id, leaderboard_type, sheet_game.game_row, sheet_game.score_rows, FLUSHED))
+
+        # keep the IDs of games we pushed ourselves, so their status stays queryable
+        known_ids: Dict[Tuple[str, str], collections.deque[str]] = {}
+        for game_id, timestamp, game_type in self._conn.execute(
+                "SELECT game_id, timestamp, game_type FROM games WHERE leaderboard = ? AND status = ? ORDER BY seq",
+                [leaderboard_type, FLUSHED]):
+            known_ids.setdefault((timestamp, game_type), collections.deque()).append(game_id)
+        for game in games:
+            ids = known_ids.get(tuple(game.game_row[:2]))
+            if ids:
+                game.game_id = ids.popleft()
+        # a kept ID may coincide with a row-based one after rows moved
+        ids_in_use = set()
+        for game in games:
+            while game.game_id in ids_in_use:
+                game.game_id += "+"
+            ids_in_use.add(game.game_id)
+
+        with self._conn:
+            self._conn.execute("DELETE FROM games WHERE leaderboard = ? AND status = ?", [leaderboard_type, FLUSHED])
+            self._insert_games(games)
+
+    async def aggregate_scores(self) -> list[tuple]:
+        """
+        Per-player totals for every (leaderboard, game type), in one pass over
+        the scores: `(leaderboard, game_type, discord_name, games,
+        total_final_score, total_placement, firsts, seconds, thirds, fourths,
+        total_penalty)`.
+        """
+        return await self._run(self._fetchall, """
+            SELECT leaderboard, game_type, discord_name, COUNT(*), SUM(final_score), SUM(placement),
+                   SUM(placement = 1), SUM(placement = 2), SUM(placement = 3), SUM(placement = 4),
+                   SUM(penalty)
+            FROM scores
+            GROUP BY leaderboard, game_type, discord_name""", [])
+
+    def _fetchall(self, query: str, params: list) -> list[tuple]:
+        return self._conn.execute(query, params).fetchall()
+
+    # ===================================================
+    # REGISTRY
+    # ===================================================
+    async def replace_registry(self, leaderboard_type: str, entries: list[Tuple[str, str, str]]) -> None:
+        """
+        Replace the mirrored registry of a leaderboard with `(discord_name, name, paid_membership)` entries.
+        """
+        await self._run(self._replace_registry, leaderboard_type, entries)
+
+    def _replace_registry(self, leaderboard_type: str, entries: list[Tuple[str, str, str]]) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM registry WHERE leaderboard = ?", [leaderboard_type])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO registry (leaderboard, discord_name, name, paid_membership) VALUES (?, ?, ?, ?)",
+                [(leaderboard_type, *e) for e in entries])
+
+    async def upsert_registration(self, leaderboard_type: str, discord_name: str, name: str, paid_membership: str) -> None:
+        await self._run(self._execute,
+            "INSERT OR REPLACE INTO registry (leaderboard, discord_name, name, paid_membership) VALUES (?, ?, ?, ?)",
+            [leaderboard_type, discord_name, name, paid_membership])
+
+    async def registry_entries(self, leaderboard_type: str) -> list[Tuple[str, str, str]]:
+        """
+        The mirrored registry of a leaderboard, as `(discord_name, name, paid_membership)` entries.
+        """
+        return await self._run(self._fetchall,
+            "SELECT discord_name, name, paid_membership FROM registry WHERE leaderboard = ?", [leaderboard_type])
+
+    async def delete_registration(self, leaderboard_type: str, discord_name: str) -> None:
+        await self._run(self._execute,
+            "DELETE FROM registry WHERE leaderboard = ? AND discord_name = ?",
+            [leaderboard_type, discord_name])
+
+    def _execute(self, query: str, params: list) -> None:
+        with self._conn:
+            self._conn.execute(query, params)
+
+    async def add_registry_write(self, direction: str, writes: list[dict]) -> int:
+        """
+        Durably record registry writes about to be sent; returns their ID.
+        """
+        return await self._run(self._insert_registry_write, direction, json.dumps(writes))
+
+    def _insert_registry_write(self, direction: str, writes: str) -> int:
+        with self._conn:
+            return self._conn.execute("INSERT INTO registry_writes (direction, writes) VALUES (?, ?)", [direction, writes]).lastrowid
+
+    async def set_registry_write_direction(self, write_id: int, direction: str) -> None:
+        await self._run(self._execute, "UPDATE registry_writes SET direction = ? WHERE write_id = ?", [direction, write_id])
+
+    async def delete_registry_write(self, write_id: int) -> None:
+        await self._run(self._execute, "DELETE FROM registry_writes WHERE write_id = ?", [write_id])
+
+    async def pending_registry_writes(self) -> list[Tuple[int, str, list[dict]]]:
+        """
+        `(write_id, direction, writes)` of the registry writes never finished or rolled back, oldest first.
+        """
+        rows = await self._run(self._fetchall, "SELECT write_id, direction, writes FROM registry_writes ORDER BY write_id", [])
+        return [(write_id, direction, json.loads(writes)) for write_id, direction, writes in rows]
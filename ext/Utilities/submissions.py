@@ -0,0 +1,95 @@
+import collections
+import datetime
+import zoneinfo
+from typing import *
+
+# a game's fingerprint: (leaderboard, game type, ((seat, discord name, raw score, chombo penalty), ...))
+Fingerprint = Tuple[str, str, Tuple[Tuple[Any, ...], ...]]
+
+
+def fingerprint(leaderboard_type: str, game_type: str, score_rows: list[list]) -> Fingerprint:
+    """
+    What makes two submissions the same game, from its "Scores" rows.
+    """
+    return (leaderboard_type, game_type, tuple((row[2], row[3], row[4], row[7]) for row in score_rows))
+
+
+class Submission:
+    def __init__(self, entered_at: datetime.datetime):
+        self.entered_at = entered_at
+        self.game_id: str | None = None  # None while the game is being entered
+        self.response: str | None = None  # for interactions: what was answered
+
+
+class SubmissionIndex:
+    """
+    Recently entered games by fingerprint, and recently handled score entry
+    interactions by ID, so a resubmitted game (or a retried interaction) is
+    caught in O(1) before anything is written.
+
+    Entries older than `window` are dropped, as are the oldest ones beyond
+    `max_size`. A submission is reserved (`reserve()`) before its game is
+    written, so two concurrent submissions of the same game can't both pass.
+    """
+    def __init__(self, time_zone: zoneinfo.ZoneInfo, window: datetime.timedelta, max_size: int):
+        self.time_zone = time_zone
+        self.window = window
+        self.max_size = max_size
+        # both in the order they were entered
+        self._games: collections.OrderedDict[Fingerprint, Submission] = collections.OrderedDict()
+        self._interactions: collections.OrderedDict[int, Submission] = collections.OrderedDict()
+
+    def _now(self) -> datetime.datetime:
+        # "Games" timestamps are naive local times
+        return datetime.datetime.now(self.time_zone).replace(tzinfo=None)
+
+    def _expire(self, entries: collections.OrderedDict) -> None:
+        cutoff = self._now() - self.window
+        while entries:
+            key, submission = next(iter(entries.items()))
+            if len(entries) <= self.max_size and submission.entered_at >= cutoff:
+                return
+            del entries[key]
+
+    def seed(self, leaderboard_type: str, game_type: str, timestamp: str, game_id: str, score_rows: list[list]) -> None:
+        """
+        Index a game entered before startup; call in the order they were entered.
+        """
+        try:
+            entered_at = datetime.datetime.fromisoformat(timestamp)
+        except ValueError:
+            return  # e.g., edited by hand on the sheet
+        submission = Submission(entered_at)
+        submission.game_id = game_id
+        self._games[fingerprint(leaderboard_type, game_type, score_rows)] = submission
+        self._expire(self._games)
+
+    def find_game(self, key: Fingerprint) -> Submission | None:
+        self._expire(self._games)
+        return self._games.get(key)
+
+    def reserve_game(self, key: Fingerprint) -> Submission:
+        submission = Submission(self._now())
+        self._games[key] = submission
+        self._expire(self._games)
+        return submission
+
+    def release_game(self, key: Fingerprint) -> None:
+        # the game wasn't entered after all
+        self._games.pop(key, None)
+
+    def find_interaction(self, interaction_id: int) -> Submission | None:
+        self._expire(self._interactions)
+        return self._interactions.get(interaction_id)
+
+    def reserve_interaction(self, interaction_id: int) -> Submission:
+        submission = Submission(self._now())
+        self._interactions[interaction_id] = submission
+        self._expire(self._interactions)
+        return submission
+
+    def release_interaction(self, interaction_id: int) -> None:
+        self._interactions.pop(interaction_id, None)
+
+    def __len__(self) -> int:
+        return len(self._games)
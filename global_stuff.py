@@ -1,23 +1,23 @@
+import atexit
 import dotenv
 from os import getenv
 import logging
-import logging.handlers
 import sys
+import time
 
-# INFO level captures all except DEBUG log messages.
-# the FileHandler by default appends to the given file
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s %(name)s: %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.handlers.RotatingFileHandler(
-            "./logs/bot.log",
-            maxBytes=5_000_000,
-            backupCount=1
-        )
-    ]
-)
+from logging_stuff import setup_logging
+
+# load environmental variables
+_dotenv_start = time.perf_counter()
+dotenv.load_dotenv("config.env")
+_dotenv_time = time.perf_counter() - _dotenv_start
+
+# logs go through a queue to a background thread, which also rotates and
+# compresses `logs/bot.log`, so logging never waits on the disk.
+# set `log_format = "json"` in config.env for JSON lines.
+_log_listener = setup_logging(json_lines=getenv("log_format") == "json")
+atexit.register(_log_listener.stop)
+logging.info(f"Startup timing: loading config.env took {_dotenv_time:.2f}s.")
 
 # also log the exceptions but still invoke the default exception handler.
 # note that app command exceptions should be handled separately to ensure no interruption.
@@ -28,9 +28,6 @@ def handle_exception(exc_type, exc_value, exc_traceback):
 
 sys.excepthook = handle_exception
 
-# load environmental variables
-dotenv.load_dotenv("config.env")
-
 def assert_getenv(name: str) -> str:
     value = getenv(name)
     assert value is not None, f"missing \"{name}\" in config.env"
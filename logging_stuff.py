@@ -0,0 +1,126 @@
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+
+LOG_FILE = "./logs/bot.log"
+LOG_MAX_BYTES = 5_000_000
+LOG_BACKUP_COUNT = 1
+
+# records waiting for the writer thread; see `BoundedQueueHandler` for what
+# happens when the writer falls this far behind
+LOG_QUEUE_SIZE = 10_000
+
+# optional fields, passed through `extra=`, that JSON lines carry as their own keys
+STRUCTURED_FIELDS = ("command", "guild", "latency_ms", "sheets_calls")
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    One JSON object per line, with any `STRUCTURED_FIELDS` the record carries.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, DATE_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread without ever blocking the caller (i.e.,
+    the event loop). When the queue is full, DEBUG/INFO records are dropped;
+    WARNING and above evict the oldest queued record instead. Drops are
+    counted and reported in the log once there is room again.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # keep the traceback separate from the message, for the JSON formatter
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if record.levelno >= logging.WARNING:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.put_nowait(record)
+                except (queue.Empty, queue.Full):
+                    pass
+            return
+
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            notice = logging.LogRecord(
+                "logging", logging.WARNING, __file__, 0,
+                f"Dropped {dropped} log record(s) because the log queue was full.", None, None)
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                self.dropped += dropped
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def setup_logging(json_lines: bool = False) -> logging.handlers.QueueListener:
+    """
+    Route the root logger through a bounded queue to a background writer
+    thread. Writing, rotating and compressing `LOG_FILE` all happen on that
+    thread. Returns the (started) listener; call `stop()` on it to flush.
+    """
+    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE,
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT
+    )
+    file_handler.namer = _gzip_namer
+    file_handler.rotator = _gzip_rotator
+    if json_lines:
+        file_handler.setFormatter(JsonLinesFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT, DATE_FORMAT))
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+
+    # INFO level captures all except DEBUG log messages.
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(BoundedQueueHandler(log_queue))
+    return listener
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import math
+import time
+from aiohttp import web
+from typing import *
+
+# in seconds; suits everything from a lock wait to a slow Sheets call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """
+    Base of the (minimal, Prometheus-compatible) metrics below. Metrics are
+    only updated from the event loop thread, so they need no locking.
+    """
+    type_name = ""
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+
+    def _label_values(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> list[Tuple[str, str, float]]:
+        # (name suffix, formatted labels, value)
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type_name}"]
+        lines += [f"{self.name}{suffix}{labels} {_format_value(value)}" for suffix, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, description, label_names)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._label_values(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> list[Tuple[str, str, float]]:
+        return [("", _format_labels(self.label_names, key), value) for key, value in sorted(self.values.items())]
+
+
+class Gauge(Metric):
+    """
+    Either `set()` directly, or computed at scrape time by `callback`, which
+    returns a value (no labels) or a `{label values: value}` dict.
+    """
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Tuple[str, ...] = (),
+        callback: Callable[[], float | Dict[LabelValues, float]] | None = None
+    ):
+        super().__init__(name, description, label_names)
+        self.callback = callback
+        self.values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self._label_values(labels)] = value
+
+    def current(self) -> Dict[LabelValues, float]:
+        if self.callback is None:
+            return self.values
+        value = self.callback()
+        return value if isinstance(value, dict) else {(): value}
+
+    def samples(self) -> list[Tuple[str, str, float]]:
+        return [("", _format_labels(self.label_names, key), value) for key, value in sorted(self.current().items())]
+
+
+class HistogramSeries:
+    def __init__(self, bucket_count: int):
+        self.bucket_counts = [0] * bucket_count
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets = buckets
+        self.series: Dict[LabelValues, HistogramSeries] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._label_values(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = HistogramSeries(len(self.buckets))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series.bucket_counts[i] += 1
+        series.count += 1
+        series.sum += value
+        series.max = max(series.max, value)
+
+    def quantile(self, q: float, **labels) -> float | None:
+        """
+        Upper bound of the bucket holding the `q` quantile (like Prometheus'
+        `histogram_quantile()`, without interpolation).
+        """
+        series = self.series.get(self._label_values(labels))
+        if series is None or series.count == 0:
+            return None
+        for bound, count in zip(self.buckets, series.bucket_counts):
+            if count >= q * series.count:
+                return bound
+        return series.max
+
+    def samples(self) -> list[Tuple[str, str, float]]:
+        samples = []
+        for key, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series.bucket_counts):
+                samples.append(("_bucket", _format_labels(self.label_names, key, f'le="{_format_value(bound)}"'), count))
+            samples.append(("_bucket", _format_labels(self.label_names, key, 'le="+Inf"'), series.count))
+            samples.append(("_sum", _format_labels(self.label_names, key), series.sum))
+            samples.append(("_count", _format_labels(self.label_names, key), series.count))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        # modules that define metrics are re-imported by `rc/reload`; keep the existing series
+        return self.metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+def counter(name: str, description: str, label_names: Tuple[str, ...] = ()) -> Counter:
+    return registry.register(Counter(name, description, label_names))
+
+def gauge(name: str, description: str, label_names: Tuple[str, ...] = (), callback: Callable | None = None) -> Gauge:
+    metric = registry.register(Gauge(name, description, label_names, callback))
+    if callback is not None:
+        metric.callback = callback
+    return metric
+
+def histogram(name: str, description: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, description, label_names, buckets))
+
+
+# ===================================================
+# METRICS SHARED ACROSS THE BOT
+# ===================================================
+command_latency = histogram(
+    "bot_command_latency_seconds", "Time from a command's invocation until it completed (for deferred slash commands, until the followup was sent).", ("command",))
+command_errors = counter(
+    "bot_command_errors_total", "Commands that raised an error.", ("command",))
+lock_wait = histogram(
+    "bot_lock_wait_seconds", "Time spent waiting to acquire a lock.", ("lock",))
+loop_lag = histogram(
+    "bot_event_loop_lag_seconds", "How late the event loop woke up a sleeping task.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+loop_lag_last = gauge(
+    "bot_event_loop_lag_last_seconds", "The most recent event loop lag measurement.")
+
+
+class TimedLock(asyncio.Lock):
+    """
+    `asyncio.Lock` that records how long each acquisition waited.
+    """
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+
+    async def acquire(self) -> bool:
+        start = time.perf_counter()
+        result = await super().acquire()
+        lock_wait.observe(time.perf_counter() - start, lock=self.name)
+        return result
+
+
+async def monitor_loop_lag(interval: float = 0.5) -> None:
+    """
+    Sleep `interval` seconds over and over; any extra time is time the loop
+    spent busy (e.g., on blocking code) before it could wake us up.
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - start - interval)
+        loop_lag.observe(lag)
+        loop_lag_last.set(lag)
+
+
+async def start_http_server(port: int, host: str = "127.0.0.1") -> web.AppRunner:
+    """
+    Serve `registry` in the Prometheus text format at http://host:port/metrics.
+    Binds to localhost by default; scrape it from the same machine.
+    """
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Serving metrics at http://{host}:{port}/metrics.")
+    return runner
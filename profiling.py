@@ -0,0 +1,119 @@
+import asyncio
+import collections
+import cProfile
+import io
+import logging
+import pstats
+import time
+from typing import *
+
+# slow-callback warnings kept for `rc/profile_dump`
+SLOW_CALLBACK_HISTORY = 200
+
+
+class SlowCallbackRecorder(logging.Handler):
+    """
+    Keeps the most recent "Executing <Handle ...> took 0.123 seconds" warnings
+    that asyncio logs in debug mode (they still reach the regular log too).
+    """
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.records: collections.deque[str] = collections.deque(maxlen=SLOW_CALLBACK_HISTORY)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.getMessage()
+        if message.startswith("Executing "):
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+            self.records.append(f"{timestamp} {message}")
+
+
+slow_callbacks = SlowCallbackRecorder()
+
+
+def set_loop_debug(enabled: bool, slow_callback_duration: float = 0.1) -> None:
+    """
+    Toggle asyncio debug mode on the running loop. While on, every callback
+    (i.e., every step of a coroutine) that runs longer than
+    `slow_callback_duration` seconds is logged and recorded.
+    """
+    loop = asyncio.get_running_loop()
+    asyncio_logger = logging.getLogger("asyncio")
+    if enabled:
+        loop.slow_callback_duration = slow_callback_duration
+        if slow_callbacks not in asyncio_logger.handlers:
+            asyncio_logger.addHandler(slow_callbacks)
+    else:
+        asyncio_logger.removeHandler(slow_callbacks)
+    loop.set_debug(enabled)
+
+
+class ProfilerSession:
+    """
+    cProfile of the event loop thread (where all coroutines run) for a fixed
+    number of seconds. Calls running on executor threads (Sheets, SQLite)
+    show up only as the time spent awaiting them.
+    """
+    def __init__(self):
+        self._profile: cProfile.Profile | None = None
+        self._stopper: asyncio.TimerHandle | None = None
+        self._on_stop: Callable[[], Any] | None = None
+        self.started_at: float | None = None
+        self.duration: float | None = None
+        self.last_stats: pstats.Stats | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._profile is not None
+
+    def start(self, seconds: float, on_stop: Callable[[], Any] | None = None) -> None:
+        """
+        Must be called from the event loop thread. `on_stop` is called (on the
+        loop) once the session stops, whether by timeout or `stop()`.
+        """
+        if self.running:
+            raise RuntimeError("A profiling session is already running.")
+        profile = cProfile.Profile()
+        profile.enable()  # raises ValueError if another profiler is active
+        self._profile = profile
+        self.started_at = time.perf_counter()
+        self._on_stop = on_stop
+        self._stopper = asyncio.get_running_loop().call_later(seconds, self.stop)
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._profile.disable()
+        self._stopper.cancel()
+        self.duration = time.perf_counter() - self.started_at
+        self.last_stats = pstats.Stats(self._profile)
+        self._profile = None
+        logging.info(f"Profiling session stopped after {self.duration:.1f}s.")
+        if self._on_stop is not None:
+            self._on_stop()
+
+    def report(self, top: int = 30, sort: str = "tottime") -> str | None:
+        """
+        The `top` hottest functions of the last session, as text.
+        """
+        if self.last_stats is None:
+            return None
+        out = io.StringIO()
+        self.last_stats.stream = out
+        self.last_stats.sort_stats(sort).print_stats(top)
+        return f"Profile of the event loop thread over {self.duration:.1f}s, sorted by {sort}:\n{out.getvalue()}"
+
+
+profiler = ProfilerSession()
+
+
+def dump_report(top: int = 30, sort: str = "tottime") -> str:
+    """
+    Everything `rc/profile_dump` reports: the hot functions of the last
+    profiling session and the recorded slow callbacks.
+    """
+    sections = [profiler.report(top, sort) or "No profiling session has finished yet."]
+    if slow_callbacks.records:
+        sections.append("Slow callbacks (most recent last):\n" + "\n".join(slow_callbacks.records))
+    else:
+        sections.append("No slow callbacks recorded (is `rc/loop_debug on` set?).")
+    return "\n\n".join(sections)
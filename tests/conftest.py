@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# the bot's modules are imported from the repository root, with the
+# `config.env` variables they need at import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("time_zone", "America/New_York")
+
+
+@pytest.fixture
+def leaderboards(tmp_path, monkeypatch):
+    """
+    The club and friendly leaderboards as fake spreadsheets, behind the
+    Utilities cog's Sheets connection. The store lives under `tmp_path`.
+    """
+    from benchmarks.fakes import leaderboard_spreadsheet
+    from benchmarks.offline import CLUB_LEADERBOARD_URL, FRIENDLY_LEADERBOARD_URL, import_utilities, install_fake_sheets, set_sheets_quota
+
+    import_utilities(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    spreadsheets = [leaderboard_spreadsheet(url) for url in (CLUB_LEADERBOARD_URL, FRIENDLY_LEADERBOARD_URL)]
+    install_fake_sheets(spreadsheets)
+    # no need to wait for tokens here
+    set_sheets_quota(6000, 100)
+    return spreadsheets
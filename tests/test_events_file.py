@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from ext.EventPoster.events_file import EventsFile
+
+EVENT = {
+    "name": "Riichi Night",
+    "description": "Weekly games.",
+    "location": "Student Union",
+    "start_time": "18:00",
+    "end_time": "22:00",
+    "remind_before_hours": 24,
+    "recurrence": {"starting_date": "2025-07-12", "every_weeks": 1},
+}
+
+
+def load(tmp_path, config) -> list:
+    path = tmp_path / "events.json"
+    path.write_text(json.dumps(config) if not isinstance(config, str) else config)
+    return EventsFile(str(path)).load()
+
+
+def test_valid_events_load(tmp_path):
+    events = load(tmp_path, {"look_ahead": 2, "excluded_dates": ["2025-12-27"], "events": [EVENT]})
+    assert [e.name for e in events] == ["Riichi Night"]
+
+
+@pytest.mark.parametrize("config", [
+    "not json",
+    [EVENT],
+    {"events": [1]},
+    {"events": {"Riichi Night": EVENT}},
+    {"events": [EVENT], "excluded_dates": [5]},
+    {"events": [EVENT], "excluded_dates": "2025-12-27"},
+    {"events": [EVENT], "look_ahead": "two"},
+    {"events": [EVENT], "look_ahead": None},
+    {"events": [{**EVENT, "excluded_dates": [5]}]},
+    {"events": [{**EVENT, "recurrence": ["every_weeks", 1]}]},
+    {"events": [{**EVENT, "recurrence": {"starting_date": 20250712, "every_weeks": 1}}]},
+    {"events": [{**EVENT, "name": 5}]},
+    {"events": [{**EVENT, "location": None}]},
+    {"events": [{**EVENT, "start_time": 18}]},
+    {"events": [{**EVENT, "remind_before_hours": "a day"}]},
+    {"events": [{**EVENT, "remind_before_hours": 1e308}]},
+    {"events": [EVENT, EVENT]},
+])
+def test_malformed_events_raise_value_error(tmp_path, config):
+    with pytest.raises(ValueError):
+        load(tmp_path, config)
@@ -0,0 +1,53 @@
+import asyncio
+
+import gspread
+import pytest
+
+from benchmarks.fakes import _error_response
+from benchmarks.offline import import_utilities
+
+cog_module = import_utilities()
+
+GAME_ROW = ["2025-07-12 19:30:00", "Yonma Hanchan", 0, 1]
+SCORE_ROWS = [
+    ["2025-07-12 19:30:00", "Yonma Hanchan", seat, f"player{i}", raw_score, i + 1, uma, 0, final_score, 1]
+    for i, (seat, raw_score, uma, final_score) in enumerate([
+        ("East", 40000, 24, 39), ("South", 30000, 8, 13), ("West", 20000, -8, -13), ("North", 10000, -24, -39)])]
+
+
+def fail_after_applying(worksheet, status: int) -> None:
+    """
+    Make the next `append_rows` to `worksheet` apply the rows and then fail, as
+    when Google's response is lost.
+    """
+    append_rows = worksheet.append_rows
+
+    def append_then_fail(values, **kwargs):
+        worksheet.append_rows = append_rows
+        append_rows(values, **kwargs)
+        raise gspread.exceptions.APIError(_error_response(status, "Internal error (fake)."))
+    worksheet.append_rows = append_then_fail
+
+
+def push_twice(club, worksheet: str) -> list:
+    async def run():
+        await cog_module.leaderboard_store.open()
+        try:
+            cog = cog_module.Utilities(None)
+            await cog_module.leaderboard_store.add_game("Club Leaderboard", GAME_ROW, SCORE_ROWS)
+            fail_after_applying(club.worksheets[worksheet], 503)
+            with pytest.raises(gspread.exceptions.APIError):
+                await cog._push_leaderboard("Club Leaderboard")
+            await cog._push_leaderboard("Club Leaderboard")
+            return await cog_module.leaderboard_store.unflushed_games("Club Leaderboard")
+        finally:
+            await cog_module.leaderboard_store.close()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("worksheet", ["Games", "Scores"])
+def test_applied_append_is_not_repeated(leaderboards, worksheet):
+    club = leaderboards[0]
+    assert push_twice(club, worksheet) == []
+    assert len(club.worksheets["Games"].get_all_values()) == 1 + 1
+    assert len(club.worksheets["Scores"].get_all_values()) == 1 + len(SCORE_ROWS)
@@ -0,0 +1,38 @@
+from ext.Utilities.registry import RegistryIndex
+
+
+class FakeWorksheet:
+    title = "Registry"
+    url = "https://docs.google.com/spreadsheets/d/registry"
+
+
+def registry_index() -> RegistryIndex:
+    index = RegistryIndex(FakeWorksheet())
+    index.load_values([["Discord Name", "Name", "Paid Membership"], ["alice", "Alice", "yes"]])
+    return index
+
+
+def test_new_registrations_reserve_different_rows():
+    index = registry_index()
+    rows = [index.plan_upsert(discord_name, name).row for discord_name, name in [("bob", "Bob"), ("carol", "Carol")]]
+    assert rows == [3, 4]
+    assert index.plan_upsert("alice", "Alicia").row == 2
+
+
+def test_released_rows_are_reused():
+    index = registry_index()
+    bob, carol = index.plan_upsert("bob", "Bob"), index.plan_upsert("carol", "Carol")
+    index.release(bob.row)
+    assert index.plan_upsert("dave", "Dave").row == bob.row
+    index.release(carol.row)
+    # the last row is no longer in use at all
+    assert index.tail_range() == "'Registry'!A3:C4"
+
+
+def test_release_ignores_rows_in_use():
+    index = registry_index()
+    bob = index.plan_upsert("bob", "Bob")
+    index.apply(bob)
+    index.release(bob.row)
+    index.release(index.get("alice").row)
+    assert index.plan_upsert("carol", "Carol").row == 4
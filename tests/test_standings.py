@@ -0,0 +1,43 @@
+import asyncio
+
+from benchmarks.offline import import_utilities
+
+cog_module = import_utilities()
+
+SCORE_ROWS = [
+    ["2025-07-12 19:30:00", "Yonma Hanchan", seat, f"player{i}", raw_score, i + 1, uma, 0, final_score, 1]
+    for i, (seat, raw_score, uma, final_score) in enumerate([
+        ("East", 40000, 24, 39), ("South", 30000, 8, 13), ("West", 20000, -8, -13), ("North", 10000, -24, -39)])]
+
+
+def test_missing_standings_worksheet_is_skipped(leaderboards):
+    club = leaderboards[0]
+    del club.worksheets["Standings"]
+    standings_engine = cog_module.standings_engine
+
+    async def publish_twice():
+        cog = cog_module.Utilities(None)
+        cog._published_standings_rows = {}
+        for _ in range(2):
+            standings_engine.add_game("Club Leaderboard", SCORE_ROWS)
+            await cog._publish_standings("Club Leaderboard")
+    asyncio.run(publish_twice())
+
+    assert "Club Leaderboard" not in standings_engine.dirty
+    # only the first attempt tried to open the worksheet
+    assert club.requests[("Standings", "worksheet")] == 1
+
+
+def test_standings_are_published(leaderboards):
+    club = leaderboards[0]
+    standings_engine = cog_module.standings_engine
+
+    async def publish():
+        cog = cog_module.Utilities(None)
+        cog._published_standings_rows = {}
+        standings_engine.add_game("Club Leaderboard", SCORE_ROWS)
+        await cog._publish_standings("Club Leaderboard")
+    asyncio.run(publish())
+
+    assert "Club Leaderboard" not in standings_engine.dirty
+    assert any("player0" in row for row in club.worksheets["Standings"].get_all_values())
@@ -0,0 +1,179 @@
+import asyncio
+import contextvars
+import gzip
+import itertools
+import json
+import logging
+import os
+import time
+from typing import *
+
+# where `rc/trace stop` writes traces
+TRACE_DIR = "./data/traces"
+# a runaway recording stops here rather than filling up memory
+MAX_TRACE_EVENTS = 200_000
+
+# slash command option types (see Discord's API docs)
+OPTION_SUB_COMMAND = 1
+OPTION_SUB_COMMAND_GROUP = 2
+OPTION_STRING = 3
+OPTION_USER = 6
+OPTION_MENTIONABLE = 9
+OPTION_ATTACHMENT = 11
+
+# the traced command the current task runs on behalf of (set by `record_command()`)
+trace_command_id: contextvars.ContextVar[int | None] = contextvars.ContextVar("trace_command_id", default=None)
+
+
+class Redactor:
+    """
+    Replaces personal data with stable aliases ("member-1", "text-1", ...)
+    that mean something only within one trace; the mapping is never saved.
+    """
+    def __init__(self):
+        self._aliases: Dict[Tuple[str, str], str] = {}
+        self._counts: Dict[str, Iterator[int]] = {}
+
+    def alias(self, kind: str, value: Any) -> str:
+        key = (kind, str(value))
+        if key not in self._aliases:
+            counter = self._counts.setdefault(kind, itertools.count(1))
+            self._aliases[key] = f"{kind}-{next(counter)}"
+        return self._aliases[key]
+
+
+class TraceRecorder:
+    """
+    Records slash command invocations and completions, and the Google Sheets
+    requests they (and the background loops) make, for replay with
+    `python -m benchmarks.replay`. Member IDs and free-text options are
+    redacted (see `Redactor`); numbers and choices are kept. Events are kept in
+    memory and written, as gzipped JSON lines, by `stop()`.
+    """
+    def __init__(self):
+        self.events: list[dict] | None = None
+        self.started_at: float | None = None
+        self._redactor: Redactor | None = None
+        self._command_ids = itertools.count(1)
+        self._stopper: asyncio.TimerHandle | None = None
+        self._save_task: asyncio.Task | None = None
+
+    @property
+    def recording(self) -> bool:
+        return self.events is not None
+
+    def start(self, minutes: float | None = None) -> None:
+        if self.recording:
+            raise RuntimeError("A trace is already being recorded.")
+        self.events = []
+        self.started_at = time.monotonic()
+        self._redactor = Redactor()
+        self._command_ids = itertools.count(1)
+        if minutes is not None:
+            self._stopper = asyncio.get_running_loop().call_later(minutes * 60, self._stop_in_background)
+
+    def _detach(self) -> list[dict]:
+        # stop recording; returns the recorded events
+        if self._stopper is not None:
+            self._stopper.cancel()
+            self._stopper = None
+        events, self.events = self.events, None
+        return events
+
+    async def _save(self, events: list[dict]) -> str:
+        path = os.path.join(TRACE_DIR, time.strftime("trace-%Y%m%d-%H%M%S.jsonl.gz"))
+        await asyncio.to_thread(_write_trace, path, events)
+        logging.info(f"Saved a trace of {len(events)} event(s) to {path}.")
+        return path
+
+    def _stop_in_background(self) -> None:
+        # keep a reference so the task isn't garbage-collected
+        self._save_task = asyncio.create_task(self._save(self._detach()))
+        self._save_task.add_done_callback(
+            lambda t: t.cancelled() or t.exception() is None or logging.error(f"Failed to save the trace: {t.exception()!r}"))
+
+    async def stop(self) -> Tuple[str, int]:
+        """
+        Stop recording and write the trace. Returns its path and event count.
+        """
+        if not self.recording:
+            raise RuntimeError("No trace is being recorded.")
+        events = self._detach()
+        return await self._save(events), len(events)
+
+    def _add(self, event: dict) -> None:
+        if len(self.events) >= MAX_TRACE_EVENTS:
+            logging.warning(f"The trace reached {MAX_TRACE_EVENTS} events; stopping the recording.")
+            self._stop_in_background()
+            return
+        event["t"] = round(time.monotonic() - self.started_at, 4)
+        self.events.append(event)
+
+    def _redact_options(self, options: list[dict], choice_names: set[str]) -> Dict[str, Any]:
+        # options with fixed choices (e.g., "Club Leaderboard") are kept as is
+        redacted = {}
+        for option in options:
+            if option["type"] in (OPTION_SUB_COMMAND, OPTION_SUB_COMMAND_GROUP):
+                redacted.update(self._redact_options(option.get("options", []), choice_names))
+            elif option["type"] in (OPTION_USER, OPTION_MENTIONABLE):
+                redacted[option["name"]] = {"member": self._redactor.alias("member", option["value"])}
+            elif option["type"] == OPTION_STRING and option["name"] not in choice_names:
+                redacted[option["name"]] = self._redactor.alias("text", option["value"])
+            elif option["type"] == OPTION_ATTACHMENT:
+                redacted[option["name"]] = {"attachment": None}
+            else:
+                redacted[option["name"]] = option["value"]
+        return redacted
+
+    def record_command(self, interaction) -> None:
+        """
+        Called from the command's own task (e.g., a cog's `interaction_check()`),
+        so the Sheets requests it makes are attributed to it.
+        """
+        if not self.recording or interaction.command is None:
+            return
+        command_id = next(self._command_ids)
+        trace_command_id.set(command_id)
+        choice_names = {p.name for p in interaction.command.parameters if p.choices}
+        self._add({
+            "type": "command",
+            "id": command_id,
+            "command": interaction.command.qualified_name,
+            "user": self._redactor.alias("member", interaction.user.id),
+            "options": self._redact_options(interaction.data.get("options", []), choice_names),
+        })
+
+    def record_completion(self, latency_seconds: float) -> None:
+        command_id = trace_command_id.get()
+        if not self.recording or command_id is None:
+            return
+        self._add({"type": "completion", "id": command_id, "latency": round(latency_seconds, 4)})
+
+    def record_sheets_request(self, worksheet: str, method: str, priority: str, queued: float, duration: float, outcome: str) -> None:
+        if not self.recording:
+            return
+        self._add({
+            "type": "sheets",
+            "command_id": trace_command_id.get(),
+            "worksheet": worksheet,
+            "method": method,
+            "priority": priority,
+            "queued": round(queued, 4),
+            "duration": round(duration, 4),
+            "outcome": outcome,
+        })
+
+
+def _write_trace(path: str, events: list[dict]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event, separators=(",", ":")) + "\n")
+
+
+def read_trace(path: str) -> list[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+recorder = TraceRecorder()